@@ -0,0 +1,220 @@
+import os
+import re
+import time
+import shutil
+import tempfile
+import threading
+from typing import Callable
+from collections import defaultdict
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.database.utils import data_to_uuid
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+# a converter takes the input path and the directory to write its output to
+# (`output_dir`), and returns the path of the converted document
+Converter = Callable[..., str]
+
+
+class ConversionCache(object):
+    """
+    Content-addressed disk cache of converted documents.
+
+    Entries are keyed by the input content, the output format and the backend
+    (with its options, e.g. the LibreOffice import filter), and evicted least
+    recently used first (by modification time, updated on each hit) once the
+    cache exceeds its disk budget. The disk is the only state, so
+    the cache is shared by all the processes using the same directory.
+    """
+
+    def __init__(
+        self,
+        basepath: str,
+        max_size_mb: float = 1024,
+        min_age_s: float = 60,
+    ):
+        """
+        Args:
+            basepath (str): directory to store the converted documents.
+            max_size_mb (float, optional): disk budget (in MB). The last
+                conversion is always kept, even if it exceeds it.
+                Defaults to 1024.
+            min_age_s (float, optional): documents used more recently are not
+                evicted, so the paths just returned (e.g. to a `FileResponse`)
+                can still be opened. Defaults to 60.
+        """
+        self.basepath = basepath
+        self.max_size_mb = max_size_mb
+        self.min_age_s = min_age_s
+
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def key(data: bytes, output_format: str, backend: str) -> str:
+        backend = re.sub(r"[^\w.-]+", "-", backend)
+        return f"{data_to_uuid(data)}-{backend}.{output_format}"
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.basepath, key)
+
+    def get(self, key: str) -> str | None:
+        """
+        Cached document of a key (if any), marked as recently used
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            str | None: path to the cached document
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, path: str) -> str:
+        """
+        Move a converted document into the cache and evict the least recently
+        used documents over the disk budget
+
+        Args:
+            key (str): cache key
+            path (str): converted document
+
+        Returns:
+            str: path to the cached document
+        """
+        os.makedirs(self.basepath, exist_ok=True)
+        cached = self.path(key)
+        try:
+            os.replace(path, cached)
+        except OSError:
+            # different filesystems
+            shutil.move(path, cached)
+
+        self.evict(keep=key)
+        return cached
+
+    def convert(
+        self,
+        input_path: str,
+        output_format: str,
+        backend: str,
+        converter: Converter,
+    ) -> str:
+        """
+        Convert a document, unless it was already converted
+
+        Args:
+            input_path (str): document path
+            output_format (str): output format (e.g. odt)
+            backend (str): conversion backend and its options, if they change
+                the output (e.g. libreoffice-writer_pdf_import)
+            converter (Converter): function to convert the document on a miss
+
+        Returns:
+            str: path to the cached document. It belongs to the cache, it must
+                not be moved or removed.
+        """
+        with open(input_path, "rb") as file:
+            key = self.key(file.read(), output_format, backend)
+
+        with self._lock:
+            key_lock = self._key_locks[key]
+
+        # concurrent conversions of the same document run once
+        with key_lock:
+            try:
+                cached = self.get(key)
+                if cached:
+                    logger.info(f"conversion cache hit: {key}")
+                    with self._lock:
+                        self._stats["hits"] += 1
+                    return cached
+
+                with self._lock:
+                    self._stats["misses"] += 1
+
+                os.makedirs(self.basepath, exist_ok=True)
+                with tempfile.TemporaryDirectory(
+                    prefix=".tmp-", dir=self.basepath
+                ) as tmp:
+                    output = converter(input_path, output_dir=tmp)
+                    return self.put(key, output)
+
+            finally:
+                # also on hits and failures, or the locks would pile up
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def _entries(self) -> list[tuple[str, os.stat_result]]:
+        entries = []
+        try:
+            with os.scandir(self.basepath) as iterator:
+                for entry in iterator:
+                    # skip the conversions in progress
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    try:
+                        entries.append((entry.name, entry.stat()))
+                    except FileNotFoundError:
+                        # evicted by another process
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def evict(self, keep: str | None = None):
+        """
+        Remove the least recently used documents until the cache fits its budget
+
+        Args:
+            keep (str | None, optional): key to never evict. Defaults to None.
+        """
+        entries = self._entries()
+        size = sum(stat.st_size for _, stat in entries)
+        recent = time.time() - self.min_age_s
+
+        for name, stat in sorted(entries, key=lambda entry: entry[1].st_mtime):
+            if size <= self.max_size_mb * MB or stat.st_mtime > recent:
+                break
+            if name == keep:
+                continue
+
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+            with self._lock:
+                self._stats["evictions"] += 1
+            logger.info(f"conversion cache eviction: {name}")
+
+    def stats(self) -> dict:
+        """
+        Conversion cache metrics: hits, misses, evictions and disk usage
+
+        Returns:
+            dict: conversion cache stats
+        """
+        entries = self._entries()
+        return {
+            **self._stats,
+            "entries": len(entries),
+            "size_mb": sum(stat.st_size for _, stat in entries) / MB,
+            "max_size_mb": self.max_size_mb,
+        }
+
+
+conversion_cache = ConversionCache(
+    basepath=settings.CONVERSION_CACHE_PATH,
+    max_size_mb=settings.CONVERSION_CACHE_MAX_MB,
+)
@@ -3,6 +3,7 @@ from fastapi.routing import APIRouter
 from .endpoints.routers.anonymizer import anonymizer
 from .endpoints.routers.anonymizer import database as anonymizer_database
 from .endpoints.routers.datapublic import datapublic
+from .endpoints.routers.jobs import jobs
 
 from .endpoints.routers.misc import convert, document_extract
 from .endpoints.routers.server import stats
@@ -37,6 +38,10 @@ router.include_router(
 )
 
 
+# Jobs
+router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+
+
 # Misc
 router.include_router(document_extract.router, tags=["document"], deprecated=True)
 router.include_router(document_extract.router, prefix="/misc", tags=["document"])
@@ -1,25 +1,43 @@
+import asyncio
+import base64
 import json
 import os
-import subprocess
 import tempfile
-from threading import Lock
+import threading
+import uuid
+from collections import deque
+from functools import partial
+from typing import Literal
 
-import torch
 from fastapi import Body, Depends, Form, Query, UploadFile
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.routing import APIRouter
 from sqlmodel import Session
-from starlette.background import BackgroundTask
 
-from aymurai.api.utils import load_pipeline
+from aymurai.api.conversion_cache import conversion_cache
+from aymurai.api.endpoints.routers.misc.document_extract import (
+    events_response,
+    stream_paragraphs_from_bytes,
+)
+from aymurai.api.exceptions import (
+    AymuraiAPIException,
+    UnsupportedFileType,
+)
+from aymurai.api.extraction_pool import extraction_errors
+from aymurai.api.jobs import JobCancelled
+from aymurai.api.libreoffice import libreoffice_pool
+from aymurai.api.scheduler import run_inference
+from aymurai.api.utils import production_pipeline_path
 from aymurai.database.crud.anonymization.document import anonymization_document_create
 from aymurai.database.crud.anonymization.paragraph import (
+    anonymization_paragraph_batch_create,
     anonymization_paragraph_batch_create_update,
-    anonymization_paragraph_create,
+    anonymization_paragraph_batch_read,
     anonymization_paragraph_read,
 )
 from aymurai.database.schema import AnonymizationParagraph
-from aymurai.database.session import get_session
+from aymurai.database.session import get_engine, get_session
 from aymurai.database.utils import data_to_uuid, text_to_uuid
 from aymurai.logger import get_logger
 from aymurai.meta.api_interfaces import (
@@ -29,16 +47,14 @@ from aymurai.meta.api_interfaces import (
     TextRequest,
 )
 from aymurai.settings import settings
-from aymurai.text.anonymization import DocAnonymizer
-from aymurai.text.extraction import MIMETYPE_EXTENSION_MAPPER
+from aymurai.text.extensions import MIMETYPE_EXTENSION_MAPPER
 from aymurai.utils.misc import get_element
 
 logger = get_logger(__name__)
 
 
 RESOURCES_BASEPATH = settings.RESOURCES_BASEPATH
-torch.set_num_threads = 100  # FIXME: polemic ?
-pipeline_lock = Lock()
+PIPELINE_PATH = production_pipeline_path("flair-anonymizer")
 
 
 router = APIRouter()
@@ -73,27 +89,28 @@ async def anonymizer_paragraph_predict(
     text = text_request.text
     paragraph_id = text_to_uuid(text)
 
-    cached_prediction = session.get(AnonymizationParagraph, paragraph_id)
-    if cached_prediction and use_cache:
-        logger.info(f"cache loaded from key: {paragraph_id}")
-        logger.debug(f"{cached_prediction}")
+    if use_cache:
+        cached_prediction = await run_in_threadpool(
+            anonymization_paragraph_read, paragraph_id, session
+        )
+        if cached_prediction:
+            logger.info(f"cache loaded from key: {paragraph_id}")
+            logger.debug(f"{cached_prediction}")
 
-        labels = cached_prediction.prediction
-        return DocumentInformation(document=cached_prediction.text, labels=labels or [])
+            labels = cached_prediction.prediction
+            return DocumentInformation(
+                document=cached_prediction.text, labels=labels or []
+            )
 
-    logger.info("Running prediction")
-    item = [{"path": "empty", "data": {"doc.text": text_request.text}}]
-    pipeline = load_pipeline(
-        os.path.join(RESOURCES_BASEPATH, "pipelines", "production", "flair-anonymizer")
-    )
+    # release the pooled connection while waiting for the inference
+    await run_in_threadpool(session.close)
 
-    with pipeline_lock:
-        processed = pipeline.preprocess(item)
-        processed = pipeline.predict_single(processed[0])
-        processed = pipeline.postprocess([processed])
+    logger.info("Running prediction")
+    item = {"path": "empty", "data": {"doc.text": text_request.text}}
+    (processed,) = await run_inference(PIPELINE_PATH, [item])
 
-    text = get_element(processed[0], ["data", "doc.text"]) or ""
-    labels = get_element(processed[0], ["predictions", "entities"]) or []
+    text = get_element(processed, ["data", "doc.text"]) or ""
+    labels = get_element(processed, ["predictions", "entities"]) or []
 
     if use_cache:
         logger.info(f"saving in cache: {paragraph_id}")
@@ -102,14 +119,301 @@ async def anonymizer_paragraph_predict(
             text=text,
             prediction=labels,
         )
-        paragraph = anonymization_paragraph_create(paragraph, session=session)
+        await run_in_threadpool(
+            anonymization_paragraph_batch_create, [paragraph], session
+        )
+        await run_in_threadpool(session.close)
+
+    return DocumentInformation(document=text, labels=labels)
+
+
+# MARK: Predict Batch
+@router.post("/predict/batch", response_model=list[DocumentInformation])
+async def anonymizer_paragraph_batch_predict(
+    text_requests: list[TextRequest] = Body(
+        [
+            {"text": "Acusado: Ramiro Marrón DNI 34.555.666."},
+            {"text": "Buenos Aires, 17 de noviembre 2024"},
+        ]
+    ),
+    use_cache: bool = Query(
+        True, description="Use cache to store or retrive predictions"
+    ),
+    session: Session = Depends(get_session),
+) -> list[DocumentInformation]:
+    """
+    Endpoint to predict anonymization for a batch of paragraphs.
+    Cached predictions are resolved in a single query and only the missing
+    paragraphs are run through the pipeline.
+
+    Args:
+        text_requests (list[TextRequest]): The paragraphs to be anonymized.
+        use_cache (bool): Flag to determine whether to use cache for storing or retrieving predictions.
+        session (Session): Database session dependency.
+
+    Returns:
+        list[DocumentInformation]: The anonymized paragraphs information, in input order.
+    """  # noqa
+
+    logger.info(f"anonymization predict batch ({len(text_requests)} paragraphs)")
+
+    texts = [text_request.text for text_request in text_requests]
+    return await predict_paragraphs(texts, use_cache=use_cache, session=session)
+
+
+async def predict_paragraphs(
+    texts: list[str],
+    use_cache: bool,
+    session: Session,
+) -> list[DocumentInformation]:
+    """
+    Predict anonymization for a list of paragraphs.
+    Cached predictions are resolved in a single query and only the missing
+    paragraphs are run through the pipeline, as a single group of the inference
+    scheduler.
+
+    Args:
+        texts (list[str]): paragraphs
+        use_cache (bool): use cache to store or retrieve predictions
+        session (Session): database session
+
+    Returns:
+        list[DocumentInformation]: paragraphs information, in input order
+    """
+    paragraph_ids = [text_to_uuid(text) for text in texts]
+
+    results: dict[uuid.UUID, DocumentInformation] = {}
+
+    logger.info(f"Checking cache (use cache: {use_cache})")
+    if use_cache:
+        cached = await run_in_threadpool(
+            anonymization_paragraph_batch_read, paragraph_ids, session
+        )
+        results = {
+            paragraph.id: DocumentInformation(
+                document=paragraph.text, labels=paragraph.prediction or []
+            )
+            for paragraph in cached
+        }
+        logger.info(f"cache hits: {len(results)}/{len(set(paragraph_ids))}")
+
+    # unique paragraphs without cached prediction (keeping input order)
+    missing = {
+        paragraph_id: text
+        for paragraph_id, text in zip(paragraph_ids, texts)
+        if paragraph_id not in results
+    }
+
+    if missing:
+        # release the pooled connection while waiting for the inference
+        await run_in_threadpool(session.close)
+
+        logger.info(f"Running prediction ({len(missing)} paragraphs)")
+        items = [
+            {"path": "empty", "data": {"doc.text": text}} for text in missing.values()
+        ]
+        processed = await run_inference(PIPELINE_PATH, items)
+
+        paragraphs = []
+        for paragraph_id, item in zip(missing, processed):
+            text = get_element(item, ["data", "doc.text"]) or ""
+            labels = get_element(item, ["predictions", "entities"]) or []
+
+            results[paragraph_id] = DocumentInformation(document=text, labels=labels)
+            paragraphs.append(
+                AnonymizationParagraph(id=paragraph_id, text=text, prediction=labels)
+            )
+
+        if use_cache:
+            logger.info(f"saving in cache: {len(paragraphs)} paragraphs")
+            await run_in_threadpool(
+                anonymization_paragraph_batch_create, paragraphs, session
+            )
+
+    return [results[paragraph_id] for paragraph_id in paragraph_ids]
+
+
+# MARK: Document Stream
+def anonymize_streamed_document(
+    data: bytes,
+    filename: str,
+    extension: str,
+    predictions: list[dict],
+) -> tuple[list[str], dict | None]:
+    """
+    Anonymize a streamed document: its paragraphs and, for .docx documents, the
+    document itself (see `DocAnonymizer`)
 
-    return DocumentInformation(document=text, labels=paragraph.prediction)
+    Args:
+        data (bytes): document content
+        filename (str): document name
+        extension (str): document extension
+        predictions (list[dict]): predictions of the document paragraphs
+
+    Returns:
+        tuple[list[str], dict | None]: anonymized paragraphs, and the anonymized
+            document (`filename`, `media_type` and base64 `content`) if built
+    """
+    from aymurai.text.anonymization import DocAnonymizer
+
+    doc_anonymizer = DocAnonymizer()
+    paragraphs = [
+        doc_anonymizer.replace_labels_in_text(prediction, escape=False)
+        for prediction in predictions
+    ]
+    if extension != "docx":
+        return paragraphs, None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "document.docx")
+        with open(path, "wb") as file:
+            file.write(data)
+
+        output_dir = os.path.join(tmp_dir, "anonymized")
+        doc_anonymizer({"path": path}, predictions, output_dir)
+        with open(os.path.join(output_dir, "document.docx"), "rb") as file:
+            content = file.read()
+
+    document = {
+        "filename": f"{os.path.splitext(filename or 'document')[0]}.docx",
+        "media_type": (
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        ),
+        "content": base64.b64encode(content).decode("ascii"),
+    }
+    return paragraphs, document
+
+
+@router.post("/anonymize-document/stream")
+async def anonymizer_stream_document(
+    file: UploadFile,
+    use_cache: bool = Query(
+        True, description="Use cache to store or retrive predictions"
+    ),
+    format: Literal["ndjson", "sse"] = Query(
+        "ndjson", description="Stream format: NDJSON or server-sent events"
+    ),
+) -> StreamingResponse:
+    """
+    Extract, predict and anonymize a whole document, streaming the progress.
+
+    The paragraphs are predicted in batches as they are extracted, keeping a few
+    batches in flight so the extraction and the inference overlap with the
+    stream. Events:
+        * `document`: document id.
+        * `paragraph`: prediction of a paragraph, as soon as its batch is done.
+        * `error`: the processing failed, no more events are sent.
+        * `done`: number of paragraphs and anonymized paragraphs of the document,
+            and the anonymized document (base64) for .docx documents.
+
+    Args:
+        file (UploadFile): Document to anonymize (.docx, .odt or .pdf).
+        use_cache (bool): Flag to determine whether to use cache for storing or retrieving predictions.
+        format (str): Stream format, `ndjson` or `sse`.
+
+    Returns:
+        StreamingResponse: stream of events
+    """  # noqa
+    logger.info(f"receiving => {file.filename}")
+    extension = MIMETYPE_EXTENSION_MAPPER.get(file.content_type)
+    if extension not in ["docx", "odt", "pdf"]:
+        raise UnsupportedFileType(detail=file.content_type)
+
+    data = await file.read()
+    document_id = data_to_uuid(data)
+
+    # errors up to the first paragraph are raised before the stream starts
+    with extraction_errors(file.filename):
+        paragraphs = await stream_paragraphs_from_bytes(
+            data, extension, timeout_s=settings.EXTRACTION_TIMEOUT_S
+        )
+
+    logger.info(f"streaming anonymization: {document_id}")
+
+    async def next_batch() -> list[str]:
+        batch = []
+        async for paragraph in paragraphs:
+            batch.append(paragraph)
+            if len(batch) >= settings.INFERENCE_MAX_BATCH_SIZE:
+                break
+        return batch
+
+    async def predict_batch(texts: list[str]) -> list[DocumentInformation]:
+        with Session(get_engine()) as session:
+            return await predict_paragraphs(texts, use_cache=use_cache, session=session)
+
+    async def events():
+        yield {
+            "event": "document",
+            "document_id": str(document_id),
+            "filename": file.filename,
+        }
+
+        results: list[DocumentInformation] = []
+        inflight: deque[asyncio.Task] = deque()
+
+        try:
+            while True:
+                # keep the pipeline busy while the done batches are streamed
+                while len(inflight) < settings.STREAM_MAX_INFLIGHT_BATCHES and (
+                    batch := await next_batch()
+                ):
+                    inflight.append(asyncio.create_task(predict_batch(batch)))
+
+                if not inflight:
+                    break
+
+                for info in await inflight.popleft():
+                    yield {
+                        "event": "paragraph",
+                        "index": len(results),
+                        **info.model_dump(mode="json"),
+                    }
+                    results.append(info)
+
+        except AymuraiAPIException as error:
+            yield {
+                "event": "error",
+                "status_code": error.status_code,
+                "detail": error.detail,
+            }
+            return
+        except Exception as error:
+            logger.error(f"error while streaming {document_id}: {error}")
+            yield {"event": "error", "status_code": 500, "detail": str(error)}
+            return
+        finally:
+            for task in inflight:
+                task.cancel()
+            await paragraphs.aclose()
+
+        try:
+            anonymized, document = await run_in_threadpool(
+                anonymize_streamed_document,
+                data,
+                file.filename,
+                extension,
+                [info.model_dump() for info in results],
+            )
+        except Exception as error:
+            logger.error(f"error while anonymizing {document_id}: {error}")
+            yield {"event": "error", "status_code": 500, "detail": str(error)}
+            return
+
+        yield {
+            "event": "done",
+            "document_id": str(document_id),
+            "n_paragraphs": len(results),
+            "document": anonymized,
+            "file": document,
+        }
+
+    return events_response(events(), format)
 
 
 # MARK: Validate
 @router.post("/validation", response_model=list[DocLabel] | None)
-async def anonymizer_get_paragraph_validation(
+def anonymizer_get_paragraph_validation(
     text_request: TextRequest = Body(
         {"text": "Acusado: Ramiro Marrón DNI 34.555.666."}
     ),
@@ -138,7 +442,7 @@ async def anonymizer_get_paragraph_validation(
 
 # MARK: Document Compilation
 @router.post("/anonymize-document")
-async def anonymizer_compile_document(
+def anonymizer_compile_document(
     file: UploadFile,
     annotations: str = Form(...),
     session: Session = Depends(get_session),
@@ -157,8 +461,40 @@ async def anonymizer_compile_document(
     extension = MIMETYPE_EXTENSION_MAPPER.get(file.content_type)
     logger.info(f"detection extension: {extension} ({file.content_type})")
 
+    data = file.file.read()
+    odt = compile_document(data, file.filename, annotations, session=session)
+
+    return FileResponse(
+        odt,
+        media_type="application/octet-stream",
+        filename=f"{os.path.splitext(file.filename)[0]}.odt",
+    )
+
+
+def compile_document(
+    data: bytes,
+    filename: str,
+    annotations: str,
+    session: Session,
+    cancelled: threading.Event | None = None,
+) -> str:
+    """
+    Compile Anonimized document (as .odt) from original file content and annotations
+
+    Args:
+        data (bytes): Original file content.
+        filename (str): Original file name.
+        annotations (str): JSON with document annotations.
+        session (Session): Database session.
+        cancelled (threading.Event | None, optional): Set to stop the compilation
+            before the conversion (see `aymurai.api.jobs`). Defaults to None.
+
+    Returns:
+        str: path to the anonymized document, in the conversion cache (it must not
+            be moved or removed)
+    """
     # Create a temporary file
-    _, suffix = os.path.splitext(file.filename)
+    _, suffix = os.path.splitext(filename)
     suffix = suffix if suffix == ".docx" else ".txt"
     tmp_dir = tempfile.gettempdir()
 
@@ -169,7 +505,6 @@ async def anonymizer_compile_document(
     ) as tmp_file:
         tmp_filename = tmp_file.name
         logger.info(f"saving temp file on local storage => {tmp_filename}")
-        data = file.file.read()
         tmp_file.write(data)
         tmp_file.flush()
         tmp_file.close()
@@ -196,13 +531,15 @@ async def anonymizer_compile_document(
 
     anonymization_document_create(
         id=data_to_uuid(data),
-        name=file.filename,
+        name=filename,
         paragraphs=paragraphs,
         session=session,
         override=False,
     )
 
     # Anonymize the document
+    from aymurai.text.anonymization import DocAnonymizer
+
     doc_anonymizer = DocAnonymizer()
 
     if suffix == ".docx":
@@ -225,30 +562,18 @@ async def anonymizer_compile_document(
         with open(tmp_filename, "w") as f:
             f.write("\n".join(anonymized_doc))
 
+    # the conversion is the slowest stage, skip it if the job was cancelled
+    if cancelled is not None and cancelled.is_set():
+        os.remove(tmp_filename)
+        raise JobCancelled("job cancelled")
+
     # Convert to ODT
-    cmd = [
-        settings.LIBREOFFICE_BIN,
-        "--headless",
-        "--convert-to",
-        "odt",
-        "--outdir",
-        tmp_dir,
+    odt = conversion_cache.convert(
         tmp_filename,
-    ]
-
-    logger.info(f"Executing: {' '.join(cmd)}")
-
-    try:
-        output = subprocess.check_output(
-            cmd, shell=False, encoding="utf-8", errors="ignore"
-        )
-        logger.info(f"LibreOffice output: {output}")
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(
-            f"LibreOffice conversion failed: {e.output.decode('utf-8', errors='ignore')}"
-        )
-
-    odt = tmp_filename.replace(suffix, ".odt")
+        output_format="odt",
+        backend="libreoffice",
+        converter=partial(libreoffice_pool.convert, output_format="odt"),
+    )
     logger.info(f"Expected output file path: {odt}")
 
     if not os.path.exists(odt):
@@ -257,9 +582,4 @@ async def anonymizer_compile_document(
     # Ensure the temporary file is deleted
     os.remove(tmp_filename)
 
-    return FileResponse(
-        odt,
-        background=BackgroundTask(os.remove, odt),
-        media_type="application/octet-stream",
-        filename=f"{os.path.splitext(file.filename)[0]}.odt",
-    )
+    return odt
@@ -1,13 +1,11 @@
-import os
-from threading import Lock
-
-import torch
 from fastapi import Body, Depends, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.routing import APIRouter
 from pydantic import UUID5
 from sqlmodel import Session
 
-from aymurai.api.utils import load_pipeline
+from aymurai.api.scheduler import run_inference
+from aymurai.api.utils import production_pipeline_path
 from aymurai.database.schema import (
     DataPublicParagraph,
     DataPublicDocument,
@@ -28,8 +26,7 @@ logger = get_logger(__name__)
 
 
 RESOURCES_BASEPATH = settings.RESOURCES_BASEPATH
-torch.set_num_threads = 100  # FIXME: polemic ?
-pipeline_lock = Lock()
+PIPELINE_PATH = production_pipeline_path("full-paragraph")
 
 
 router = APIRouter()
@@ -51,48 +48,60 @@ async def predict_over_text(
     text = text_request.text
     paragraph_id = text_to_uuid(text)
 
-    cached_prediction = session.get(DataPublicParagraph, paragraph_id)
-    if cached_prediction and use_cache:
-        logger.info(f"cache loaded from key: {paragraph_id}")
-        logger.debug(f"{cached_prediction}")
-        labels = cached_prediction.prediction
-        return DocumentInformation(document=cached_prediction.text, labels=labels or [])
+    if use_cache:
+        cached_prediction = await run_in_threadpool(
+            session.get, DataPublicParagraph, paragraph_id
+        )
+        if cached_prediction:
+            logger.info(f"cache loaded from key: {paragraph_id}")
+            logger.debug(f"{cached_prediction}")
+            labels = cached_prediction.prediction
+            return DocumentInformation(
+                document=cached_prediction.text, labels=labels or []
+            )
+
+    # release the pooled connection while waiting for the inference
+    await run_in_threadpool(session.close)
 
     # load datapublic pipeline
     logger.info("Running prediction")
-    item = [{"path": "empty", "data": {"doc.text": text_request.text}}]
-    pipeline = load_pipeline(
-        os.path.join(RESOURCES_BASEPATH, "pipelines", "production", "full-paragraph")
-    )
-
-    with pipeline_lock:
-        processed = pipeline.preprocess(item)
-        processed = pipeline.predict_single(processed[0])
-        processed = pipeline.postprocess([processed])
+    item = {"path": "empty", "data": {"doc.text": text_request.text}}
+    (processed,) = await run_inference(PIPELINE_PATH, [item])
 
-    text = get_element(processed[0], ["data", "doc.text"]) or ""
-    labels = get_element(processed[0], ["predictions", "entities"]) or []
+    text = get_element(processed, ["data", "doc.text"]) or ""
+    labels = get_element(processed, ["predictions", "entities"]) or []
 
     if use_cache:
         logger.info(f"saving in cache: {paragraph_id}")
+        await run_in_threadpool(
+            save_paragraph_prediction, document_id, paragraph_id, text, labels, session
+        )
 
-        document = session.get(DataPublicDocument, document_id)
-        if not document:
-            document = DataPublicDocument(id=document_id)
+    return DocumentInformation(document=text, labels=labels)
 
-        paragraph = DataPublicParagraph(id=paragraph_id, text=text, prediction=labels)
-        document_paragraphs = DataPublicDocumentParagraph(
-            paragraph_id=paragraph_id,
-            document_id=document_id,
-        )
 
-        session.add_all([document, paragraph, document_paragraphs])
-        session.commit()
-        session.refresh(paragraph)
+def save_paragraph_prediction(
+    document_id: UUID5,
+    paragraph_id: UUID5,
+    text: str,
+    labels: list,
+    session: Session,
+):
+    document = session.get(DataPublicDocument, document_id)
+    if not document:
+        document = DataPublicDocument(id=document_id)
 
-        # paragraph = datapublic_paragraph_create(paragraph, session=session)
+    paragraph = DataPublicParagraph(id=paragraph_id, text=text, prediction=labels)
+    document_paragraphs = DataPublicDocumentParagraph(
+        paragraph_id=paragraph_id,
+        document_id=document_id,
+    )
+
+    session.add_all([document, paragraph, document_paragraphs])
+    session.commit()
+    session.close()
 
-    return DocumentInformation(document=text, labels=paragraph.prediction)
+    # paragraph = datapublic_paragraph_create(paragraph, session=session)
 
 
 # MARK: Validate Paragraph
@@ -119,7 +128,7 @@ async def predict_over_text(
 
 # MARK: GET Validation Document
 @router.get("/validation/document/{document_id}")
-async def datapublic_read_document_validation(
+def datapublic_read_document_validation(
     document_id: UUID5,
     session: Session = Depends(get_session),
 ) -> DataPublicDocumentAnnotations | None:
@@ -141,7 +150,7 @@ async def datapublic_read_document_validation(
 
 # MARK: POST Validation Document
 @router.post("/validation/document/{document_id}")
-async def datapublic_save_document_validation(
+def datapublic_save_document_validation(
     document_id: UUID5,
     annotations: DataPublicDocumentAnnotations = Body(..., example={}),
     session: Session = Depends(get_session),
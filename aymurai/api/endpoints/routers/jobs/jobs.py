@@ -0,0 +1,168 @@
+import os
+import shutil
+import threading
+import uuid
+from functools import partial
+
+from fastapi import Depends, Form, HTTPException, Query, UploadFile
+from fastapi.responses import FileResponse
+from fastapi.routing import APIRouter
+from sqlmodel import Session, select
+
+from aymurai.api.endpoints.routers.anonymizer.anonymizer import compile_document
+from aymurai.api.endpoints.routers.misc.document_extract import (
+    run_safe_paragraphs_extraction,
+)
+from aymurai.api.extraction_cache import extraction_cache
+from aymurai.api.jobs import job_queue, raise_if_cancelled
+from aymurai.database.schema import Job, JobRead, JobStatus
+from aymurai.database.session import get_session
+from aymurai.database.utils import data_to_uuid
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+
+# MARK: Handlers
+@job_queue.register("document-extract")
+def document_extract_job(
+    job: Job, session: Session, cancelled: threading.Event
+) -> tuple[dict, None]:
+    with open(job.input_path, "rb") as file:
+        data = file.read()
+
+    # a cancellation kills the extraction worker
+    extracted = extraction_cache.extract(
+        data,
+        partial(
+            run_safe_paragraphs_extraction,
+            job.input_path,
+            timeout_s=settings.JOB_TIMEOUT_S,
+            cancelled=cancelled,
+        ),
+    )
+    raise_if_cancelled(cancelled)
+
+    result = {**extracted, "document_id": str(data_to_uuid(data))}
+    return result, None
+
+
+@job_queue.register("anonymize-document")
+def anonymize_document_job(
+    job: Job, session: Session, cancelled: threading.Event
+) -> tuple[None, str]:
+    with open(job.input_path, "rb") as file:
+        data = file.read()
+
+    odt = compile_document(
+        data,
+        job.filename,
+        job.params["annotations"],
+        session=session,
+        cancelled=cancelled,
+    )
+    raise_if_cancelled(cancelled)
+
+    output = os.path.join(job_queue.job_dir(job.id), "output.odt")
+    shutil.copyfile(odt, output)
+
+    return None, output
+
+
+# MARK: Submit
+@router.post("/document-extract", response_model=JobRead, status_code=202)
+def submit_document_extract(
+    file: UploadFile,
+    priority: int = Query(0, description="Higher priority jobs run first"),
+    session: Session = Depends(get_session),
+) -> Job:
+    """
+    Queue the text extraction of a document.
+    The result has the same format of `/document-extract`.
+    """
+    return job_queue.submit(
+        "document-extract",
+        session=session,
+        data=file.file.read(),
+        filename=file.filename,
+        priority=priority,
+    )
+
+
+@router.post("/anonymize-document", response_model=JobRead, status_code=202)
+def submit_anonymize_document(
+    file: UploadFile,
+    annotations: str = Form(...),
+    priority: int = Query(0, description="Higher priority jobs run first"),
+    session: Session = Depends(get_session),
+) -> Job:
+    """
+    Queue the compilation of an anonymized document from the original file and
+    its annotations (see `/anonymizer/anonymize-document`).
+    The result is the anonymized document (.odt).
+    """
+    return job_queue.submit(
+        "anonymize-document",
+        session=session,
+        data=file.file.read(),
+        filename=file.filename,
+        params={"annotations": annotations},
+        priority=priority,
+    )
+
+
+# MARK: Status
+@router.get("", response_model=list[JobRead])
+def list_jobs(
+    status: JobStatus | None = Query(None),
+    limit: int = Query(100, le=1000),
+    session: Session = Depends(get_session),
+) -> list[Job]:
+    statement = select(Job).order_by(Job.created_at.desc()).limit(limit)
+    if status:
+        statement = statement.where(Job.status == status)
+
+    return session.exec(statement).all()
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def get_job(job_id: uuid.UUID, session: Session = Depends(get_session)) -> Job:
+    job = session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    return job
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: uuid.UUID, session: Session = Depends(get_session)):
+    job = get_job(job_id, session=session)
+    if job.status != JobStatus.DONE:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job is not done: {job_id} ({job.status.value})",
+        )
+
+    if job.result_path:
+        name, _ = os.path.splitext(job.filename or str(job.id))
+        _, extension = os.path.splitext(job.result_path)
+        return FileResponse(
+            job.result_path,
+            media_type="application/octet-stream",
+            filename=f"{name}{extension}",
+        )
+
+    return job.result
+
+
+# MARK: Cancel
+@router.post("/{job_id}/cancel", response_model=JobRead)
+def cancel_job(job_id: uuid.UUID, session: Session = Depends(get_session)) -> Job:
+    job = job_queue.cancel(job_id, session=session)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    return job
@@ -1,19 +1,18 @@
 import os
 import tempfile
-import subprocess
+from functools import partial
 from threading import Lock
 from typing import Literal
 
-import pypandoc
-import pymupdf4llm
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from fastapi.routing import APIRouter
-from starlette.background import BackgroundTask
 
 from aymurai.api.exceptions import UnsupportedFileType
 from aymurai.logger import get_logger
-from aymurai.settings import settings
+from aymurai.api.libreoffice import libreoffice_pool
+from aymurai.api.conversion_cache import Converter, conversion_cache
 
 logger = get_logger(__name__)
 pipeline_lock = Lock()
@@ -25,25 +24,50 @@ def libreoffice_convert(
     input: str,
     format: Literal["pdf", "docx", "odt", "txt"],
     output_dir=tempfile.gettempdir(),
-    extra_args: str = "",
+    infilter: str | None = None,
 ) -> str:
-    cmd = f"{settings.LIBREOFFICE_BIN} --headless --convert-to {format} --outdir {output_dir} {input} {extra_args}"
-    subprocess.run(cmd, shell=True, check=True)
+    return libreoffice_pool.convert(
+        input,
+        format,
+        output_dir=output_dir,
+        infilter=infilter,
+    )
+
+
+def pandoc_convert(
+    input: str,
+    format: Literal["docx", "odt"],
+    output_dir=tempfile.gettempdir(),
+) -> str:
+    import pymupdf4llm
+
+    text = pymupdf4llm.to_markdown(
+        input,
+        write_images=True,
+        embed_images=True,
+        image_size_limit=0,
+    )
+
+    stem, _ = os.path.splitext(os.path.basename(input))
+    output = os.path.join(output_dir, f"{stem}.{format}")
 
-    filename = os.path.basename(input)
-    output = os.path.join(output_dir, filename.replace(input.split(".")[-1], format))
+    import pypandoc
 
-    if not os.path.exists(output):
-        raise RuntimeError(f"LibreOffice conversion failed: {output}")
+    pypandoc.convert_text(text, format, format="md", outputfile=output)
 
     return output
 
 
-async def convert_libreoffice(
+async def convert_cached(
     file: UploadFile,
     output_format: Literal["pdf", "docx", "odt"],
-    extra_args: str = "",
+    backend: Literal["libreoffice", "pandoc"],
+    converter: Converter,
 ) -> FileResponse:
+    """
+    Convert an uploaded document, serving repeated conversions from the
+    conversion cache
+    """
     _, suffix = os.path.splitext(file.filename)
 
     tmp_file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
@@ -51,21 +75,39 @@ async def convert_libreoffice(
         data = file.file.read()
         tmp.write(data)
 
-    output = libreoffice_convert(
-        tmp_file.name,
-        format=output_format,
-        extra_args=extra_args,
-    )
-    os.remove(tmp_file.name)
+    try:
+        output = await run_in_threadpool(
+            conversion_cache.convert,
+            tmp_file.name,
+            output_format=output_format,
+            backend=backend,
+            converter=converter,
+        )
+    finally:
+        os.remove(tmp_file.name)
 
     return FileResponse(
         output,
-        background=BackgroundTask(os.remove, output),
         media_type="application/octet-stream",
         filename=os.path.basename(file.filename).replace(suffix, f".{output_format}"),
     )
 
 
+async def convert_libreoffice(
+    file: UploadFile,
+    output_format: Literal["pdf", "docx", "odt"],
+    infilter: str | None = None,
+) -> FileResponse:
+    # the import filter changes the output
+    backend = f"libreoffice-{infilter}" if infilter else "libreoffice"
+    return await convert_cached(
+        file,
+        output_format=output_format,
+        backend=backend,
+        converter=partial(libreoffice_convert, format=output_format, infilter=infilter),
+    )
+
+
 async def convert_pdf_pandoc(
     file: UploadFile,
     output_format: Literal["docx", "odt"],
@@ -74,25 +116,11 @@ async def convert_pdf_pandoc(
     if suffix != ".pdf":
         raise UnsupportedFileType(detail="Expected a .pdf file")
 
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp_file:
-        tmp_file.write(file.file.read())
-        tmp_file.flush()
-
-        text = pymupdf4llm.to_markdown(
-            tmp_file.name,
-            write_images=True,
-            embed_images=True,
-            image_size_limit=0,
-        )
-
-    output = tempfile.mktemp(suffix=f".{output_format}")
-    pypandoc.convert_text(text, output_format, format="md", outputfile=output)
-
-    return FileResponse(
-        output,
-        background=BackgroundTask(os.remove, output),
-        media_type="application/octet-stream",
-        filename=os.path.basename(file.filename).replace(".pdf", f".{output_format}"),
+    return await convert_cached(
+        file,
+        output_format=output_format,
+        backend="pandoc",
+        converter=partial(pandoc_convert, format=output_format),
     )
 
 
@@ -110,7 +138,7 @@ async def convert_pdf_odt(
         return await convert_libreoffice(
             file,
             output_format="odt",
-            extra_args='--infilter="writer_pdf_import"',
+            infilter="writer_pdf_import",
         )
     elif backend == "pandoc":
         return await convert_pdf_pandoc(file, output_format="odt")
@@ -131,7 +159,7 @@ async def convert_pdf_docx(
         return await convert_libreoffice(
             file,
             output_format="docx",
-            extra_args='--infilter="writer_pdf_import"',
+            infilter="writer_pdf_import",
         )
     elif backend == "pandoc":
         return await convert_pdf_pandoc(file, output_format="docx")
@@ -1,18 +1,27 @@
 import os
-import re
+import json
 import tempfile
+import threading
+from typing import AsyncIterator, Iterator, Literal
 
-from fastapi import UploadFile, HTTPException
+from fastapi import Query, UploadFile
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
 from starlette import status
 from fastapi.routing import APIRouter
-from more_itertools import unique_justseen
 
+from aymurai.api.extraction_cache import extraction_cache
+from aymurai.api.extraction_pool import extraction_errors, extraction_pool
 from aymurai.database.utils import data_to_uuid
 from aymurai.logger import get_logger
+from aymurai.settings import settings
 from aymurai.meta.api_interfaces import Document
-from aymurai.text.extraction import MIMETYPE_EXTENSION_MAPPER
-from aymurai.text.extraction import extract_document
-from aymurai.text.normalize import document_normalize
+from aymurai.text.extensions import MIMETYPE_EXTENSION_MAPPER
+from aymurai.text.normalize import (
+    document_normalize,
+    iter_normalized_paragraphs,
+    split_paragraphs,
+)
 import concurrent.futures
 
 logger = get_logger(__name__)
@@ -20,36 +29,213 @@ logger = get_logger(__name__)
 router = APIRouter()
 
 
-def extraction(path: str) -> str:
+def sections_extraction(path: str) -> dict:
     """
-    Wrapper function to call the extract_document function.
+    Wrapper function to call the extract_document_sections function.
     This is necessary to ensure that the function can be pickled and run in a separate process.
+    The document text keeps every section, headers and footers also come apart.
     """
-    text = extract_document(path)
-    return document_normalize(text) if text else ""
+    # textract and pymupdf are only loaded by the extraction processes
+    from aymurai.text.extraction import extract_document_sections, sections_to_text
 
+    sections = extract_document_sections(path)
+    if not sections:
+        return {"document": "", "header": None, "footer": None}
 
-def run_safe_text_extraction(path: str, timeout_s: float = 5) -> str:
+    def paragraphs(section: str) -> list[str] | None:
+        text = document_normalize("\n\n".join(sections[section]))
+        return split_paragraphs(text) or None
+
+    return {
+        "document": document_normalize(sections_to_text(sections)),
+        "header": paragraphs("header"),
+        "footer": paragraphs("footer"),
+    }
+
+
+def paragraphs_extraction(path: str) -> Iterator[str]:
+    """
+    Generator version of `sections_extraction`: the normalized paragraphs of the
+    document, as they are extracted (see `split_paragraphs`).
+    """
+    from aymurai.text.extraction import iter_document
+
+    yield from iter_normalized_paragraphs(iter_document(path))
+
+
+def run_safe_document_extraction(
+    path: str,
+    timeout_s: float = 5,
+    cancelled: threading.Event | None = None,
+) -> dict:
+    """
+    Runs the text extraction in a worker of the extraction pool to avoid blocking
+    the main thread. Hung workers are killed and replaced. The document headers
+    and footers are also returned (see `sections_extraction`).
+    Args:
+        path (str): Path to the file to be processed.
+        timeout_s (float): Timeout in seconds for the extraction process.
+        cancelled (threading.Event | None): Set to abort the extraction.
+    Returns:
+        dict: Extracted text (`document`), `header` and `footer` of the document.
+    Raises:
+        TimeoutError: If the extraction process exceeds the specified timeout.
+        CancelledError: If the extraction is cancelled.
+        ServiceOverloaded: If no extraction worker is free in time.
     """
-    Runs the text extraction in a separate process to avoid blocking the main thread.
-    This is useful for long-running tasks or when the extraction might hang.
+    return extraction_pool.run(
+        sections_extraction, path, timeout_s=timeout_s, cancelled=cancelled
+    )
+
+
+def run_safe_paragraphs_extraction(
+    path: str,
+    timeout_s: float = 5,
+    cancelled: threading.Event | None = None,
+) -> dict:
+    """
+    Same as `run_safe_document_extraction`, with the document split into
+    paragraphs (the format of `/document-extract` and the extraction cache).
     Args:
         path (str): Path to the file to be processed.
         timeout_s (float): Timeout in seconds for the extraction process.
+        cancelled (threading.Event | None): Set to abort the extraction.
     Returns:
-        str: Extracted text from the document.
+        dict: Paragraphs (`document`), `header` and `footer` of the document.
+    """
+    extracted = run_safe_document_extraction(
+        path, timeout_s=timeout_s, cancelled=cancelled
+    )
+    return {**extracted, "document": split_paragraphs(extracted["document"])}
+
+
+def stream_safe_text_extraction(path: str, timeout_s: float = 5) -> Iterator[str]:
+    """
+    Streams the paragraphs of a document from a worker of the extraction pool,
+    as they are extracted (see `run_safe_document_extraction`). The timeout applies
+    to the whole extraction. Closing the stream early replaces the worker.
+    Args:
+        path (str): Path to the file to be processed.
+        timeout_s (float): Timeout in seconds for the extraction process.
+    Yields:
+        str: Normalized paragraphs of the document.
     Raises:
         TimeoutError: If the extraction process exceeds the specified timeout.
+        ServiceOverloaded: If no extraction worker is free in time.
+    """
+    return extraction_pool.stream(paragraphs_extraction, path, timeout_s=timeout_s)
+
+
+async def stream_paragraphs_from_bytes(
+    data: bytes, extension: str, timeout_s: float = 5
+) -> AsyncIterator[str]:
+    """
+    Stream the paragraphs of an in-memory document (see
+    `stream_safe_text_extraction`), or replay them from the extraction cache.
+    The extraction starts before returning, so errors up to the first paragraph
+    are raised here. Streamed extractions are not cached, as they do not tell
+    headers and footers apart.
+
+    Args:
+        data (bytes): document content
+        extension (str): document extension
+        timeout_s (float): Timeout in seconds for the extraction process.
+
+    Returns:
+        AsyncIterator[str]: Normalized paragraphs of the document.
     """
+    cached = await run_in_threadpool(extraction_cache.get, data)
+    if cached is not None:
+        return iterate_in_threadpool(iter(cached["document"]))
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{extension}") as tmp_file:
+        tmp_file.write(data)
+
+    paragraphs = stream_safe_text_extraction(tmp_file.name, timeout_s=timeout_s)
+
+    def cleanup():
+        paragraphs.close()
+        os.remove(tmp_file.name)
+
+    try:
+        first = await run_in_threadpool(next, paragraphs, None)
+    except BaseException:
+        await run_in_threadpool(cleanup)
+        raise
 
-    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(extraction, path)
+    async def stream() -> AsyncIterator[str]:
         try:
-            return future.result(timeout=timeout_s)
-        except concurrent.futures.TimeoutError:
-            # Cancel/killing the subprocess
-            future.cancel()
-            raise
+            if first is None:
+                return
+            yield first
+            async for paragraph in iterate_in_threadpool(paragraphs):
+                yield paragraph
+        finally:
+            await run_in_threadpool(cleanup)
+
+    return stream()
+
+
+def events_response(
+    events: AsyncIterator[dict], format: Literal["ndjson", "sse"]
+) -> StreamingResponse:
+    """
+    Stream events (dicts with an `event` key) as NDJSON or server-sent events
+
+    Args:
+        events (AsyncIterator[dict]): events
+        format (Literal["ndjson", "sse"]): stream format
+
+    Returns:
+        StreamingResponse: stream of events
+    """
+
+    async def serialize():
+        async for event in events:
+            if format == "sse":
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+
+    return StreamingResponse(
+        serialize(),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def extract_document_from_bytes(
+    data: bytes, extension: str, timeout_s: float = 5
+) -> dict:
+    """
+    Extract the paragraphs, header and footer of an in-memory document (see
+    `run_safe_paragraphs_extraction`), unless it is in the extraction cache.
+
+    Args:
+        data (bytes): document content
+        extension (str): document extension
+        timeout_s (float): Timeout in seconds for the extraction process.
+
+    Returns:
+        dict: Paragraphs (`document`), `header` and `footer` of the document.
+    """
+
+    def extract() -> dict:
+        # Use delete=False to avoid the file being deleted when the NamedTemporaryFile object is closed
+        # This is necessary on Windows, as the file is locked by the file object and cannot be deleted
+        with tempfile.NamedTemporaryFile(
+            delete=False, suffix=f".{extension}"
+        ) as tmp_file:
+            tmp_file.write(data)
+        logger.info(f"saved temp file on local storage => {tmp_file.name}")
+
+        try:
+            return run_safe_paragraphs_extraction(tmp_file.name, timeout_s=timeout_s)
+        finally:
+            os.remove(tmp_file.name)
+            logger.info(f"removed temp file from local storage => {tmp_file.name}")
+
+    return extraction_cache.extract(data, extract)
 
 
 @router.post("/document-extract", response_model=Document)
@@ -60,40 +246,85 @@ def plain_text_extractor(file: UploadFile) -> Document:
 
     data = file.file.read()
 
-    # Use delete=False to avoid the file being deleted when the NamedTemporaryFile object is closed
-    # This is necessary on Windows, as the file is locked by the file object and cannot be deleted
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{extension}") as tmp_file:
-        try:
-            tmp_filename = tmp_file.name
-            tmp_file.write(data)
-            tmp_file.flush()
-            tmp_file.close()
+    with extraction_errors(file.filename):
+        extracted = extract_document_from_bytes(
+            data, extension, timeout_s=settings.EXTRACTION_TIMEOUT_S
+        )
 
-            logger.info(f"saved temp file on local storage => {tmp_filename}")
+    document_id = data_to_uuid(data)
 
-            document = run_safe_text_extraction(tmp_filename, timeout_s=5)
+    return Document(
+        document=extracted["document"],
+        document_id=document_id,
+        header=extracted["header"],
+        footer=extracted["footer"],
+    )
 
-        except concurrent.futures.TimeoutError:
-            logger.error(f"Timeout while extracting text from {file.filename}")
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail="Text extraction timed out",
-            )
 
-        except Exception as e:
-            logger.error(f"error while processing data item: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=str(e),
-            )
+@router.post("/document-extract/stream")
+async def plain_text_stream_extractor(
+    file: UploadFile,
+    format: Literal["ndjson", "sse"] = Query(
+        "ndjson", description="Stream format: NDJSON or server-sent events"
+    ),
+) -> StreamingResponse:
+    """
+    Extract the paragraphs of a document, streaming them as they are extracted.
 
-    os.remove(tmp_filename)
-    logger.info(f"removed temp file from local storage => {tmp_filename}")
+    Events:
+        * `document`: document id.
+        * `paragraph`: index and text of the next paragraph.
+        * `error`: the extraction failed, no more events are sent.
+        * `done`: number of paragraphs of the document.
 
+    Args:
+        file (UploadFile): Document to extract.
+        format (str): Stream format, `ndjson` or `sse`.
+
+    Returns:
+        StreamingResponse: stream of events
+    """
+    logger.info(f"receiving => {file.filename}")
+    extension = MIMETYPE_EXTENSION_MAPPER.get(file.content_type)
+    logger.info(f"detected extension: {extension} ({file.content_type})")
+
+    data = await file.read()
     document_id = data_to_uuid(data)
 
-    paragraphs = [line.strip() for line in document.split("\n") if line.strip()]
-    paragraphs = [re.sub(r"\s{2,}", " ", line) for line in paragraphs]
-    paragraphs = list(unique_justseen(paragraphs))
+    # errors up to the first paragraph are raised before the stream starts
+    with extraction_errors(file.filename):
+        paragraphs = await stream_paragraphs_from_bytes(
+            data, extension, timeout_s=settings.EXTRACTION_TIMEOUT_S
+        )
+
+    async def events():
+        yield {"event": "document", "document_id": str(document_id)}
+
+        n_paragraphs = 0
+        try:
+            async for paragraph in paragraphs:
+                yield {"event": "paragraph", "index": n_paragraphs, "text": paragraph}
+                n_paragraphs += 1
+
+        except concurrent.futures.TimeoutError:
+            logger.error(f"Timeout while extracting text from {file.filename}")
+            yield {
+                "event": "error",
+                "status_code": status.HTTP_504_GATEWAY_TIMEOUT,
+                "detail": "Text extraction timed out",
+            }
+            return
+        except Exception as error:
+            logger.error(f"error while streaming {document_id}: {error}")
+            yield {"event": "error", "status_code": 500, "detail": str(error)}
+            return
+        finally:
+            await paragraphs.aclose()
+
+        yield {
+            "event": "done",
+            "document_id": str(document_id),
+            "n_paragraphs": n_paragraphs,
+        }
 
-    return Document(document=paragraphs, document_id=document_id)
+    return events_response(events(), format)
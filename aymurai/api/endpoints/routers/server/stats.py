@@ -4,6 +4,16 @@ import platform
 import psutil
 from fastapi.routing import APIRouter
 
+from aymurai.api.jobs import job_queue
+from aymurai.api.utils import registry
+from aymurai.utils.memory import memory_info
+from aymurai.api.libreoffice import libreoffice_pool
+from aymurai.api.extraction_pool import extraction_pool
+from aymurai.api.extraction_cache import extraction_cache
+from aymurai.api.conversion_cache import conversion_cache
+from aymurai.database.session import get_pool_stats
+from aymurai.api.scheduler import get_schedulers_stats
+
 router = APIRouter()
 
 
@@ -129,5 +139,49 @@ async def get_stats_summary():
         "cpu_usage_percent": cpu_usage_percent,
         "memory_limit_mb": mem_limit / 1024 / 1024,
         "memory_usage_mb": mem_usage / 1024 / 1024,
+        "process_memory": memory_info(os.getpid()),
+        "database_pool": get_pool_stats(),
     }
     return stats
+
+
+@router.get("/inference")
+async def get_inference_stats():
+    """Inference schedulers stats: queue depth and batch size histograms."""
+    return get_schedulers_stats()
+
+
+@router.get("/pipelines")
+async def get_pipelines_stats():
+    """Pipeline registry stats: hits, misses, load times and memory per pipeline."""
+    return registry.stats()
+
+
+@router.get("/jobs")
+def get_jobs_stats():
+    """Job queue stats: number of jobs per status."""
+    return job_queue.stats()
+
+
+@router.get("/libreoffice")
+def get_libreoffice_stats():
+    """LibreOffice conversion pool stats: conversions, failures and instances."""
+    return libreoffice_pool.stats()
+
+
+@router.get("/conversions")
+def get_conversions_stats():
+    """Conversion cache stats: hits, misses, evictions and disk usage."""
+    return conversion_cache.stats()
+
+
+@router.get("/extraction")
+def get_extraction_stats():
+    """Extraction pool stats: utilization, tasks, timeouts and workers."""
+    return extraction_pool.stats()
+
+
+@router.get("/extraction-cache")
+def get_extraction_cache_stats():
+    """Extraction cache stats: hits, misses and disk usage."""
+    return extraction_cache.stats()
@@ -14,3 +14,12 @@ class AymuraiAPIException(HTTPException):
 class UnsupportedFileType(AymuraiAPIException):
     status_code = 400
     title = "Unsupported file type"
+
+
+class ServiceOverloaded(AymuraiAPIException):
+    status_code = 503
+    title = "Service overloaded"
+
+    def __init__(self, detail: str = None, retry_after: int = 1):
+        super().__init__(detail=detail)
+        self.headers = {"Retry-After": str(retry_after)}
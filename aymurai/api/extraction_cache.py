@@ -0,0 +1,173 @@
+import threading
+from typing import Callable
+from collections import defaultdict
+from importlib.metadata import PackageNotFoundError, version
+
+import diskcache
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.database.utils import data_to_uuid
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+# bump when the extraction (or the normalization) of the documents changes, so
+# the results of the previous extractor are not served anymore
+EXTRACTOR_REVISION = 1
+
+# an extractor returns the paragraphs of a document (`document`), its `header`
+# and `footer` (see `/document-extract`)
+Extractor = Callable[[], dict]
+
+
+def extractor_version() -> str:
+    """
+    Version of the extraction: its revision and the version of the PDF backend
+
+    Returns:
+        str: extractor version
+    """
+    try:
+        backend = version("pymupdf")
+    except PackageNotFoundError:
+        backend = "unknown"
+    return f"{EXTRACTOR_REVISION}-pymupdf{backend}"
+
+
+class ExtractionCache(object):
+    """
+    Disk cache of extracted documents.
+
+    Entries are keyed by the document content and the extractor version, and
+    evicted least recently used first once the cache exceeds its disk budget.
+    The cache is a SQLite backed `diskcache`, shared by all the processes using
+    the same directory.
+    """
+
+    def __init__(self, basepath: str, max_size_mb: float = 256):
+        """
+        Args:
+            basepath (str): directory to store the extracted documents.
+            max_size_mb (float, optional): disk budget (in MB). A budget of 0
+                disables the cache. Defaults to 256.
+        """
+        self.basepath = basepath
+        self.max_size_mb = max_size_mb
+        self.version = extractor_version()
+
+        self._cache: diskcache.Cache | None = None
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._stats = {"hits": 0, "misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size_mb > 0
+
+    @property
+    def cache(self) -> diskcache.Cache:
+        # opened on first use, not on import
+        with self._lock:
+            if self._cache is None:
+                self._cache = diskcache.Cache(
+                    self.basepath,
+                    size_limit=int(self.max_size_mb * MB),
+                    eviction_policy="least-recently-used",
+                )
+            return self._cache
+
+    def key(self, data: bytes) -> str:
+        return f"{data_to_uuid(data)}-{self.version}"
+
+    def get(self, data: bytes) -> dict | None:
+        """
+        Cached extraction of a document (if any), marked as recently used
+
+        Args:
+            data (bytes): document content
+
+        Returns:
+            dict | None: extracted document
+        """
+        if not self.enabled:
+            return None
+
+        key = self.key(data)
+        extracted = self.cache.get(key)
+
+        with self._lock:
+            self._stats["hits" if extracted is not None else "misses"] += 1
+        if extracted is not None:
+            logger.info(f"extraction cache hit: {key}")
+        return extracted
+
+    def put(self, data: bytes, extracted: dict):
+        """
+        Store the extraction of a document, evicting the least recently used
+        documents over the disk budget
+
+        Args:
+            data (bytes): document content
+            extracted (dict): extracted document
+        """
+        if self.enabled:
+            self.cache.set(self.key(data), extracted)
+
+    def extract(self, data: bytes, extractor: Extractor) -> dict:
+        """
+        Extract a document, unless it was already extracted
+
+        Args:
+            data (bytes): document content
+            extractor (Extractor): function to extract the document on a miss
+
+        Returns:
+            dict: extracted document
+        """
+        if not self.enabled:
+            return extractor()
+
+        key = self.key(data)
+        with self._lock:
+            key_lock = self._key_locks[key]
+
+        # concurrent extractions of the same document run once
+        with key_lock:
+            try:
+                extracted = self.get(data)
+                if extracted is None:
+                    extracted = extractor()
+                    self.put(data, extracted)
+                return extracted
+
+            finally:
+                # also on failures (e.g. timeouts), or the locks would pile up
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def stats(self) -> dict:
+        """
+        Extraction cache metrics: hits, misses and disk usage
+
+        Returns:
+            dict: extraction cache stats
+        """
+        if not self.enabled:
+            return {**self._stats, "enabled": False}
+
+        return {
+            **self._stats,
+            "enabled": True,
+            "version": self.version,
+            "entries": len(self.cache),
+            "size_mb": self.cache.volume() / MB,
+            "max_size_mb": self.max_size_mb,
+        }
+
+
+extraction_cache = ExtractionCache(
+    basepath=settings.EXTRACTION_CACHE_PATH,
+    max_size_mb=settings.EXTRACTION_CACHE_MAX_MB,
+)
@@ -0,0 +1,519 @@
+import os
+import time
+import queue
+import atexit
+import signal
+import importlib
+import threading
+import multiprocessing
+import concurrent.futures
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+from multiprocessing.connection import Connection
+
+from fastapi import HTTPException, status
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.api.exceptions import ServiceOverloaded
+
+logger = get_logger(__name__)
+
+# seconds between checks of the cancellation of a running task
+CANCEL_POLL_S = 0.5
+
+# modules imported by the workers when they start (textract, pymupdf and magic)
+PRELOAD = [
+    "aymurai.text.extraction",
+    "aymurai.api.endpoints.routers.misc.document_extract",
+]
+
+
+def _worker_main(conn: Connection, preload: list[str]):
+    # own process group, to kill the processes started by the extraction (e.g.
+    # the PDF pages pool) along with the worker
+    os.setsid()
+    # interruptions are handled by the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception as error:
+            logger.warning(f"extraction worker could not preload {module}: {error}")
+
+    try:
+        conn.send(True)
+    except BrokenPipeError:
+        # the pool stopped while starting
+        return
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        function, args, kwargs, stream = task
+        try:
+            if stream:
+                for item in function(*args, **kwargs):
+                    conn.send(("item", item))
+                conn.send(("done", None))
+            else:
+                conn.send(("result", function(*args, **kwargs)))
+        except Exception as error:
+            try:
+                conn.send(("error", error))
+            except Exception:
+                # unpicklable exception
+                conn.send(("error", RuntimeError(repr(error))))
+
+
+class ExtractionWorker(object):
+    """
+    Extraction process, connected to the pool by a pipe
+    """
+
+    def __init__(self, name: str, context, preload: list[str]):
+        self.name = name
+        self.context = context
+        self.preload = preload
+
+        self.process: multiprocessing.Process | None = None
+        self.conn: Connection | None = None
+        self.n_tasks = 0
+
+    def start(self, timeout: float):
+        """
+        Start the process and wait until its modules are imported
+
+        Raises:
+            RuntimeError: if the worker could not start in time
+        """
+        self.conn, child = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_worker_main,
+            args=(child, self.preload),
+            name=f"extraction-worker-{self.name}",
+            # not daemonic: extractions can start processes of their own
+            daemon=False,
+        )
+        self.process.start()
+        child.close()
+
+        try:
+            ready = self.conn.poll(timeout) and self.conn.recv()
+        except (EOFError, OSError):
+            ready = False
+        if not ready:
+            self.stop()
+            raise RuntimeError(f"extraction worker {self.name} did not start")
+
+    def stop(self):
+        """
+        Kill the process
+        """
+        if self.process and self.process.is_alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                # still starting, not a group leader yet
+                pass
+            self.process.kill()
+        if self.process:
+            self.process.join()
+        if self.conn:
+            self.conn.close()
+        self.process, self.conn = None, None
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "pid": self.process.pid if self.process else None,
+            "tasks": self.n_tasks,
+        }
+
+
+class ExtractionPool(object):
+    """
+    Pool of long-lived processes for document text extraction.
+
+    Workers start once (with textract, pymupdf and magic already imported) and
+    run one task at a time. Workers that exceed the task timeout or die are
+    killed and replaced, and workers are recycled after a number of tasks to cap
+    their memory growth.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_tasks_per_worker: int = 100,
+        queue_timeout_s: float = 30,
+        start_timeout_s: float = 60,
+        preload: list[str] | None = None,
+    ):
+        """
+        Args:
+            size (int, optional): number of worker processes. Defaults to 2.
+            max_tasks_per_worker (int, optional): tasks before a worker is
+                replaced. Defaults to 100.
+            queue_timeout_s (float, optional): seconds to wait for a free worker.
+                Defaults to 30.
+            start_timeout_s (float, optional): seconds to wait for a worker to
+                start. Defaults to 60.
+            preload (list[str] | None, optional): modules imported by the workers
+                when they start. Defaults to `PRELOAD`.
+        """
+        self.size = size
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.queue_timeout_s = queue_timeout_s
+        self.start_timeout_s = start_timeout_s
+        self.preload = PRELOAD if preload is None else preload
+
+        # spawned, not forked: the parent may hold threads and model weights
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue[ExtractionWorker] = queue.Queue()
+        self._workers: dict[str, ExtractionWorker] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._n_workers = 0
+
+        # workers are not daemonic, they must be stopped before exiting
+        atexit.register(self.stop)
+
+        self._stats = {
+            "tasks": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "crashes": 0,
+            "recycles": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "waiting": 0,
+            "busy": 0,
+        }
+
+    def start(self):
+        """
+        Start the workers in the background (if not started)
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        logger.info(f"starting extraction pool ({self.size} workers)")
+        for _ in range(self.size):
+            self._spawn()
+
+    def stop(self):
+        """
+        Stop all the workers
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers = {}
+            self._idle = queue.Queue()
+            self._started = False
+
+        for worker in workers:
+            worker.stop()
+
+    def _spawn(self) -> threading.Thread:
+        """
+        Start a new worker in the background, it becomes idle once ready
+        """
+        with self._lock:
+            name = str(self._n_workers)
+            self._n_workers += 1
+
+        def start():
+            worker = ExtractionWorker(name, self._context, self.preload)
+            for attempt in range(3):
+                try:
+                    worker.start(timeout=self.start_timeout_s)
+                    break
+                except Exception as error:
+                    logger.error(f"could not start extraction worker {name}: {error}")
+                    time.sleep(2**attempt)
+            else:
+                return
+
+            with self._lock:
+                if not self._started:
+                    worker.stop()
+                    return
+                self._workers[name] = worker
+                idle = self._idle
+            idle.put(worker)
+
+        thread = threading.Thread(
+            target=start, name=f"extraction-pool-{name}", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _replace(self, worker: ExtractionWorker):
+        with self._lock:
+            self._workers.pop(worker.name, None)
+        worker.stop()
+        self._spawn()
+
+    def _acquire(self) -> ExtractionWorker:
+        """
+        Wait for a free worker
+
+        Raises:
+            ServiceOverloaded: if no worker is free in time
+        """
+        self.start()
+
+        with self._lock:
+            self._stats["waiting"] += 1
+            idle = self._idle
+        try:
+            worker = idle.get(timeout=self.queue_timeout_s)
+        except queue.Empty:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ServiceOverloaded(
+                detail="no extraction worker available",
+                retry_after=int(self.queue_timeout_s),
+            )
+        finally:
+            with self._lock:
+                self._stats["waiting"] -= 1
+
+        with self._lock:
+            self._stats["busy"] += 1
+        return worker
+
+    def _release(self, worker: ExtractionWorker, error: bool = False):
+        """
+        Give back a worker that finished its task, recycling it if needed
+        """
+        worker.n_tasks += 1
+        with self._lock:
+            self._stats["busy"] -= 1
+            self._stats["tasks"] += 1
+            self._stats["errors"] += error
+            idle = self._idle
+
+        if worker.n_tasks >= self.max_tasks_per_worker:
+            with self._lock:
+                self._stats["recycles"] += 1
+            self._replace(worker)
+        else:
+            idle.put(worker)
+
+    def _abort(self, worker: ExtractionWorker, reason: str):
+        """
+        Kill and replace a worker in the middle of a task
+        """
+        with self._lock:
+            self._stats["busy"] -= 1
+            self._stats[reason] += 1
+        self._replace(worker)
+
+    def _send(self, worker: ExtractionWorker, task: tuple):
+        try:
+            worker.conn.send(task)
+        except OSError as error:
+            logger.error(f"extraction worker {worker.name} died: {error}")
+            self._abort(worker, "crashes")
+            raise RuntimeError("extraction worker died")
+
+    def _receive(
+        self,
+        worker: ExtractionWorker,
+        deadline: float,
+        cancelled: threading.Event | None = None,
+    ) -> tuple[str, Any]:
+        """
+        Wait for the next message of a worker until the task deadline
+
+        Raises:
+            concurrent.futures.TimeoutError: if the task exceeds the deadline
+                (the worker is killed and replaced)
+            concurrent.futures.CancelledError: if the task is cancelled (the
+                worker is killed and replaced)
+            RuntimeError: if the worker dies while running the task
+        """
+        while True:
+            remaining = max(deadline - time.monotonic(), 0)
+            if cancelled is not None:
+                remaining = min(remaining, CANCEL_POLL_S)
+
+            try:
+                if worker.conn.poll(remaining):
+                    return worker.conn.recv()
+            except (EOFError, OSError) as error:
+                logger.error(f"extraction worker {worker.name} died: {error}")
+                self._abort(worker, "crashes")
+                raise RuntimeError("extraction worker died")
+
+            if cancelled is not None and cancelled.is_set():
+                logger.info(f"extraction worker {worker.name} cancelled, killing it")
+                self._abort(worker, "cancelled")
+                raise concurrent.futures.CancelledError("extraction cancelled")
+
+            if time.monotonic() >= deadline:
+                break
+
+        logger.warning(f"extraction worker {worker.name} timed out, killing it")
+        self._abort(worker, "timeouts")
+        raise concurrent.futures.TimeoutError("extraction timed out")
+
+    def run(
+        self,
+        function: Callable,
+        *args,
+        timeout_s: float = 5,
+        cancelled: threading.Event | None = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Run a (picklable) function in a free worker
+
+        Args:
+            function (Callable): function to run
+            timeout_s (float, optional): task timeout (in seconds). Defaults to 5.
+            cancelled (threading.Event | None, optional): set to abort the task.
+                Defaults to None.
+
+        Raises:
+            ServiceOverloaded: if no worker is free in time
+            concurrent.futures.TimeoutError: if the task exceeds the timeout
+                (the worker is killed and replaced)
+            concurrent.futures.CancelledError: if the task is cancelled (the
+                worker is killed and replaced)
+            RuntimeError: if the worker dies while running the task
+
+        Returns:
+            Any: function result
+        """
+        worker = self._acquire()
+        deadline = time.monotonic() + timeout_s
+
+        self._send(worker, (function, args, kwargs, False))
+
+        kind, result = self._receive(worker, deadline, cancelled)
+        self._release(worker, error=kind == "error")
+
+        if kind == "error":
+            raise result
+        return result
+
+    def stream(
+        self,
+        function: Callable[..., Iterator],
+        *args,
+        timeout_s: float = 5,
+        **kwargs,
+    ) -> Iterator:
+        """
+        Run a (picklable) generator function in a free worker, yielding its items
+        as they are produced. If the stream is not consumed to the end, the
+        worker is replaced.
+
+        Args:
+            function (Callable[..., Iterator]): generator function to run
+            timeout_s (float, optional): timeout of the whole task (in seconds).
+                Defaults to 5.
+
+        Raises:
+            ServiceOverloaded: if no worker is free in time
+            concurrent.futures.TimeoutError: if the task exceeds the timeout
+                (the worker is killed and replaced)
+            RuntimeError: if the worker dies while running the task
+
+        Yields:
+            Iterator: function items
+        """
+        worker = self._acquire()
+        deadline = time.monotonic() + timeout_s
+        self._send(worker, (function, args, kwargs, True))
+        finished = False
+
+        try:
+            while True:
+                kind, item = self._receive(worker, deadline)
+                if kind == "item":
+                    yield item
+                    continue
+
+                finished = True
+                self._release(worker, error=kind == "error")
+                if kind == "error":
+                    raise item
+                return
+
+        except (concurrent.futures.TimeoutError, RuntimeError):
+            # the worker was already replaced
+            finished = True
+            raise
+
+        finally:
+            if not finished:
+                # abandoned (or broken) stream, the worker is still producing
+                self._abort(worker, "cancelled")
+
+    def stats(self) -> dict:
+        """
+        Extraction pool metrics: utilization, tasks, timeouts and workers
+
+        Returns:
+            dict: extraction pool stats
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+            stats = dict(self._stats)
+
+        return {
+            "size": self.size,
+            "available": len(workers),
+            "idle": self._idle.qsize(),
+            "utilization": stats["busy"] / self.size if self.size else 0,
+            **stats,
+            "workers": [worker.stats() for worker in workers],
+        }
+
+
+@contextmanager
+def extraction_errors(filename: str | None):
+    """
+    Map the errors of a document extraction to HTTP errors: 504 on timeouts and
+    500 on failures. `ServiceOverloaded` (503) is raised as is.
+
+    Args:
+        filename (str | None): document name, for the logs
+    """
+    try:
+        yield
+
+    except concurrent.futures.TimeoutError:
+        logger.error(f"Timeout while extracting text from {filename}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Text extraction timed out",
+        )
+
+    except ServiceOverloaded:
+        raise
+
+    except Exception as e:
+        logger.error(f"error while processing data item: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
+
+
+extraction_pool = ExtractionPool(
+    size=settings.EXTRACTION_WORKERS,
+    max_tasks_per_worker=settings.EXTRACTION_MAX_TASKS_PER_WORKER,
+    queue_timeout_s=settings.EXTRACTION_QUEUE_TIMEOUT_S,
+)
@@ -0,0 +1,452 @@
+import os
+import time
+import shutil
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.database.session import get_engine
+from aymurai.database.schema import Job, JobStatus
+
+logger = get_logger(__name__)
+
+# a handler runs a job and returns its (json) result and the path of its result
+# file, if any. The event is set when the job is cancelled: long handlers check
+# it between stages (see `raise_if_cancelled`)
+JobHandler = Callable[[Job, Session, threading.Event], tuple[Any, str | None]]
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def raise_if_cancelled(cancelled: threading.Event | None):
+    """
+    Stop a job handler if its job was cancelled
+
+    Args:
+        cancelled (threading.Event | None): cancellation event of the job
+
+    Raises:
+        JobCancelled: if the job was cancelled
+    """
+    if cancelled is not None and cancelled.is_set():
+        raise JobCancelled("job cancelled")
+
+
+class JobQueue(object):
+    """
+    Persistent job queue backed by the database.
+
+    Jobs are claimed by a pool of worker threads, higher priority first. Claims
+    are atomic, so several processes can share the same queue.
+
+    A heartbeat thread renews the lease of the running jobs of the process and
+    picks up their cancellation. Running jobs whose lease expired (their process
+    died, on this host or not) are requeued.
+    """
+
+    def __init__(
+        self,
+        basepath: str,
+        n_workers: int = 1,
+        poll_interval_s: float = 1,
+        heartbeat_s: float = 5,
+        lease_s: float = 60,
+    ):
+        """
+        Args:
+            basepath (str): directory to store the jobs input and result files.
+            n_workers (int, optional): number of worker threads. Defaults to 1.
+            poll_interval_s (float, optional): seconds between polls of the
+                queue when idle. Defaults to 1.
+            heartbeat_s (float, optional): seconds between lease renewals of
+                the running jobs. Defaults to 5.
+            lease_s (float, optional): seconds without a renewal before a
+                running job is requeued. Defaults to 60.
+        """
+        self.basepath = basepath
+        self.n_workers = n_workers
+        self.poll_interval_s = poll_interval_s
+        self.heartbeat_s = heartbeat_s
+        self.lease_s = lease_s
+        self.handlers: dict[str, JobHandler] = {}
+
+        self._workers: list[threading.Thread] = []
+        self._heartbeat: threading.Thread | None = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        # cancellation events of the jobs running in this process
+        self._running: dict[Any, threading.Event] = {}
+        self._running_lock = threading.Lock()
+
+    @property
+    def worker_id(self) -> str:
+        # resolved on each claim: the queue may be created before forking the
+        # API workers (see `aymurai.api.serve`)
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def register(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        """
+        Decorator to register the handler of a kind of job
+        """
+
+        def decorator(handler: JobHandler) -> JobHandler:
+            self.handlers[kind] = handler
+            return handler
+
+        return decorator
+
+    def job_dir(self, job_id) -> str:
+        return os.path.join(self.basepath, str(job_id))
+
+    def submit(
+        self,
+        kind: str,
+        session: Session,
+        data: bytes | None = None,
+        filename: str | None = None,
+        params: dict | None = None,
+        priority: int = 0,
+    ) -> Job:
+        """
+        Queue a new job
+
+        Args:
+            kind (str): kind of job
+            session (Session): database session
+            data (bytes | None, optional): input file content. Defaults to None.
+            filename (str | None, optional): input file name. Defaults to None.
+            params (dict | None, optional): job parameters. Defaults to None.
+            priority (int, optional): job priority. Defaults to 0.
+
+        Returns:
+            Job: queued job
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job kind: {kind}")
+
+        job = Job(kind=kind, filename=filename, params=params, priority=priority)
+
+        if data is not None:
+            os.makedirs(self.job_dir(job.id), exist_ok=True)
+            _, suffix = os.path.splitext(filename or "")
+            job.input_path = os.path.join(self.job_dir(job.id), f"input{suffix}")
+            with open(job.input_path, "wb") as file:
+                file.write(data)
+
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        logger.info(f"job queued: {job.id} ({kind}, priority: {priority})")
+
+        self._wakeup.set()
+        return job
+
+    def cancel(self, job_id, session: Session) -> Job | None:
+        """
+        Cancel a job. Pending jobs are cancelled right away, running jobs are
+        flagged: their handler stops at its next check (the process running it
+        picks up the flag on its next heartbeat) and their result is discarded.
+
+        Args:
+            job_id (uuid.UUID): job id
+            session (Session): database session
+
+        Returns:
+            Job | None: job, None if it does not exist
+        """
+        job = session.get(Job, job_id)
+        if not job:
+            return None
+
+        if job.status == JobStatus.PENDING:
+            statement = (
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.PENDING)
+                .values(
+                    status=JobStatus.CANCELLED,
+                    cancel_requested=True,
+                    finished_at=datetime.utcnow(),
+                )
+            )
+        elif job.status == JobStatus.RUNNING:
+            statement = (
+                update(Job).where(Job.id == job_id).values(cancel_requested=True)
+            )
+        else:
+            return job
+
+        session.exec(statement)
+        session.commit()
+        session.refresh(job)
+
+        if job.status == JobStatus.CANCELLED:
+            self._cleanup(job, keep_result=False)
+        else:
+            with self._running_lock:
+                cancelled = self._running.get(job.id)
+            if cancelled is not None:
+                cancelled.set()
+        logger.info(f"job cancel requested: {job.id} ({job.status.value})")
+
+        return job
+
+    def start(self):
+        """
+        Recover orphan jobs and start the worker and heartbeat threads (if not
+        running)
+        """
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            if len(self._workers) >= self.n_workers:
+                return
+
+            self.recover()
+            self._stop.clear()
+
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(
+                    target=self._run_heartbeat, name="job-heartbeat", daemon=True
+                )
+                self._heartbeat.start()
+
+            logger.info(f"starting job queue ({self.n_workers} workers)")
+            for i in range(len(self._workers), self.n_workers):
+                worker = threading.Thread(
+                    target=self._run, name=f"job-worker-{i}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stop the worker threads once their current job is done
+        """
+        with self._lock:
+            workers, self._workers = self._workers, []
+            heartbeat, self._heartbeat = self._heartbeat, None
+
+        self._stop.set()
+        self._wakeup.set()
+        for worker in workers:
+            worker.join(timeout=timeout)
+        if heartbeat is not None:
+            heartbeat.join(timeout=timeout)
+
+    def recover(self):
+        """
+        Requeue the running jobs whose lease expired: their process died (or was
+        re-created, e.g. in a new container) without finishing them
+        """
+        expired = datetime.utcnow() - timedelta(seconds=self.lease_s)
+        with Session(get_engine()) as session:
+            orphans = session.exec(
+                select(Job).where(
+                    Job.status == JobStatus.RUNNING,
+                    func.coalesce(Job.heartbeat_at, Job.started_at) < expired,
+                )
+            ).all()
+            for job in orphans:
+                # its owner could renew the lease meanwhile
+                requeued = session.exec(
+                    update(Job)
+                    .where(
+                        Job.id == job.id,
+                        Job.status == JobStatus.RUNNING,
+                        func.coalesce(Job.heartbeat_at, Job.started_at) < expired,
+                    )
+                    .values(
+                        status=JobStatus.PENDING,
+                        worker=None,
+                        started_at=None,
+                        heartbeat_at=None,
+                    )
+                )
+                if requeued.rowcount:
+                    logger.warning(f"requeueing orphan job: {job.id} ({job.worker})")
+            session.commit()
+
+        if orphans:
+            self._wakeup.set()
+
+    def _beat(self):
+        """
+        Renew the lease of the jobs running in this process, and flag the ones
+        cancelled (or requeued) meanwhile
+        """
+        with self._running_lock:
+            running = dict(self._running)
+        if not running:
+            return
+
+        worker_id = self.worker_id
+        with Session(get_engine()) as session:
+            session.exec(
+                update(Job)
+                .where(
+                    Job.id.in_(running),
+                    Job.status == JobStatus.RUNNING,
+                    Job.worker == worker_id,
+                )
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            session.commit()
+
+            jobs = session.exec(select(Job).where(Job.id.in_(running))).all()
+
+        for job in jobs:
+            lost = job.status != JobStatus.RUNNING or job.worker != worker_id
+            if job.cancel_requested or lost:
+                running[job.id].set()
+
+    def _run_heartbeat(self):
+        while not self._stop.wait(self.heartbeat_s):
+            try:
+                self._beat()
+                self.recover()
+            except Exception as error:
+                logger.error(f"error while renewing the job leases: {error}")
+
+    def _claim(self) -> Job | None:
+        with Session(get_engine()) as session:
+            while True:
+                statement = (
+                    select(Job)
+                    .where(Job.status == JobStatus.PENDING)
+                    .order_by(Job.priority.desc(), Job.created_at)
+                    .limit(1)
+                )
+                job = session.exec(statement).first()
+                if job is None:
+                    return None
+
+                # another worker (or process) could claim it first
+                claimed = session.exec(
+                    update(Job)
+                    .where(Job.id == job.id, Job.status == JobStatus.PENDING)
+                    .values(
+                        status=JobStatus.RUNNING,
+                        started_at=(now := datetime.utcnow()),
+                        heartbeat_at=now,
+                        worker=self.worker_id,
+                    )
+                )
+                session.commit()
+
+                if claimed.rowcount:
+                    session.refresh(job)
+                    return job
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as error:
+                logger.error(f"error while claiming a job: {error}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval_s)
+                self._wakeup.clear()
+                continue
+
+            self._execute(job)
+
+    def _execute(self, job: Job):
+        logger.info(f"running job: {job.id} ({job.kind})")
+        start = time.perf_counter()
+        claim = (job.worker, job.started_at)
+
+        cancelled = threading.Event()
+        with self._running_lock:
+            self._running[job.id] = cancelled
+
+        with Session(get_engine()) as session:
+            try:
+                result, result_path = self.handlers[job.kind](job, session, cancelled)
+                error = None
+            except Exception as e:
+                # `JobCancelled`, or the error of an aborted stage
+                if cancelled.is_set():
+                    logger.info(f"job stopped: {job.id} (cancelled)")
+                    result, result_path, error = None, None, None
+                else:
+                    logger.error(f"job failed: {job.id} ({e})")
+                    result, result_path, error = None, None, str(e)
+            finally:
+                with self._running_lock:
+                    self._running.pop(job.id, None)
+
+            session.rollback()
+            job = session.get(Job, job.id)
+
+            if job.status != JobStatus.RUNNING or (job.worker, job.started_at) != claim:
+                # the lease expired and the job was requeued (and maybe claimed
+                # again): this run is stale
+                logger.warning(f"job lease lost, discarding its result: {job.id}")
+                return
+
+            job.finished_at = datetime.utcnow()
+
+            if job.cancel_requested:
+                job.status = JobStatus.CANCELLED
+            elif error:
+                job.status = JobStatus.FAILED
+                job.error = error
+            else:
+                job.status = JobStatus.DONE
+                job.result = result
+                job.result_path = result_path
+
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+
+            self._cleanup(job, keep_result=job.status == JobStatus.DONE)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"job finished: {job.id} ({job.status.value}, {elapsed:.2f}s)")
+
+    def _cleanup(self, job: Job, keep_result: bool = True):
+        """
+        Remove the input file of a finished job (and its result file, if not kept)
+        """
+        if job.input_path and os.path.exists(job.input_path):
+            os.remove(job.input_path)
+
+        if not keep_result or not job.result_path:
+            shutil.rmtree(self.job_dir(job.id), ignore_errors=True)
+
+    def stats(self) -> dict:
+        """
+        Job queue metrics: number of jobs per status
+
+        Returns:
+            dict: job queue stats
+        """
+        with Session(get_engine()) as session:
+            statement = select(Job.status, func.count()).group_by(Job.status)
+            counts = {status.value: n for status, n in session.exec(statement).all()}
+
+        return {
+            "workers": sum(worker.is_alive() for worker in self._workers),
+            "jobs": counts,
+        }
+
+
+job_queue = JobQueue(
+    basepath=settings.JOBS_BASEPATH,
+    n_workers=settings.JOB_WORKERS,
+    poll_interval_s=settings.JOB_POLL_INTERVAL_S,
+    heartbeat_s=settings.JOB_HEARTBEAT_S,
+    lease_s=settings.JOB_LEASE_S,
+)
@@ -0,0 +1,435 @@
+import os
+import queue
+import select
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+import xmlrpc.client
+from pathlib import Path
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.api.exceptions import ServiceOverloaded
+
+logger = get_logger(__name__)
+
+BRIDGE_PATH = os.path.join(os.path.dirname(__file__), "libreoffice_bridge.py")
+
+# export filters by output format
+FILTERS = {
+    "pdf": "writer_pdf_Export",
+    "docx": "MS Word 2007 XML",
+    "odt": "writer8",
+    "txt": "Text (encoded):UTF8",
+}
+
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+
+class LibreOfficeInstance(object):
+    """
+    Long-lived headless LibreOffice, with its own user profile, driven over UNO
+    by a bridge process (see `libreoffice_bridge.py`)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        soffice_bin: str,
+        python_bin: str,
+        start_timeout_s: float = 30,
+    ):
+        self.name = name
+        self.soffice_bin = soffice_bin
+        self.python_bin = python_bin
+        self.start_timeout_s = start_timeout_s
+
+        self.process: subprocess.Popen | None = None
+        self.port: int | None = None
+        self.profile: str | None = None
+        self.n_conversions = 0
+        self.n_starts = 0
+
+    def start(self):
+        """
+        Start the bridge (and its LibreOffice) and wait until it is ready
+
+        Raises:
+            RuntimeError: if the instance could not start in time
+        """
+        self.profile = tempfile.mkdtemp(
+            prefix=f"aymurai-libreoffice-{os.getpid()}-{self.name}-"
+        )
+        self.process = subprocess.Popen(
+            [
+                self.python_bin,
+                BRIDGE_PATH,
+                "--soffice",
+                self.soffice_bin,
+                "--profile",
+                self.profile,
+                "--start-timeout",
+                str(self.start_timeout_s),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+            # own process group, to kill LibreOffice along with the bridge
+            start_new_session=True,
+        )
+        self.n_starts += 1
+
+        # the bridge prints its port once LibreOffice is ready
+        ready, _, _ = select.select([self.process.stdout], [], [], self.start_timeout_s)
+        line = self.process.stdout.readline() if ready else ""
+        if not line.strip().isdigit():
+            self.stop()
+            raise RuntimeError(f"LibreOffice instance {self.name} did not start")
+
+        self.port = int(line)
+        logger.info(
+            f"LibreOffice instance {self.name} ready"
+            f" (pid: {self.process.pid}, port: {self.port})"
+        )
+
+    def stop(self):
+        """
+        Kill the bridge and its LibreOffice, and remove the user profile
+        """
+        if self.process and self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.process.wait()
+
+        if self.process and self.process.stdout:
+            self.process.stdout.close()
+
+        if self.profile:
+            shutil.rmtree(self.profile, ignore_errors=True)
+
+        self.process, self.port, self.profile = None, None, None
+
+    def restart(self):
+        logger.warning(f"restarting LibreOffice instance {self.name}")
+        self.stop()
+        self.start()
+
+    def call(self, method: str, *args, timeout: float):
+        proxy = xmlrpc.client.ServerProxy(
+            f"http://127.0.0.1:{self.port}",
+            transport=_TimeoutTransport(timeout),
+            allow_none=True,
+        )
+        with proxy:
+            return getattr(proxy, method)(*args)
+
+    def healthy(self) -> bool:
+        """
+        Health check: the bridge is running and LibreOffice answers
+
+        Returns:
+            bool: whether the instance can take conversions
+        """
+        if self.process is None or self.process.poll() is not None:
+            return False
+
+        try:
+            return self.call("ping", timeout=5)
+        except Exception as error:
+            logger.warning(f"LibreOffice instance {self.name} unhealthy: {error}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "pid": self.process.pid if self.process else None,
+            "running": bool(self.process and self.process.poll() is None),
+            "conversions": self.n_conversions,
+            "restarts": max(self.n_starts - 1, 0),
+        }
+
+
+class LibreOfficePool(object):
+    """
+    Pool of long-lived headless LibreOffice instances.
+
+    Conversions queue until an instance is free. Instances are health checked
+    before each conversion and restarted when they crash or exceed the
+    conversion timeout. If no instance can start (e.g. no `uno` module for the
+    bridge), conversions fall back to a `soffice --convert-to` process each.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        soffice_bin: str = "libreoffice",
+        python_bin: str = "/usr/bin/python3",
+        timeout_s: float = 60,
+        start_timeout_s: float = 30,
+    ):
+        """
+        Args:
+            size (int, optional): number of LibreOffice instances. Defaults to 2.
+            soffice_bin (str, optional): LibreOffice executable.
+                Defaults to "libreoffice".
+            python_bin (str, optional): Python interpreter able to import `uno`,
+                to run the bridges. Defaults to "/usr/bin/python3".
+            timeout_s (float, optional): seconds to wait for a free instance and
+                for each conversion. Defaults to 60.
+            start_timeout_s (float, optional): seconds to wait for an instance to
+                start. Defaults to 30.
+        """
+        self.size = size
+        self.soffice_bin = soffice_bin
+        self.python_bin = python_bin
+        self.timeout_s = timeout_s
+        self.start_timeout_s = start_timeout_s
+
+        self.instances: list[LibreOfficeInstance] = []
+        self._idle: queue.Queue[LibreOfficeInstance] = queue.Queue()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+        self._stats = {
+            "conversions": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "fallbacks": 0,
+            "waiting": 0,
+        }
+
+    def start(self) -> threading.Thread | None:
+        """
+        Start the instances in the background (if not started)
+
+        Returns:
+            threading.Thread | None: starting thread
+        """
+        with self._lock:
+            if self._started:
+                return None
+            self._started = True
+
+        if self.size <= 0:
+            self._ready.set()
+            return None
+
+        thread = threading.Thread(
+            target=self._start_instances, name="libreoffice-pool", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _start_instances(self):
+        for i in range(self.size):
+            instance = LibreOfficeInstance(
+                name=str(i),
+                soffice_bin=self.soffice_bin,
+                python_bin=self.python_bin,
+                start_timeout_s=self.start_timeout_s,
+            )
+            try:
+                instance.start()
+            except Exception as error:
+                logger.error(f"could not start LibreOffice instance {i}: {error}")
+                continue
+
+            self.instances.append(instance)
+            self._idle.put(instance)
+
+        if not self.instances:
+            logger.warning(
+                "no LibreOffice instance available,"
+                " conversions will spawn a process each"
+            )
+        self._ready.set()
+
+    def stop(self):
+        """
+        Stop all the instances
+        """
+        for instance in self.instances:
+            instance.stop()
+        self.instances = []
+        self._idle = queue.Queue()
+        self._ready.clear()
+        with self._lock:
+            self._started = False
+
+    def convert(
+        self,
+        input_path: str,
+        output_format: str,
+        output_dir: str | None = None,
+        infilter: str | None = None,
+    ) -> str:
+        """
+        Convert a document, waiting for a free instance
+
+        Args:
+            input_path (str): document path
+            output_format (str): output format (pdf, docx, odt or txt)
+            output_dir (str | None, optional): output directory.
+                Defaults to the input directory.
+            infilter (str | None, optional): import filter
+                (e.g. `writer_pdf_import`). Defaults to None.
+
+        Raises:
+            ServiceOverloaded: if no instance is free in time
+            RuntimeError: if the conversion fails or times out
+
+        Returns:
+            str: converted document path
+        """
+        output_dir = output_dir or os.path.dirname(input_path)
+        stem, _ = os.path.splitext(os.path.basename(input_path))
+        output = os.path.join(output_dir, f"{stem}.{output_format}")
+
+        self.start()
+        self._ready.wait(self.start_timeout_s * max(self.size, 1))
+        if not self.instances:
+            self._stats["fallbacks"] += 1
+            return self.convert_with_process(
+                input_path, output_format, output_dir, infilter
+            )
+
+        with self._lock:
+            self._stats["waiting"] += 1
+        try:
+            instance = self._idle.get(timeout=self.timeout_s)
+        except queue.Empty:
+            self._stats["rejected"] += 1
+            raise ServiceOverloaded(
+                detail="no LibreOffice instance available",
+                retry_after=int(self.timeout_s),
+            )
+        finally:
+            with self._lock:
+                self._stats["waiting"] -= 1
+
+        try:
+            if not instance.healthy():
+                instance.restart()
+
+            instance.call(
+                "convert",
+                os.path.abspath(input_path),
+                os.path.abspath(output),
+                FILTERS[output_format],
+                infilter or "",
+                timeout=self.timeout_s,
+            )
+            instance.n_conversions += 1
+            self._stats["conversions"] += 1
+
+        except socket.timeout:
+            self._stats["timeouts"] += 1
+            instance.stop()
+            raise RuntimeError(
+                f"LibreOffice conversion timed out after {self.timeout_s}s"
+            )
+
+        except xmlrpc.client.Fault as error:
+            self._stats["failures"] += 1
+            raise RuntimeError(f"LibreOffice conversion failed: {error.faultString}")
+
+        except Exception as error:
+            self._stats["failures"] += 1
+            instance.stop()
+            raise RuntimeError(f"LibreOffice conversion failed: {error}")
+
+        finally:
+            # a stopped instance is restarted by the health check of the next
+            # conversion
+            self._idle.put(instance)
+
+        if not os.path.exists(output):
+            raise RuntimeError(f"LibreOffice conversion failed: {output}")
+
+        return output
+
+    def convert_with_process(
+        self,
+        input_path: str,
+        output_format: str,
+        output_dir: str,
+        infilter: str | None = None,
+    ) -> str:
+        """
+        Convert a document with a new LibreOffice process, with its own profile
+
+        Args:
+            input_path (str): document path
+            output_format (str): output format
+            output_dir (str): output directory
+            infilter (str | None, optional): import filter. Defaults to None.
+
+        Returns:
+            str: converted document path
+        """
+        stem, _ = os.path.splitext(os.path.basename(input_path))
+        output = os.path.join(output_dir, f"{stem}.{output_format}")
+
+        with tempfile.TemporaryDirectory(prefix="aymurai-libreoffice-") as profile:
+            cmd = [
+                self.soffice_bin,
+                "--headless",
+                f"-env:UserInstallation={Path(profile).as_uri()}",
+                "--convert-to",
+                output_format,
+                "--outdir",
+                output_dir,
+            ]
+            if infilter:
+                cmd.append(f"--infilter={infilter}")
+            cmd.append(input_path)
+
+            logger.info(f"Executing: {' '.join(cmd)}")
+            try:
+                subprocess.run(cmd, check=True, timeout=self.timeout_s)
+            except subprocess.SubprocessError as error:
+                raise RuntimeError(f"LibreOffice conversion failed: {error}")
+
+        if not os.path.exists(output):
+            raise RuntimeError(f"LibreOffice conversion failed: {output}")
+
+        return output
+
+    def stats(self) -> dict:
+        """
+        Pool metrics: conversions, failures, timeouts and instances
+
+        Returns:
+            dict: pool stats
+        """
+        return {
+            "size": self.size,
+            "available": len(self.instances),
+            "idle": self._idle.qsize(),
+            **self._stats,
+            "instances": [instance.stats() for instance in self.instances],
+        }
+
+
+libreoffice_pool = LibreOfficePool(
+    size=settings.LIBREOFFICE_POOL_SIZE,
+    soffice_bin=settings.LIBREOFFICE_BIN,
+    python_bin=settings.LIBREOFFICE_PYTHON,
+    timeout_s=settings.LIBREOFFICE_TIMEOUT_S,
+    start_timeout_s=settings.LIBREOFFICE_START_TIMEOUT_S,
+)
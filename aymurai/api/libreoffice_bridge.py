@@ -0,0 +1,172 @@
+"""
+UNO bridge of a headless LibreOffice instance.
+
+Starts `soffice` with its own user profile, listening on a local UNO socket, and
+serves document conversions over XML-RPC on localhost. Once ready, it prints the
+XML-RPC port on stdout.
+
+It must run with a Python interpreter able to import `uno` (the one LibreOffice
+is built with, e.g. `/usr/bin/python3` with the `python3-uno` package), so it
+only depends on the standard library besides it.
+
+Usage:
+    python3 libreoffice_bridge.py --soffice libreoffice --profile /tmp/profile
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import subprocess
+from xmlrpc.server import SimpleXMLRPCServer
+
+import uno
+from com.sun.star.beans import PropertyValue
+from com.sun.star.connection import NoConnectException
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def properties(**kwargs) -> tuple:
+    values = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        values.append(prop)
+    return tuple(values)
+
+
+class Bridge(object):
+    def __init__(self, soffice: str, profile: str, start_timeout: float):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [
+                soffice,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--nodefault",
+                "--norestore",
+                "--nolockcheck",
+                f"--accept=socket,host=127.0.0.1,port={self.port};urp;",
+                f"-env:UserInstallation={uno.systemPathToFileUrl(profile)}",
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+        self.desktop = self.connect(start_timeout)
+
+    def connect(self, timeout: float):
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local
+        )
+
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(
+                    f"soffice exited with code {self.process.returncode}"
+                )
+            try:
+                context = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={self.port};urp;"
+                    "StarOffice.ComponentContext"
+                )
+                break
+            except NoConnectException:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        return context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context
+        )
+
+    def ping(self) -> bool:
+        if self.process.poll() is not None:
+            raise RuntimeError("soffice is not running")
+        # round trip to the office process
+        self.desktop.getFrames()
+        return True
+
+    def convert(
+        self,
+        input_path: str,
+        output_path: str,
+        filter_name: str,
+        input_filter: str = "",
+    ) -> str:
+        load = {"Hidden": True, "ReadOnly": True}
+        if input_filter:
+            load["FilterName"] = input_filter
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)),
+            "_blank",
+            0,
+            properties(**load),
+        )
+        if document is None:
+            raise RuntimeError(f"could not load document: {input_path}")
+
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_path)),
+                properties(FilterName=filter_name, Overwrite=True),
+            )
+        finally:
+            document.close(True)
+
+        return output_path
+
+    def terminate(self):
+        try:
+            self.desktop.terminate()
+        except Exception:
+            pass
+
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--soffice", default="libreoffice")
+    parser.add_argument("--profile", required=True)
+    parser.add_argument("--start-timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    bridge = Bridge(args.soffice, args.profile, args.start_timeout)
+
+    server = SimpleXMLRPCServer(("127.0.0.1", 0), logRequests=False, allow_none=True)
+    server.register_function(bridge.ping, "ping")
+    server.register_function(bridge.convert, "convert")
+
+    def shutdown(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+
+    print(server.server_address[1], flush=True)
+
+    # serve while the process that started the bridge is alive
+    parent = os.getppid()
+    server.timeout = 1
+    try:
+        while os.getppid() == parent:
+            server.handle_request()
+    finally:
+        bridge.terminate()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
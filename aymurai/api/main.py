@@ -2,18 +2,20 @@ import os
 import time
 from contextlib import asynccontextmanager
 
-import torch
-from alembic import command
-from alembic.config import Config
 from fastapi import FastAPI, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from aymurai.api import core
 from aymurai.logger import get_logger
 from aymurai.settings import settings
-from aymurai.pipeline import AymurAIPipeline
-from aymurai.api.startup.database import check_db_connection
+from aymurai.api.jobs import job_queue
+from aymurai.api.libreoffice import libreoffice_pool
+from aymurai.api.extraction_pool import extraction_pool
+from aymurai.api.scheduler import stop_schedulers
+from aymurai.database.session import dispose_engine
+from aymurai.api.startup.database import run_migrations, check_db_connection
+from aymurai.api.startup.warmup import start_warmup, state as warmup_state
 
 try:
     from aymurai.version import __version__
@@ -23,8 +25,6 @@ except ImportError:
 logger = get_logger(__name__)
 
 
-torch.set_num_threads = 100  # FIXME: polemic ?
-
 RESOURCES_BASEPATH = settings.RESOURCES_BASEPATH
 
 
@@ -34,14 +34,33 @@ async def lifespan(app: FastAPI):
     logger.info(f">> Checking DB connection: `{settings.SQLALCHEMY_DATABASE_URI}`")
     try:
         check_db_connection()
-        logger.info(">> Running Alembic migrations")
-        alembic_cfg = Config(str(settings.ALEMBIC_INI_PATH))
-        command.upgrade(alembic_cfg, "head")
+        # already done by the parent under the pre-fork server
+        run_migrations()
     except Exception as error:
         logger.error("Error while starting up:", error)
 
+    logger.info(">> Warming up pipelines")
+    start_warmup()
+
+    if settings.JOB_WORKERS:
+        logger.info(">> Starting job queue")
+        job_queue.start()
+
+    logger.info(">> Starting LibreOffice conversion pool")
+    libreoffice_pool.start()
+
+    logger.info(">> Starting extraction pool")
+    extraction_pool.start()
+
     yield
 
+    logger.info("> Shutting down service")
+    job_queue.stop()
+    libreoffice_pool.stop()
+    extraction_pool.stop()
+    stop_schedulers()
+    dispose_engine()
+
 
 api = FastAPI(
     title="AymurAI API",
@@ -98,11 +117,23 @@ def healthcheck():
     return {"status": "ok"}
 
 
+# Readiness: unready until the pipelines are warmed up
+@api.get("/server/readiness", status_code=200, tags=["server"])
+def readiness():
+    warmup = warmup_state.to_dict()
+    if not warmup_state.ready:
+        return JSONResponse(status_code=503, content=warmup)
+
+    return warmup
+
+
 # Api endpoints
 api.include_router(core.router)
 
 
 if __name__ == "__main__":
+    from aymurai.pipeline import AymurAIPipeline
+
     # download the necessary data
     logger.info("Loading pipelines and exit.")
     AymurAIPipeline.load(
@@ -0,0 +1,189 @@
+import os
+import gc
+import time
+import threading
+from collections import defaultdict
+
+import psutil
+import cachetools
+
+from aymurai.logger import get_logger
+from aymurai.pipeline import AymurAIPipeline
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+
+class _PipelineLRUCache(cachetools.LRUCache):
+    """LRU cache of `(pipeline, size)` entries that reports its evictions"""
+
+    def __init__(self, maxsize: float, on_evict=None):
+        super().__init__(maxsize=maxsize, getsizeof=lambda entry: entry[1])
+        self.on_evict = on_evict
+
+    def popitem(self):
+        path, entry = super().popitem()
+        if self.on_evict:
+            self.on_evict(path, entry)
+        return path, entry
+
+
+class PipelineRegistry(object):
+    """
+    In-memory registry of the loaded pipelines.
+
+    Pinned pipelines are never evicted. The rest are loaded on demand and kept in
+    a LRU cache bounded by their measured memory footprint.
+    """
+
+    def __init__(self, pinned: list[str] | None = None, max_size_mb: float = 4096):
+        """
+        Args:
+            pinned (list[str] | None, optional): paths of the pipelines to keep
+                resident. Defaults to None.
+            max_size_mb (float, optional): memory budget of the non pinned
+                pipelines (in MB). Defaults to 4096.
+        """
+        self.pinned = {self._key(path) for path in pinned or []}
+        self.max_size_mb = max_size_mb
+
+        self._pinned: dict[str, AymurAIPipeline] = {}
+        self._cache = _PipelineLRUCache(
+            maxsize=max_size_mb * MB, on_evict=self._evicted
+        )
+
+        self._lock = threading.Lock()
+        # loads are serialized: it keeps the memory measurements apart and avoids
+        # loading the same pipeline twice
+        self._load_lock = threading.Lock()
+
+        self._stats = defaultdict(
+            lambda: {
+                "hits": 0,
+                "misses": 0,
+                "loads": 0,
+                "evictions": 0,
+                "load_seconds": 0.0,
+                "last_load_seconds": None,
+                "size_mb": None,
+            }
+        )
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(path)
+
+    def pin(self, path: str):
+        """
+        Keep a pipeline resident. If it is already cached, it is moved out of the
+        LRU cache.
+
+        Args:
+            path (str): pipeline path
+        """
+        key = self._key(path)
+        with self._lock:
+            self.pinned.add(key)
+            if key in self._cache:
+                pipeline, _ = self._cache.pop(key)
+                self._pinned[key] = pipeline
+
+    def _lookup(self, key: str) -> AymurAIPipeline | None:
+        if key in self._pinned:
+            return self._pinned[key]
+
+        entry = self._cache.get(key)
+        return entry[0] if entry else None
+
+    def get(self, path: str) -> AymurAIPipeline:
+        """
+        Get a pipeline, loading it if needed.
+
+        Args:
+            path (str): pipeline path
+
+        Returns:
+            AymurAIPipeline: pipeline
+        """
+        key = self._key(path)
+
+        with self._lock:
+            pipeline = self._lookup(key)
+            if pipeline is not None:
+                self._stats[key]["hits"] += 1
+                return pipeline
+
+        with self._load_lock:
+            # it could have been loaded while waiting for the lock
+            with self._lock:
+                pipeline = self._lookup(key)
+                if pipeline is not None:
+                    self._stats[key]["hits"] += 1
+                    return pipeline
+                self._stats[key]["misses"] += 1
+
+            pipeline, size = self._load(key)
+
+            with self._lock:
+                if key in self.pinned:
+                    self._pinned[key] = pipeline
+                else:
+                    try:
+                        self._cache[key] = (pipeline, size)
+                    except ValueError:
+                        logger.warning(
+                            f"pipeline bigger than the cache ({size / MB:.1f} MB),"
+                            f" it will not be cached: {key}"
+                        )
+
+        return pipeline
+
+    def _load(self, key: str) -> tuple[AymurAIPipeline, int]:
+        process = psutil.Process()
+
+        gc.collect()
+        rss = process.memory_info().rss
+        start = time.perf_counter()
+
+        pipeline = AymurAIPipeline.load(key)
+
+        elapsed = time.perf_counter() - start
+        size = max(process.memory_info().rss - rss, 1)
+
+        logger.info(f"pipeline loaded in {elapsed:.2f}s ({size / MB:.1f} MB): {key}")
+
+        with self._lock:
+            stats = self._stats[key]
+            stats["loads"] += 1
+            stats["load_seconds"] += elapsed
+            stats["last_load_seconds"] = elapsed
+            stats["size_mb"] = size / MB
+
+        return pipeline, size
+
+    def _evicted(self, key: str, entry: tuple[AymurAIPipeline, int]):
+        logger.info(f"pipeline evicted from memory: {key}")
+        self._stats[key]["evictions"] += 1
+
+    def stats(self) -> dict:
+        """
+        Registry metrics: hits, misses, load times and memory per pipeline
+
+        Returns:
+            dict: registry stats
+        """
+        with self._lock:
+            pipelines = {
+                key: {
+                    "pinned": key in self.pinned,
+                    "resident": key in self._pinned or key in self._cache,
+                    **stats,
+                }
+                for key, stats in self._stats.items()
+            }
+            return {
+                "max_size_mb": self.max_size_mb,
+                "cached_size_mb": self._cache.currsize / MB,
+                "pipelines": pipelines,
+            }
@@ -0,0 +1,342 @@
+import os
+import math
+import time
+import queue
+import asyncio
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.meta.types import DataItem
+from aymurai.api.utils import load_pipeline
+from aymurai.api.exceptions import ServiceOverloaded
+
+logger = get_logger(__name__)
+
+
+class SchedulerOverloaded(Exception):
+    """The scheduler queue is full"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InferenceScheduler(object):
+    """
+    Dynamic micro-batching scheduler in front of an AymurAI pipeline.
+
+    Incoming items are queued and grouped into batches of up to `max_batch_size`
+    items, waiting at most `max_wait_ms` for the batch to fill. Each batch runs
+    through the pipeline in one pass, on a dedicated pool of `n_workers` threads,
+    and the future of every caller is resolved with its own item.
+    """
+
+    def __init__(
+        self,
+        pipeline_path: str,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10,
+        n_workers: int = 1,
+        max_queue_size: int = 0,
+    ):
+        """
+        Args:
+            pipeline_path (str): path of the pipeline to run.
+            max_batch_size (int, optional): max number of items per batch.
+                Defaults to 16.
+            max_wait_ms (float, optional): max time to wait for a batch to fill
+                (in milliseconds). Defaults to 10.
+            n_workers (int, optional): number of worker threads. Defaults to 1.
+            max_queue_size (int, optional): max number of pending items. New items
+                are rejected when the queue is full. Defaults to 0 (unbounded).
+        """
+        self.pipeline_path = pipeline_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.n_workers = n_workers
+        self.max_queue_size = max_queue_size
+
+        self._queue: queue.Queue[tuple[DataItem, Future] | None] = queue.Queue()
+        self._workers: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        # metrics
+        self._batch_sizes = Counter()
+        self._n_items = 0
+        self._n_rejected = 0
+        self._busy_s = 0.0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(os.path.normpath(self.pipeline_path))
+
+    def start(self):
+        """
+        Start the worker threads (if not running)
+        """
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            if len(self._workers) >= self.n_workers:
+                return
+
+            logger.info(f"starting inference scheduler: {self.name}")
+            for i in range(len(self._workers), self.n_workers):
+                worker = threading.Thread(
+                    target=self._run,
+                    name=f"inference-scheduler-{self.name}-{i}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stop the worker threads once the queued items are processed
+        """
+        with self._lock:
+            workers = [worker for worker in self._workers if worker.is_alive()]
+            self._workers = []
+
+        if workers:
+            logger.info(f"stopping inference scheduler: {self.name}")
+
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join(timeout=timeout)
+
+    def retry_after(self) -> int:
+        """
+        Estimate the seconds needed to drain the current queue
+
+        Returns:
+            int: seconds
+        """
+        n_batches = sum(self._batch_sizes.values())
+        if not n_batches:
+            return 1
+
+        mean_batch_s = self._busy_s / n_batches
+        batches_ahead = math.ceil(self._pending / self.max_batch_size) / self.n_workers
+
+        return max(1, math.ceil(batches_ahead * mean_batch_s))
+
+    def submit_many(self, items: list[DataItem]) -> list[Future]:
+        """
+        Queue a group of items. Big groups are split between batches.
+
+        Args:
+            items (list[DataItem]): items to run through the pipeline
+
+        Raises:
+            SchedulerOverloaded: the queue is full
+
+        Returns:
+            list[Future]: one future per item, resolved with the processed item
+        """
+        self.start()
+
+        group = [(item, Future()) for item in items]
+        if not group:
+            return []
+
+        with self._lock:
+            # a group bigger than the queue is only accepted on an empty queue
+            if (
+                self.max_queue_size
+                and self._pending
+                and self._pending + len(group) > self.max_queue_size
+            ):
+                self._n_rejected += len(group)
+                raise SchedulerOverloaded(
+                    f"inference queue is full ({self._pending} pending items)",
+                    retry_after=self.retry_after(),
+                )
+            self._pending += len(group)
+
+        for entry in group:
+            self._queue.put(entry)
+
+        return [future for _, future in group]
+
+    def submit(self, item: DataItem) -> Future:
+        """
+        Queue a single item.
+
+        Args:
+            item (DataItem): item to run through the pipeline
+
+        Returns:
+            Future: resolved with the processed item
+        """
+        return self.submit_many([item])[0]
+
+    def _collect(self) -> list[tuple[DataItem, Future]] | None:
+        """
+        Block until an item arrives, then keep collecting until the batch is full
+        or the deadline expires. Returns None when the scheduler is stopped.
+        """
+        entry = self._queue.get()
+        if entry is None:
+            return None
+
+        batch = [entry]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            if entry is None:
+                # process what we have, then stop
+                self._queue.put(None)
+                break
+
+            batch.append(entry)
+
+        return batch
+
+    def _run(self):
+        while (batch := self._collect()) is not None:
+            with self._lock:
+                self._pending -= len(batch)
+
+            # drop cancelled requests
+            batch = [
+                (item, future)
+                for item, future in batch
+                if future.set_running_or_notify_cancel()
+            ]
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: list[tuple[DataItem, Future]]):
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+
+        start = time.perf_counter()
+        try:
+            pipeline = load_pipeline(self.pipeline_path)
+            processed = pipeline.preprocess(items)
+            processed = pipeline.predict(processed)
+            processed = pipeline.postprocess(processed)
+        except Exception as error:
+            logger.error(f"error while processing batch ({len(batch)} items): {error}")
+            for future in futures:
+                future.set_exception(error)
+            return
+        finally:
+            self._busy_s += time.perf_counter() - start
+            self._batch_sizes[len(batch)] += 1
+            self._n_items += len(batch)
+
+        if len(processed) != len(futures):
+            # the callers of the missing items would wait forever
+            error = RuntimeError(
+                f"pipeline returned {len(processed)} items for a batch"
+                f" of {len(futures)}"
+            )
+            logger.error(f"error while processing batch: {error}")
+            for future in futures:
+                future.set_exception(error)
+            return
+
+        for future, item in zip(futures, processed):
+            future.set_result(item)
+
+    def stats(self) -> dict:
+        """
+        Scheduler metrics: queue depth and batch size histogram
+
+        Returns:
+            dict: scheduler stats
+        """
+        n_batches = sum(self._batch_sizes.values())
+        return {
+            "running_workers": sum(worker.is_alive() for worker in self._workers),
+            "queue_depth": self._pending,
+            "max_queue_size": self.max_queue_size,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "n_batches": n_batches,
+            "n_items": self._n_items,
+            "n_rejected": self._n_rejected,
+            "mean_batch_size": self._n_items / n_batches if n_batches else 0,
+            "busy_seconds": self._busy_s,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+        }
+
+
+_schedulers: dict[str, InferenceScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(pipeline_path: str) -> InferenceScheduler:
+    """
+    Get the (process wide) inference scheduler of a pipeline
+
+    Args:
+        pipeline_path (str): path of the pipeline
+
+    Returns:
+        InferenceScheduler: scheduler
+    """
+    with _schedulers_lock:
+        if pipeline_path not in _schedulers:
+            _schedulers[pipeline_path] = InferenceScheduler(
+                pipeline_path,
+                max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+                max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+                n_workers=settings.INFERENCE_WORKERS,
+                max_queue_size=settings.INFERENCE_MAX_QUEUE_SIZE,
+            )
+        return _schedulers[pipeline_path]
+
+
+async def run_inference(pipeline_path: str, items: list[DataItem]) -> list[DataItem]:
+    """
+    Run items through the inference scheduler of a pipeline without blocking
+    the event loop.
+
+    Args:
+        pipeline_path (str): path of the pipeline
+        items (list[DataItem]): items to process
+
+    Raises:
+        ServiceOverloaded: the scheduler queue is full
+
+    Returns:
+        list[DataItem]: processed items
+    """
+    scheduler = get_scheduler(pipeline_path)
+
+    try:
+        futures = scheduler.submit_many(items)
+    except SchedulerOverloaded as error:
+        logger.warning(f"{scheduler.name}: {error}")
+        raise ServiceOverloaded(detail=str(error), retry_after=error.retry_after)
+
+    return list(await asyncio.gather(*map(asyncio.wrap_future, futures)))
+
+
+def get_schedulers_stats() -> dict:
+    with _schedulers_lock:
+        return {scheduler.name: scheduler.stats() for scheduler in _schedulers.values()}
+
+
+def stop_schedulers(timeout: float | None = None):
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+
+    for scheduler in schedulers:
+        scheduler.stop(timeout=timeout)
@@ -0,0 +1,249 @@
+"""
+Pre-fork server for the AymurAI API.
+
+The production pipelines are loaded once in the parent process, then the
+workers are forked and share the model weights copy-on-write. All the workers
+accept connections from the same listening socket. TensorFlow models (USEM) are
+not fork-safe: they are loaded by each worker on first use (see the warm-up).
+
+The database migrations also run once, in the parent. The LibreOffice pool, the
+extraction pool and the job queue threads are started by each worker, so their
+sizes (`LIBREOFFICE_POOL_SIZE`, `EXTRACTION_WORKERS` and `JOB_WORKERS`) are
+budgets for the whole server, split between the workers.
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import argparse
+
+import psutil
+import uvicorn
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.api.jobs import job_queue
+from aymurai.utils.memory import memory_info
+from aymurai.api.utils import preload_pipelines
+from aymurai.api.libreoffice import libreoffice_pool
+from aymurai.database.session import dispose_engine
+from aymurai.api.extraction_pool import extraction_pool
+from aymurai.api.startup.database import run_migrations, check_db_connection
+
+logger = get_logger(__name__)
+
+
+def split_budget(total: int, workers: int) -> int:
+    """
+    Share of a server-wide budget (e.g. pool size) for each worker: at least
+    one, unless the budget is 0 (disabled)
+
+    Args:
+        total (int): server budget
+        workers (int): number of workers
+
+    Returns:
+        int: worker budget
+    """
+    if total <= 0:
+        return 0
+    return max(1, -(-total // workers))
+
+
+def log_memory_report(parent: int, workers: list[int]):
+    """
+    Log the unique vs shared memory of the parent and its workers
+
+    Args:
+        parent (int): parent process id
+        workers (list[int]): workers process ids
+    """
+    logger.info("memory report (MB):")
+    total_uss = 0
+    for role, pid in [("parent", parent)] + [("worker", pid) for pid in workers]:
+        try:
+            info = memory_info(pid)
+        except (psutil.NoSuchProcess, psutil.AccessDenied) as error:
+            logger.warning(f"{role} {pid}: {error}")
+            continue
+
+        total_uss += info["uss_mb"]
+        logger.info(
+            f"{role:>6} {pid:>7} |"
+            f" rss: {info['rss_mb']:9.1f} |"
+            f" uss: {info['uss_mb']:9.1f} |"
+            f" pss: {info['pss_mb']:9.1f} |"
+            f" shared: {info['shared_mb']:9.1f}"
+        )
+    logger.info(f"total unique memory: {total_uss:.1f}")
+
+
+class PreforkServer(object):
+    def __init__(
+        self,
+        app: str = "aymurai.api.main:api",
+        host: str = "0.0.0.0",
+        port: int = 8899,
+        workers: int = 1,
+        preload: bool = True,
+        memory_report_delay: float = 10,
+    ):
+        """
+        Args:
+            app (str, optional): ASGI app import string.
+                Defaults to "aymurai.api.main:api".
+            host (str, optional): bind host. Defaults to "0.0.0.0".
+            port (int, optional): bind port. Defaults to 8899.
+            workers (int, optional): number of worker processes. Defaults to 1.
+            preload (bool, optional): load the production pipelines in the parent
+                process before forking. Defaults to True.
+            memory_report_delay (float, optional): seconds to wait after the
+                workers start before logging the memory report. Defaults to 10.
+        """
+        self.config = uvicorn.Config(app, host=host, port=port)
+        self.workers = workers
+        self.preload = preload
+        self.memory_report_delay = memory_report_delay
+
+        self._pids: set[int] = set()
+        self._should_exit = False
+
+    def run(self):
+        # once for all the workers (their lifespan skips them)
+        try:
+            check_db_connection()
+            run_migrations()
+        except Exception as error:
+            logger.error(f"could not run the database migrations: {error}")
+
+        if self.preload:
+            preload_pipelines()
+
+        # import the app once, so the workers share the loaded modules too
+        self.config.load()
+
+        if self.workers <= 1 or not hasattr(os, "fork"):
+            uvicorn.Server(self.config).run()
+            return
+
+        sock = self.config.bind_socket()
+
+        # SQLite connections must not cross a fork: close the pooled ones here,
+        # each worker opens its own
+        dispose_engine()
+
+        # move everything allocated so far to the permanent generation, so the
+        # garbage collector of the workers does not touch (and copy) those pages
+        gc.freeze()
+
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGTERM, self._handle_exit)
+
+        logger.info(f"starting {self.workers} workers (parent: {os.getpid()})")
+        for _ in range(self.workers):
+            self._spawn(sock)
+
+        report_at = time.monotonic() + self.memory_report_delay
+        while not self._should_exit:
+            self._reap(sock)
+
+            if report_at and time.monotonic() > report_at:
+                log_memory_report(os.getpid(), sorted(self._pids))
+                report_at = None
+
+            time.sleep(0.5)
+
+        self._shutdown()
+        sock.close()
+
+    def _spawn(self, sock):
+        pid = os.fork()
+        if pid:
+            self._pids.add(pid)
+            return
+
+        # worker process
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        # drop (without closing) any engine inherited from the parent, its
+        # connections belong to the parent
+        dispose_engine(close=False)
+
+        # each worker starts its own pools, within the server budgets
+        libreoffice_pool.size = split_budget(libreoffice_pool.size, self.workers)
+        extraction_pool.size = split_budget(extraction_pool.size, self.workers)
+        job_queue.n_workers = split_budget(job_queue.n_workers, self.workers)
+
+        code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[sock])
+        except BaseException as error:
+            logger.error(f"worker {os.getpid()} failed: {error}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _reap(self, sock):
+        """
+        Collect the dead workers and replace them
+        """
+        while self._pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                break
+
+            self._pids.discard(pid)
+            if self._should_exit:
+                continue
+
+            logger.warning(f"worker {pid} died (status: {status}), restarting")
+            self._spawn(sock)
+
+    def _handle_exit(self, sig, frame):
+        self._should_exit = True
+
+    def _shutdown(self):
+        logger.info("stopping workers")
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        for pid in list(self._pids):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            self._pids.discard(pid)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="AymurAI API server")
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    parser.add_argument("--workers", type=int, default=settings.API_WORKERS)
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=settings.API_PRELOAD_PIPELINES,
+        help="load the production pipelines before forking the workers",
+    )
+    parser.add_argument("--memory-report-delay", type=float, default=10)
+    args = parser.parse_args(argv)
+
+    server = PreforkServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        preload=args.preload,
+        memory_report_delay=args.memory_report_delay,
+    )
+    server.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,20 @@
 import os
 import logging
 
-from sqlmodel import select
+from sqlmodel import Session, select
 from tenacity import retry, after_log, before_log, wait_fixed, stop_after_attempt
 
 from aymurai.settings import settings
-from aymurai.database.session import get_session
+from aymurai.database.session import get_engine
 
 logger = logging.getLogger(__name__)
 
 max_tries = 60 * 5  # 5 minutes
 wait_seconds = 1
 
+# set once the migrations ran, the forked API workers inherit it
+_migrated = False
+
 
 @retry(
     stop=stop_after_attempt(max_tries),
@@ -29,9 +32,28 @@ def check_db_connection():
             os.makedirs(os.path.dirname(db_file), exist_ok=True)
 
     try:
-        session = next(get_session())
-        session.exec(select(1))
+        with Session(get_engine()) as session:
+            session.exec(select(1))
 
     except Exception as e:
         logger.error(e)
         raise e
+
+
+def run_migrations():
+    """
+    Upgrade the database to the last Alembic revision, once per process tree:
+    the pre-fork server runs them in the parent, before forking the API workers
+    (see `aymurai.api.serve`)
+    """
+    global _migrated
+    if _migrated:
+        return
+
+    from alembic import command
+    from alembic.config import Config
+
+    logger.info("Running Alembic migrations")
+    alembic_cfg = Config(str(settings.ALEMBIC_INI_PATH))
+    command.upgrade(alembic_cfg, "head")
+    _migrated = True
@@ -0,0 +1,123 @@
+import time
+import threading
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+from aymurai.api.utils import load_pipeline, production_pipeline_path
+
+logger = get_logger(__name__)
+
+
+class WarmupState(object):
+    """
+    Progress of the startup warm-up of the production pipelines
+    """
+
+    def __init__(self):
+        self.status = "pending"
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.timings: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def set_status(self, status: str, error: str | None = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            if status == "running":
+                self.started_at = time.time()
+            elif status in ("ready", "failed"):
+                self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "status": self.status,
+                "error": self.error,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "timings": dict(self.timings),
+            }
+
+
+state = WarmupState()
+
+
+def warmup_pipeline(path: str, text: str) -> dict[str, float]:
+    """
+    Load a pipeline and run a synthetic paragraph through each stage
+
+    Args:
+        path (str): pipeline path
+        text (str): synthetic paragraph
+
+    Returns:
+        dict[str, float]: seconds spent on each stage
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    pipeline = load_pipeline(path)
+    timings["load"] = time.perf_counter() - start
+
+    data = [{"path": "warmup", "data": {"doc.text": text}}]
+    for stage in ["preprocess", "predict", "postprocess"]:
+        start = time.perf_counter()
+        data = getattr(pipeline, stage)(data)
+        timings[stage] = time.perf_counter() - start
+
+    return timings
+
+
+def warmup(names: list[str] | None = None, text: str | None = None):
+    """
+    Warm up the production pipelines, recording the timings on `state`
+
+    Args:
+        names (list[str] | None, optional): pipeline names.
+            Defaults to `settings.PRODUCTION_PIPELINES`.
+        text (str | None, optional): synthetic paragraph.
+            Defaults to `settings.WARMUP_TEXT`.
+    """
+    names = settings.PRODUCTION_PIPELINES if names is None else names
+    text = text or settings.WARMUP_TEXT
+
+    state.set_status("running")
+    try:
+        for name in names:
+            logger.info(f">> Warming up pipeline: {name}")
+            timings = warmup_pipeline(production_pipeline_path(name), text)
+            state.timings[name] = timings
+            logger.info(
+                f">> Pipeline warmed up: {name} ("
+                + ", ".join(f"{k}: {v:.2f}s" for k, v in timings.items())
+                + ")"
+            )
+    except Exception as error:
+        logger.error(f"Error while warming up the pipelines: {error}")
+        state.set_status("failed", error=str(error))
+        return
+
+    state.set_status("ready")
+
+
+def start_warmup() -> threading.Thread | None:
+    """
+    Start the warm-up in the background, so the liveness probe keeps answering.
+    When the warm-up is disabled the service is ready right away.
+
+    Returns:
+        threading.Thread | None: warm-up thread
+    """
+    if not settings.API_WARMUP:
+        state.set_status("ready")
+        return None
+
+    thread = threading.Thread(target=warmup, name="pipelines-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,21 +1,45 @@
-import cachetools
+import os
 
 from aymurai.logger import get_logger
 from aymurai.settings import settings
 from aymurai.pipeline import AymurAIPipeline
+from aymurai.api.registry import PipelineRegistry
 
 logger = get_logger(__name__)
 
 
-mem_cache = cachetools.TTLCache(
-    maxsize=settings.MEMORY_CACHE_MAXSIZE,
-    ttl=settings.MEMORY_CACHE_MAXSIZE,
-    getsizeof=lambda _: 0,
+RESOURCES_BASEPATH = settings.RESOURCES_BASEPATH
+
+
+def production_pipeline_path(name: str) -> str:
+    return os.path.join(RESOURCES_BASEPATH, "pipelines", "production", name)
+
+
+# production pipelines are pinned: they are never evicted, so the forked
+# workers keep sharing their memory
+registry = PipelineRegistry(
+    pinned=[production_pipeline_path(name) for name in settings.PRODUCTION_PIPELINES],
+    max_size_mb=settings.PIPELINE_CACHE_MAX_MB,
 )
 
-RESOURCES_BASEPATH = settings.RESOURCES_BASEPATH
 
+def load_pipeline(path: str) -> AymurAIPipeline:
+    return registry.get(path)
+
+
+def preload_pipelines(names: list[str] | None = None):
+    """
+    Load the production pipelines and keep them resident in memory
+
+    Args:
+        names (list[str] | None, optional): pipeline names.
+            Defaults to `settings.PRODUCTION_PIPELINES`.
+    """
+    names = settings.PRODUCTION_PIPELINES if names is None else names
+
+    for name in names:
+        path = production_pipeline_path(name)
 
-@cachetools.cached(cache=mem_cache)
-def load_pipeline(path: str):
-    return AymurAIPipeline.load(path)
+        logger.info(f"preloading pipeline: {name}")
+        registry.pin(path)
+        registry.get(path)
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlmodel import Session
+from sqlmodel import Session, select
 
 from aymurai.database.schema import (
     AnonymizationParagraph,
@@ -39,6 +39,40 @@ def anonymization_paragraph_read(
     return session.get(AnonymizationParagraph, paragraph_id)
 
 
+def anonymization_paragraph_batch_read(
+    paragraph_ids: list[uuid.UUID],
+    session: Session,
+) -> list[AnonymizationParagraph]:
+    if not paragraph_ids:
+        return []
+
+    statement = select(AnonymizationParagraph).where(
+        AnonymizationParagraph.id.in_(set(paragraph_ids))
+    )
+    return list(session.exec(statement).all())
+
+
+def anonymization_paragraph_batch_create(
+    paragraphs_in: list[AnonymizationParagraphCreate],
+    session: Session,
+) -> list[AnonymizationParagraph]:
+    """
+    Insert new paragraphs in a single transaction.
+    Paragraphs that already exist on the database are skipped.
+    """
+    paragraphs = [AnonymizationParagraph(**p_in.model_dump()) for p_in in paragraphs_in]
+    paragraphs = {paragraph.id: paragraph for paragraph in paragraphs}
+
+    existing = anonymization_paragraph_batch_read(list(paragraphs), session=session)
+    for paragraph in existing:
+        paragraphs.pop(paragraph.id, None)
+
+    session.add_all(paragraphs.values())
+    session.commit()
+
+    return list(paragraphs.values())
+
+
 def anonymization_paragraph_update(
     paragraph_id: uuid.UUID,
     paragraph_in: AnonymizationParagraphUpdate,
@@ -0,0 +1,60 @@
+import uuid
+from enum import Enum
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+from sqlmodel import Field, SQLModel
+from sqlalchemy import JSON, Column, text
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job(SQLModel, table=True):
+    __tablename__ = "job"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    kind: str = Field(nullable=False)
+    status: JobStatus = Field(JobStatus.PENDING, index=True)
+    # higher priority jobs run first
+    priority: int = Field(0, index=True)
+    cancel_requested: bool = Field(False)
+
+    filename: str | None = None
+    input_path: str | None = None
+    params: dict[str, Any] | None = Field(None, sa_column=Column(JSON))
+
+    result: Any | None = Field(None, sa_column=Column(JSON))
+    result_path: str | None = None
+    error: str | None = None
+
+    # `host:pid` of the process running the job, which renews `heartbeat_at`
+    # while it runs (see `aymurai.api.jobs.JobQueue`)
+    worker: str | None = None
+    heartbeat_at: datetime | None = None
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column_kwargs={"server_default": text("CURRENT_TIMESTAMP")},
+    )
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class JobRead(BaseModel):
+    id: uuid.UUID
+    kind: str
+    status: JobStatus
+    priority: int
+    cancel_requested: bool
+    filename: str | None
+    error: str | None
+
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
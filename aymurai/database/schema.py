@@ -29,3 +29,4 @@ from .meta.anonymization.document import (
 from .meta.datapublic.document_paragraph import (
     DataPublicDocumentParagraph,
 )
+from .meta.job import Job, JobRead, JobStatus
@@ -1,21 +1,122 @@
+from threading import Lock
 from typing import Generator
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlmodel import Session, create_engine
 
+from aymurai.logger import get_logger
 from aymurai.settings import settings
 
+logger = get_logger(__name__)
 
-def get_engine(echo: bool = False):
-    return create_engine(
-        str(settings.SQLALCHEMY_DATABASE_URI), pool_pre_ping=True, echo=echo
+_engine: Engine | None = None
+_engine_lock = Lock()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection of the pool.
+    Pragmas are per connection, so they must be applied on each `connect` event.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def create_db_engine(echo: bool = False) -> Engine:
+    """
+    Create a new engine with the connection pool configured on `Settings`.
+
+    Args:
+        echo (bool, optional): log all the statements. Defaults to False.
+
+    Returns:
+        Engine: sqlalchemy engine
+    """
+    db_uri = str(settings.SQLALCHEMY_DATABASE_URI)
+    is_sqlite = db_uri.startswith("sqlite")
+
+    engine = create_engine(
+        db_uri,
+        echo=echo,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        # connections are shared between the threadpool and the event loop
+        connect_args={"check_same_thread": False} if is_sqlite else {},
     )
 
+    if is_sqlite:
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+    return engine
+
+
+def get_engine() -> Engine:
+    """
+    Get the application-scoped engine. It is created on first use.
+
+    Returns:
+        Engine: sqlalchemy engine
+    """
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                logger.info("creating database engine")
+                _engine = create_db_engine(echo=settings.SQLALCHEMY_ECHO)
 
-def get_session(echo: bool = False) -> Generator:
-    engine = get_engine(echo=echo)
-    session = Session(engine)
-    try:
+    return _engine
+
+
+def dispose_engine(close: bool = True):
+    """
+    Close all the pooled connections and drop the application-scoped engine.
+
+    Args:
+        close (bool, optional): close the pooled connections. Use False in a
+            forked process, to drop the connections inherited from the parent
+            without touching them. Defaults to True.
+    """
+    global _engine
+
+    with _engine_lock:
+        if _engine is not None:
+            logger.info("disposing database engine")
+            _engine.dispose(close=close)
+            _engine = None
+
+
+def get_session() -> Generator:
+    with Session(get_engine()) as session:
         yield session
-    finally:
-        session.close()
-        engine.dispose()
+
+
+def get_pool_stats() -> dict:
+    """
+    Connection pool statistics of the application-scoped engine.
+
+    Returns:
+        dict: pool stats
+    """
+    pool = get_engine().pool
+
+    stats = {"pool_class": type(pool).__name__, "status": pool.status()}
+
+    # only available on QueuePool (and subclasses)
+    if hasattr(pool, "checkedout"):
+        stats |= {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+
+    return stats
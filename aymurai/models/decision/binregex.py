@@ -2,6 +2,7 @@ import os
 import shutil
 from copy import deepcopy
 
+import numpy as np
 import regex
 import torch
 from unidecode import unidecode
@@ -12,6 +13,7 @@ from aymurai.meta.pipeline_interfaces import TrainModule
 from aymurai.meta.types import DataBlock, DataItem
 from aymurai.models.decision.conv1d import Conv1dTextClassifier
 from aymurai.models.decision.tokenizer import Tokenizer
+from aymurai.models.quantization import quantize_model
 from aymurai.utils.download import download
 from aymurai.utils.misc import get_element, is_url
 
@@ -26,12 +28,28 @@ class DecisionConv1dBinRegex(TrainModule):
         device: str = "cpu",
         threshold: float = 0.88,
         return_only_with_detalle: bool = True,
+        quantize: bool = False,
     ):
+        """
+        Decision classifier (conv1d) of the paragraphs with a DETALLE entity
+
+        Args:
+            tokenizer_path (str): tokenizer path (or url)
+            model_checkpoint (str): model checkpoint path (or url)
+            device (str, optional): device where load model. Defaults to "cpu".
+            threshold (float, optional): decision probability threshold. Defaults to 0.88.
+            return_only_with_detalle (bool, optional): only label paragraphs with a DETALLE entity. Defaults to True.
+            quantize (bool, optional): dynamic int8 quantization of the model (CPU only, see `aymurai.models.quantization`). Defaults to False.
+        """  # noqa
+        if quantize and device != "cpu":
+            raise ValueError("quantized models run on cpu only")
+
         self._device = device
         self._tokenizer_path = tokenizer_path
         self._model_path = model_checkpoint
         self.threshold = threshold
         self.return_only_with_detalle = return_only_with_detalle
+        self.quantize = quantize
 
         # download if needed
         # tokenizer
@@ -54,6 +72,9 @@ class DecisionConv1dBinRegex(TrainModule):
             map_location=self._device,
         )
         self.model = self.model.eval()
+        if quantize:
+            # the convolutions stay in fp32
+            self.model = quantize_model(self.model)
 
     def save(self, basepath: str) -> dict | None:
         # save tokenizer
@@ -71,6 +92,7 @@ class DecisionConv1dBinRegex(TrainModule):
             "tokenizer_path": self._tokenizer_path,
             "model_checkpoint": self._model_path,
             "device": self._device,
+            "quantize": self.quantize,
         }
 
     @classmethod
@@ -86,9 +108,32 @@ class DecisionConv1dBinRegex(TrainModule):
         pass
 
     def predict(self, data: DataBlock) -> DataBlock:
-        # FIXME: optimize
-        logger.warn("predict not optimized")
-        return [self.predict_single(item) for item in data]
+        if not data:
+            return data
+
+        texts = [unidecode(item["data"]["doc.text"]) for item in data]
+        probs = self.predict_proba(texts)
+
+        return [
+            self.add_decision(item, text=text, prob=prob)
+            for item, text, prob in zip(data, texts, probs)
+        ]
+
+    def predict_proba(self, texts: list[str]) -> np.ndarray:
+        """
+        Decision probability (category 1) of a batch of texts, in a single forward pass.
+
+        Args:
+            texts (list[str]): texts to classify
+
+        Returns:
+            np.ndarray: decision probabilities
+        """
+        input_ids = self.tokenizer.encode_batch(texts).to(self.model.device)
+        with torch.no_grad():
+            log_prob = self.model(input_ids).exp()
+        # using category 1 as global score (binary)
+        return log_prob.detach().numpy()[:, 1]
 
     def get_subcategory(self, text):
         pattern_no_hace_lugar = regex.compile(
@@ -122,15 +167,13 @@ class DecisionConv1dBinRegex(TrainModule):
         return ent
 
     def predict_single(self, item: DataItem) -> DataItem:
-        item = deepcopy(item)
+        text = unidecode(item["data"]["doc.text"])
+        prob = self.predict_proba([text])[0]
 
-        text = item["data"]["doc.text"]
-        text = unidecode(text)
-        input_ids = self.tokenizer.encode_batch([text]).to(self.model.device)
-        with torch.no_grad():
-            log_prob = self.model(input_ids).exp()
-        # using category 1 as global score (binary)
-        prob = log_prob.detach().numpy()[0, 1]
+        return self.add_decision(item, text=text, prob=prob)
+
+    def add_decision(self, item: DataItem, text: str, prob: float) -> DataItem:
+        item = deepcopy(item)
 
         category = int(prob > self.threshold)
         score = prob
@@ -15,11 +15,14 @@ from aymurai.utils.download import download
 from aymurai.meta.types import DataItem, DataBlock
 from aymurai.meta.pipeline_interfaces import TrainModule
 from aymurai.meta.entities import Entity, EntityAttributes
+from aymurai.models.quantization import quantize_model
 
 flair.logger.setLevel(logging.ERROR)
 
 logger = get_logger(__name__)
 
+BACKENDS = ["torch", "onnx"]
+
 
 class FlairModel(TrainModule):
     def __init__(
@@ -28,6 +31,11 @@ class FlairModel(TrainModule):
         split_doc: bool = False,
         device: str = "cpu",
         use_tokenizer: bool = False,
+        batch_size: int = 32,
+        backend: str = "torch",
+        onnx_path: str | None = None,
+        onnx_threads: int | None = None,
+        quantize: bool = False,
     ):
         """
         Flair NER model module
@@ -37,13 +45,28 @@ class FlairModel(TrainModule):
             split_doc (bool, optional): split document on sentences. Defaults to False.
             device (str, optional): device where load model. Defaults to "cpu".
             use_tokenizer(bool, optional): whether to use custom tokenizer. Defaults to False.
+            batch_size (int, optional): mini batch size used on batch prediction. Defaults to 32.
+            backend (str, optional): inference backend, `torch` or `onnx` (ONNX Runtime, see `aymurai.models.flair.onnx`). Defaults to "torch".
+            onnx_path (str, optional): directory of the ONNX export, exported on the first load if missing. Defaults to the cache directory.
+            onnx_threads (int, optional): intra-op threads of the ONNX Runtime sessions. Defaults to ONNX Runtime choice.
+            quantize (bool, optional): dynamic int8 quantization of the linear and embedding layers (CPU only, see `aymurai.models.quantization`), or of the ONNX models with the `onnx` backend. Defaults to False.
         """  # noqa
         self.basepath = basepath
         self.split_doc = split_doc
         self.device = device
         self.use_tokenizer = use_tokenizer
+        self.batch_size = batch_size
         self.offset = 10
 
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be in {BACKENDS}")
+        self.backend = backend
+        self.onnx_threads = onnx_threads
+
+        if quantize and device != "cpu":
+            raise ValueError("quantized models run on cpu only")
+        self.quantize = quantize
+
         # load model
         if is_url(url := basepath):
             basepath = os.getenv("AYMURAI_CACHE_BASEPATH", "/resources/cache/aymurai")
@@ -53,8 +76,30 @@ class FlairModel(TrainModule):
             self._model_path = download(url, output=model_path)
         else:
             model_path = basepath
-        logger.info(f"loading model from {model_path}")
-        self.model = SequenceTagger.load(model_path)
+        self._source_path = model_path
+
+        if backend == "onnx":
+            from aymurai.models.flair import onnx
+
+            self.onnx_path = onnx_path or os.path.join(
+                os.getenv("AYMURAI_CACHE_BASEPATH", "/resources/cache/aymurai"),
+                self.__name__,
+                "onnx",
+                re.sub(r"[^\w.-]+", "-", self.basepath),
+            )
+            if not onnx.is_exported(self.onnx_path, source=model_path):
+                onnx.export_tagger(model_path, self.onnx_path)
+            if quantize and not onnx.is_exported(self.onnx_path, quantized=True):
+                onnx.quantize_export(self.onnx_path)
+            self.model = onnx.load_tagger(
+                self.onnx_path, threads=onnx_threads, quantized=quantize
+            )
+        else:
+            self.onnx_path = onnx_path
+            logger.info(f"loading model from {model_path}")
+            self.model = SequenceTagger.load(model_path)
+            if quantize:
+                self.model = quantize_model(self.model)
 
     @property
     def device(self):
@@ -71,9 +116,31 @@ class FlairModel(TrainModule):
 
         filename = f"{path}/model.pt"
 
+        model = self.model
+        if self.quantize or self.backend == "onnx":
+            # the source tagger: int8 weights do not load back in a fp32 tagger,
+            # and the ONNX tagger cannot be exported again
+            model = SequenceTagger.load(self._source_path)
+
         logger.info(f"saving model on {filename}")
-        self.model.save(filename)
-        return {"basepath": self.basepath, "device": self.device}
+        model.save(filename)
+
+        if self.backend == "onnx":
+            from aymurai.models.flair import onnx
+
+            # the export goes along with the saved model (the source of the
+            # reloaded model), so it is not exported again
+            self.onnx_path = onnx.copy_export(
+                self.onnx_path, f"{path}/onnx", source=self.basepath
+            )
+
+        return {
+            "basepath": self.basepath,
+            "device": self.device,
+            "backend": self.backend,
+            "onnx_path": self.onnx_path,
+            "quantize": self.quantize,
+        }
 
     @classmethod
     def load(cls, path: str, **kwargs):
@@ -84,34 +151,32 @@ class FlairModel(TrainModule):
 
     def predict(self, data: DataBlock) -> DataBlock:
         logger.info("flair batch prediction")
-        # data = [self.predict_single(item) for item in data]
-
-        # return data
         data = deepcopy(data)
 
-        docs = [item["data"]["doc.text"] for item in data]
+        docs = [self.split_sentences(item["data"]["doc.text"]) for item in data]
 
-        sentences = [Sentence(sent, use_tokenizer=self.use_tokenizer) for sent in docs]
+        # all the sentences of the block are predicted in a single (mini-batched) call
+        sentences = [
+            Sentence(sent, use_tokenizer=self.use_tokenizer)
+            for sents in docs
+            for sent in sents
+        ]
+        self.model.predict(sentences, mini_batch_size=self.batch_size)
+        ents = [self.format_entities(sent.get_spans("ner")) for sent in sentences]
 
-        self.model.predict(sentences)
-        sentences = [sentence.get_spans("ner") for sentence in sentences]
+        offset = 0
+        for item, sents in zip(data, docs):
+            doc_ents = self.merge_entities(ents[offset : offset + len(sents)], sents)
+            offset += len(sents)
 
-        ents = map(self.format_entities, sentences)
-        ents = list(ents)
+            if "predictions" not in item:
+                item["predictions"] = {}
 
-        data = [self.set_ents(item, ents_) for item, ents_ in zip(data, ents)]
+            # overwrite predictions entities
+            item["predictions"]["entities"] = doc_ents
 
         return data
 
-    def set_ents(self, item: DataItem, ents: list[dict]) -> DataItem:
-        item = deepcopy(item)
-        if "predictions" not in item:
-            item["predictions"] = {}
-
-        # overwrite predictions entities
-        item["predictions"]["entities"] = list(ents)
-        return item
-
     def format_entity(self, sentence: Sentence) -> dict:
         """
         format single flair entity to aymurai format
@@ -181,31 +246,36 @@ class FlairModel(TrainModule):
 
         return [self.format_entity(sentence) for sentence in sentences]
 
-    def predict_single(self, item: DataItem) -> DataItem:
-        item = deepcopy(item)
+    def split_sentences(self, doc: str) -> list[str]:
+        """
+        split document on sentences (if `split_doc` is enabled)
 
-        doc = item["data"]["doc.text"]
+        Args:
+            doc (str): document text
+
+        Returns:
+            list[str]: sentences
+        """
+        return doc.splitlines() if self.split_doc else [doc]
+
+    def merge_entities(
+        self, ents: list[list[dict]], sentences: list[str]
+    ) -> list[dict]:
+        """
+        merge the entities of each sentence, fixing their spans indices
+        (start/end) to the original document
 
-        sentences = doc.splitlines() if self.split_doc else [doc]
+        Args:
+            ents (list[list[dict]]): entities of each sentence
+            sentences (list[str]): sentences of the document
 
+        Returns:
+            list[dict]: document entities
+        """
         # number of tokens and characters per line
         n_tokens = [len(line.split()) for line in sentences]
         n_chars = [len(line) for line in sentences]
 
-        sentences = [
-            Sentence(
-                sent,
-                use_tokenizer=self.use_tokenizer,
-            )
-            for sent in sentences
-        ]
-
-        self.model.predict(sentences)
-        sentences = [sentence.get_spans("ner") for sentence in sentences]
-
-        ents = map(self.format_entities, sentences)
-        ents = list(ents)
-
         # fix entities spans indices (start/end) to the original document
         accumulated_tokens = np.cumsum(n_tokens)
         for i, _ in enumerate(accumulated_tokens):
@@ -229,10 +299,29 @@ class FlairModel(TrainModule):
         ents = filter(bool, ents)
         ents = collapse(ents, base_type=dict)
 
+        return list(ents)
+
+    def predict_single(self, item: DataItem) -> DataItem:
+        item = deepcopy(item)
+
+        doc = item["data"]["doc.text"]
+
+        sentences = self.split_sentences(doc)
+        flair_sentences = [
+            Sentence(
+                sent,
+                use_tokenizer=self.use_tokenizer,
+            )
+            for sent in sentences
+        ]
+
+        self.model.predict(flair_sentences)
+        ents = [self.format_entities(sent.get_spans("ner")) for sent in flair_sentences]
+
         if "predictions" not in item:
             item["predictions"] = {}
 
         # overwrite predictions entities
-        item["predictions"]["entities"] = list(ents)
+        item["predictions"]["entities"] = self.merge_entities(ents, sentences)
 
         return item
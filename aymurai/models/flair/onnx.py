@@ -0,0 +1,433 @@
+"""
+ONNX Runtime backend of the Flair sequence taggers.
+
+The transformer embeddings of a tagger are exported with Flair (`export_onnx`)
+and its head (reprojection, RNN, linear layer and CRF emissions) with
+`torch.onnx`. Flair still tokenizes the sentences and decodes the tags (e.g.
+the Viterbi decoding of the CRF), so the predictions keep their format.
+
+An export can also be quantized (`--quantize`): ONNX Runtime dynamic int8
+quantization of its matrix multiplications, embedding lookups and RNN, next to
+the fp32 models.
+
+Usage:
+    python -m aymurai.models.flair.onnx aymurai/anonymizer-beto-cased-flair \
+        /resources/cache/aymurai/FlairModel/onnx/anonymizer-beto-cased-flair
+"""
+
+import os
+import json
+import shutil
+import argparse
+from functools import partial
+
+import flair
+import torch
+import numpy as np
+from flair.data import Sentence
+from flair.models import SequenceTagger
+
+from aymurai.logger import get_logger
+
+logger = get_logger(__name__)
+
+TAGGER_FILENAME = "model.pt"
+EMBEDDINGS_FILENAME = "embeddings.onnx"
+HEAD_FILENAME = "head.onnx"
+METADATA_FILENAME = "export.json"
+QUANTIZED_SUFFIX = ".int8.onnx"
+
+# sentences to trace the embeddings
+EXAMPLE_SENTENCES = [
+    "En la Ciudad de Buenos Aires, a los 17 días del mes de noviembre de 2024.",
+    "Acusado: Ramiro Marrón DNI 34.555.666, domiciliado en Av. Corrientes 1234.",
+    "RESUELVO:",
+]
+
+
+def _import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError(
+            "the ONNX backend of the Flair models needs `onnxruntime`"
+            ' (pip install "aymurai[onnx]")'
+        )
+    return onnxruntime
+
+
+class _TaggerHead(torch.nn.Module):
+    """
+    Layers of a sequence tagger after the embeddings, in inference mode (see
+    `SequenceTagger.forward`). The RNN runs without packing, on a single
+    sentence at a time.
+    """
+
+    def __init__(self, tagger: SequenceTagger):
+        super().__init__()
+        reproject = tagger.reproject_embeddings
+        self.embedding2nn = tagger.embedding2nn if reproject else None
+        self.rnn = tagger.rnn if tagger.use_rnn else None
+        self.linear = tagger.linear
+        self.crf = tagger.crf if tagger.use_crf else None
+
+    def forward(self, sentence_tensor: torch.Tensor) -> torch.Tensor:
+        features = sentence_tensor
+        if self.embedding2nn is not None:
+            features = self.embedding2nn(features)
+        if self.rnn is not None:
+            features, _ = self.rnn(features)
+        features = self.linear(features)
+        if self.crf is not None:
+            features = self.crf(features)
+        return features
+
+
+def _quantized(filename: str) -> str:
+    return filename.replace(".onnx", QUANTIZED_SUFFIX)
+
+
+def is_exported(path: str, source: str | None = None, quantized: bool = False) -> bool:
+    """
+    Whether a directory holds an exported tagger (of a given source model)
+
+    Args:
+        path (str): export directory
+        source (str | None, optional): source model. Defaults to None.
+        quantized (bool, optional): check the quantized models too.
+            Defaults to False.
+
+    Returns:
+        bool: the export is complete (and of the source model)
+    """
+    try:
+        with open(os.path.join(path, METADATA_FILENAME)) as file:
+            metadata = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+
+    if source is not None and metadata.get("source") != source:
+        return False
+    if quantized:
+        filenames = [EMBEDDINGS_FILENAME, HEAD_FILENAME]
+        return all(os.path.exists(os.path.join(path, _quantized(f))) for f in filenames)
+    return True
+
+
+def export_tagger(model_path: str, output_dir: str, opset_version: int = 14) -> str:
+    """
+    Export the embeddings and the head of a Flair sequence tagger to ONNX
+
+    Args:
+        model_path (str): tagger path (or Hugging Face model)
+        output_dir (str): export directory
+        opset_version (int, optional): ONNX opset. Defaults to 14.
+
+    Raises:
+        ValueError: if the tagger does not use transformer embeddings
+
+    Returns:
+        str: export directory
+    """
+    _import_onnxruntime()
+
+    logger.info(f"exporting flair tagger {model_path} to ONNX ({output_dir})")
+    tagger = SequenceTagger.load(model_path)
+    tagger.eval()
+
+    # (flair `TransformerEmbeddings`)
+    if not hasattr(tagger.embeddings, "export_onnx"):
+        raise ValueError(
+            "only taggers with transformer embeddings can be exported,"
+            f" got {type(tagger.embeddings).__name__}"
+        )
+    if getattr(tagger, "train_initial_hidden_state", False):
+        raise ValueError("taggers with a trained initial RNN state are not supported")
+
+    # exported next to the output, then moved in place, so a concurrent load
+    # never finds a partial export
+    tmp_dir = f"{output_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    try:
+        sentences = [Sentence(text) for text in EXAMPLE_SENTENCES]
+        tagger.embeddings = tagger.embeddings.export_onnx(
+            os.path.join(tmp_dir, EMBEDDINGS_FILENAME),
+            sentences,
+            providers=["CPUExecutionProvider"],
+            opset_version=opset_version,
+        )
+
+        head = _TaggerHead(tagger).eval()
+        example = torch.zeros(1, 8, tagger.embeddings.embedding_length)
+        with torch.no_grad():
+            torch.onnx.export(
+                head,
+                (example,),
+                os.path.join(tmp_dir, HEAD_FILENAME),
+                input_names=["sentence_tensor"],
+                output_names=["features"],
+                dynamic_axes={
+                    "sentence_tensor": {0: "batch", 1: "tokens"},
+                    "features": {0: "batch", 1: "tokens"},
+                },
+                opset_version=opset_version,
+            )
+
+        tagger.save(os.path.join(tmp_dir, TAGGER_FILENAME))
+
+        metadata = {
+            "source": model_path,
+            "flair": flair.__version__,
+            "torch": torch.__version__,
+            "opset_version": opset_version,
+            "rnn": tagger.use_rnn,
+            "crf": tagger.use_crf,
+        }
+        with open(os.path.join(tmp_dir, METADATA_FILENAME), "w") as file:
+            json.dump(metadata, file, indent=4)
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(os.path.dirname(os.path.abspath(output_dir)), exist_ok=True)
+        os.replace(tmp_dir, output_dir)
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    logger.info(f"flair tagger exported to {output_dir}")
+    return output_dir
+
+
+def copy_export(path: str, output_dir: str, source: str) -> str:
+    """
+    Copy an exported tagger (e.g. next to a saved pipeline), recording its new
+    source model
+
+    Args:
+        path (str): export directory
+        output_dir (str): directory of the copy
+        source (str): source model of the copy
+
+    Returns:
+        str: directory of the copy
+    """
+    tmp_dir = f"{output_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    try:
+        shutil.copytree(path, tmp_dir)
+
+        metadata_path = os.path.join(tmp_dir, METADATA_FILENAME)
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+        metadata["source"] = source
+        with open(metadata_path, "w") as file:
+            json.dump(metadata, file, indent=4)
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(tmp_dir, output_dir)
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return output_dir
+
+
+def quantize_export(path: str) -> str:
+    """
+    Quantize the embeddings and the head of an exported tagger to int8 (ONNX
+    Runtime dynamic quantization), next to the fp32 models
+
+    Args:
+        path (str): export directory
+
+    Returns:
+        str: export directory
+    """
+    _import_onnxruntime()
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+        raise ImportError(
+            "the quantization of the ONNX models needs `onnx`"
+            ' (pip install "aymurai[onnx]")'
+        )
+
+    logger.info(f"quantizing ONNX flair tagger on {path}")
+    for filename in [EMBEDDINGS_FILENAME, HEAD_FILENAME]:
+        output = os.path.join(path, _quantized(filename))
+        # quantized next to the output, then moved in place
+        tmp_output = f"{output}.tmp-{os.getpid()}"
+        try:
+            quantize_dynamic(
+                os.path.join(path, filename),
+                tmp_output,
+                weight_type=QuantType.QInt8,
+            )
+            os.replace(tmp_output, output)
+        finally:
+            if os.path.exists(tmp_output):
+                os.remove(tmp_output)
+
+    return path
+
+
+class ForkSafeSession(object):
+    """
+    ONNX Runtime session, created by the process that runs it. The thread pools
+    of a session do not survive a fork, and the production pipelines are loaded
+    before forking the API workers (see `aymurai.api.serve`).
+    """
+
+    def __init__(self, path: str, threads: int | None = None):
+        """
+        Args:
+            path (str): ONNX model path
+            threads (int | None, optional): intra-op threads of the session.
+                Defaults to ONNX Runtime choice (one per physical core).
+        """
+        self.path = path
+        self.threads = threads
+
+        self._session = None
+        self._pid = None
+
+    @property
+    def session(self):
+        if self._pid != os.getpid():
+            onnxruntime = _import_onnxruntime()
+
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = (
+                onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            )
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+            options.inter_op_num_threads = 1
+            if self.threads:
+                options.intra_op_num_threads = self.threads
+
+            self._session = onnxruntime.InferenceSession(
+                self.path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            self._pid = os.getpid()
+        return self._session
+
+    def __getattr__(self, name: str):
+        # e.g. `run` and `get_inputs`, as used by the flair ONNX embeddings
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.session, name)
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path, "threads": self.threads}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+
+class OnnxTaggerHead(object):
+    """
+    Head of a sequence tagger (see `_TaggerHead`) run by ONNX Runtime
+    """
+
+    def __init__(self, session: ForkSafeSession, rnn: bool):
+        self.session = session
+        self.rnn = rnn
+
+    def __call__(
+        self, sentence_tensor: torch.Tensor, lengths: torch.Tensor
+    ) -> torch.Tensor:
+        inputs = sentence_tensor.detach().cpu().numpy().astype(np.float32)
+
+        if not self.rnn:
+            # the layers work on each token: the padding does not change them
+            (features,) = self.session.run(None, {"sentence_tensor": inputs})
+            return torch.from_numpy(features)
+
+        # the RNN would run over the padding, each sentence runs on its own
+        features = None
+        for i, length in enumerate(lengths.tolist()):
+            (output,) = self.session.run(
+                None, {"sentence_tensor": inputs[i : i + 1, :length]}
+            )
+            if features is None:
+                features = np.zeros(
+                    (len(inputs), inputs.shape[1], *output.shape[2:]), np.float32
+                )
+            features[i, :length] = output[0]
+        return torch.from_numpy(features)
+
+
+def _forward(
+    tagger: SequenceTagger,
+    head: OnnxTaggerHead,
+    sentence_tensor: torch.Tensor,
+    lengths: torch.Tensor,
+):
+    # same outputs as `SequenceTagger.forward`, for the flair decoding
+    features = head(sentence_tensor, lengths)
+    if tagger.use_crf:
+        return features, lengths, tagger.crf.transitions
+    return tagger._get_scores_from_features(features, lengths)
+
+
+def load_tagger(
+    path: str, threads: int | None = None, quantized: bool = False
+) -> SequenceTagger:
+    """
+    Load an exported tagger (see `export_tagger`), running its embeddings and
+    head with ONNX Runtime
+
+    Args:
+        path (str): export directory
+        threads (int | None, optional): intra-op threads of each ONNX Runtime
+            session. Defaults to ONNX Runtime choice.
+        quantized (bool, optional): run the int8 models (see `quantize_export`).
+            Defaults to False.
+
+    Returns:
+        SequenceTagger: tagger
+    """
+    _import_onnxruntime()
+
+    embeddings_filename, head_filename = EMBEDDINGS_FILENAME, HEAD_FILENAME
+    if quantized:
+        embeddings_filename = _quantized(embeddings_filename)
+        head_filename = _quantized(head_filename)
+
+    logger.info(f"loading ONNX flair tagger from {path}")
+    tagger = SequenceTagger.load(os.path.join(path, TAGGER_FILENAME))
+    tagger.eval()
+
+    # the export directory may have moved since the tagger was saved
+    embeddings = tagger.embeddings
+    embeddings.onnx_model = os.path.join(path, embeddings_filename)
+    embeddings.session = ForkSafeSession(embeddings.onnx_model, threads=threads)
+
+    head = OnnxTaggerHead(
+        ForkSafeSession(os.path.join(path, head_filename), threads=threads),
+        rnn=tagger.use_rnn,
+    )
+    tagger.forward = partial(_forward, tagger, head)
+
+    return tagger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("model", help="flair tagger path (or Hugging Face model)")
+    parser.add_argument("output", help="export directory")
+    parser.add_argument("--opset-version", type=int, default=14)
+    parser.add_argument(
+        "--quantize", action="store_true", help="also export int8 models"
+    )
+    args = parser.parse_args()
+
+    export_tagger(args.model, args.output, opset_version=args.opset_version)
+    if args.quantize:
+        quantize_export(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Dynamic int8 quantization of the models, for CPU inference.
+
+Linear and recurrent layers get int8 weights, and their activations are
+quantized on the fly (per batch). Embedding layers get 8-bit weights (one scale
+per row) and still return float vectors. Convolutions are left in fp32: PyTorch
+does not map them to dynamic quantization by default, as it loses too much
+accuracy.
+
+Quantized models run on CPU only.
+"""
+
+import io
+
+import torch
+from torch import nn
+from torch.ao.quantization import (
+    quantize_dynamic,
+    default_dynamic_qconfig,
+    float_qparams_weight_only_qconfig,
+)
+
+from aymurai.logger import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+# layers quantized to int8 (weights), with dynamic activations
+DYNAMIC_LAYERS = (nn.Linear, nn.LSTM, nn.GRU)
+
+
+def model_size_mb(model: nn.Module) -> float:
+    """
+    Size of the (serialized) weights of a model, quantized or not
+
+    Args:
+        model (nn.Module): model
+
+    Returns:
+        float: size in MB
+    """
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / MB
+
+
+def quantize_model(model: nn.Module, embeddings: bool = True) -> nn.Module:
+    """
+    Apply dynamic int8 quantization to the linear and recurrent layers of a model
+    (in place), and 8-bit weight only quantization to its embedding layers
+
+    Args:
+        model (nn.Module): model, on CPU
+        embeddings (bool, optional): quantize the embedding layers.
+            Defaults to True.
+
+    Returns:
+        nn.Module: quantized model (in inference mode)
+    """
+    qconfig_spec = {layer: default_dynamic_qconfig for layer in DYNAMIC_LAYERS}
+    if embeddings:
+        qconfig_spec[nn.Embedding] = float_qparams_weight_only_qconfig
+
+    size = model_size_mb(model)
+    model = quantize_dynamic(model.eval(), qconfig_spec, inplace=True)
+    logger.info(
+        f"{type(model).__name__} quantized to int8:"
+        f" {size:.1f} MB -> {model_size_mb(model):.1f} MB"
+    )
+    return model
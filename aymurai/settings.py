@@ -47,19 +47,101 @@ class Settings(BaseSettings):
         return [i.strip() for i in v.split(",")]
 
     SQLALCHEMY_DATABASE_URI: str = "sqlite:////resources/cache/sqlite/database.db"
+    SQLALCHEMY_ECHO: bool = False
+
+    # Database connection pool settings
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+
+    # SQLite tuning (applied to every pooled connection)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
 
     RESOURCES_BASEPATH: str = "/resources"
 
+    # Production pipelines (under `RESOURCES_BASEPATH/pipelines/production`)
+    PRODUCTION_PIPELINES: list[str] | str = "flair-anonymizer,full-paragraph"
+
+    @field_validator("PRODUCTION_PIPELINES", mode="before")
+    @classmethod
+    def assemble_production_pipelines(cls, v) -> list[str]:
+        if v is None:
+            return []
+
+        if not isinstance(v, str):
+            raise ValueError(v)
+
+        return [i.strip() for i in v.split(",") if i.strip()]
+
+    # Serving (`aymurai-api` pre-fork server). The sizes of the job queue, the
+    # extraction pool and the LibreOffice pool are budgets for the whole server,
+    # split between the API workers
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8899
+    API_WORKERS: int = 1
+    API_PRELOAD_PIPELINES: bool = True
+
+    # Startup warm-up of the production pipelines
+    API_WARMUP: bool = True
+    WARMUP_TEXT: str = (
+        "En la Ciudad de Buenos Aires, a los 17 días del mes de noviembre de 2024,"
+        " el acusado Ramiro Marrón, DNI 34.555.666, domiciliado en Av. Corrientes"
+        " 1234, fue condenado a la pena de dos años de prisión en suspenso."
+    )
+
     # Alembic Config for running migrations
     ALEMBIC_INI_PATH: FilePath = PARENT / "alembic.ini"
 
     ENV: str | None = None
 
-    # Cachetools settings
-    MEMORY_CACHE_MAXSIZE: int = 1
-    MEMORY_CACHE_TTL: int = 60
-
+    # Pipeline registry: memory budget of the (non production) cached pipelines
+    PIPELINE_CACHE_MAX_MB: int = 4096
+
+    # Inference scheduler (dynamic micro-batching)
+    INFERENCE_MAX_BATCH_SIZE: int = 16
+    INFERENCE_MAX_WAIT_MS: float = 10
+    INFERENCE_WORKERS: int = 1
+    INFERENCE_MAX_QUEUE_SIZE: int = 256
+
+    # Job queue (long running document processing)
+    JOBS_BASEPATH: str = "/resources/cache/jobs"
+    JOB_WORKERS: int = 1
+    JOB_POLL_INTERVAL_S: float = 1
+    JOB_TIMEOUT_S: float = 600
+    # running jobs renew their lease on each heartbeat, the ones whose lease
+    # expired (e.g. their process died) are requeued
+    JOB_HEARTBEAT_S: float = 5
+    JOB_LEASE_S: float = 60
+
+    # Document extraction (pool of long-lived worker processes)
+    EXTRACTION_TIMEOUT_S: float = 5
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_MAX_TASKS_PER_WORKER: int = 100
+    EXTRACTION_QUEUE_TIMEOUT_S: float = 30
+    # Batches of paragraphs in flight while streaming a document anonymization
+    STREAM_MAX_INFLIGHT_BATCHES: int = 4
+
+    # LibreOffice conversion pool: long-lived headless instances driven over UNO
+    # by a bridge, run with a Python interpreter able to import `uno`
     LIBREOFFICE_BIN: str = "libreoffice"
+    LIBREOFFICE_PYTHON: str = "/usr/bin/python3"
+    LIBREOFFICE_POOL_SIZE: int = 2
+    LIBREOFFICE_TIMEOUT_S: float = 60
+    LIBREOFFICE_START_TIMEOUT_S: float = 30
+
+    # Conversion cache: converted documents by content, format and backend
+    CONVERSION_CACHE_PATH: str = "/resources/cache/conversions"
+    CONVERSION_CACHE_MAX_MB: int = 1024
+
+    # Extraction cache: extracted documents by content and extractor version
+    # (a budget of 0 disables it)
+    EXTRACTION_CACHE_PATH: str = "/resources/cache/extractions"
+    EXTRACTION_CACHE_MAX_MB: int = 256
 
 
 load_env()
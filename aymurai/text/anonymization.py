@@ -1,30 +1,136 @@
 import os
 import re
+import bisect
+import struct
 import zipfile
 import tempfile
 from glob import glob
 import xml.sax.saxutils
-from copy import deepcopy
+from copy import copy
 from unicodedata import normalize
+from collections import Counter, defaultdict
 
 import numpy as np
-import pandas as pd
 from jiwer import cer
 from lxml import etree
-from joblib import hash
 from more_itertools import flatten
 
 from aymurai.logger import get_logger
 from aymurai.meta.pipeline_interfaces import Transform
 from aymurai.models.flair.utils import FlairTextNormalize
-from aymurai.utils.alignment.core import tokenize, align_text
+from aymurai.utils.alignment.core import (
+    tokenize,
+    align_text_columns,
+    erase_duplicates_justseen,
+)
 from aymurai.utils.cache import cache_load, cache_save, get_cache_key
 
 logger = get_logger(__file__)
 
 
-REGEX_PARAGRAPH = r"((?<!\/)w:p\b)(?P<paragraph>.*?)(\/w:p\b)"
-REGEX_FRAGMENT = r"(?<!\/)w:t\b.*?>(?P<text>.*?)(<.*?\/w:t)"
+W_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_PARAGRAPH = f"{{{W_NAMESPACE}}}p"
+W_TEXT = f"{{{W_NAMESPACE}}}t"
+# start tag of a text element (`<w:t>`, `<w:t xml:space="preserve">`), with any
+# namespace prefix: parts without one (styles, numbering, settings, ...) are not
+# parsed
+TEXT_TAG = re.compile(rb"<(?:[\w.-]+:)?t[\s>]")
+
+# bit 3 of the general purpose flags: sizes and crc are after the member data
+DATA_DESCRIPTOR_FLAG = 0x08
+
+
+class XMLPart(object):
+    """
+    XML part of a DOCX document, parsed once.
+
+    The text fragments (`w:t` elements) found while indexing the paragraphs are
+    kept by index, so the replacement step edits them in place.
+    """
+
+    def __init__(self, name: str, xml: str | bytes):
+        """
+        Args:
+            name (str): part name (path inside the document)
+            xml (str | bytes): XML content
+        """
+        if isinstance(xml, str):
+            xml = xml.encode("utf-8")
+
+        self.name = name
+        self.root = etree.fromstring(xml, etree.XMLParser(ns_clean=True))
+        self.fragments: list[etree._Element] = []
+
+    def tostring(self) -> str:
+        return etree.tostring(self.root, encoding="unicode", pretty_print=True)
+
+
+class CERIndex(object):
+    """
+    Index of texts to find the closest one to a reference, by character error
+    rate (CER).
+
+    Texts are visited by length, closest first, and pruned with lower bounds of
+    the edit distance (length and character histogram differences). Only the
+    texts that could beat the best candidate so far get an exact CER.
+    """
+
+    def __init__(self, texts: dict[int, str]):
+        """
+        Args:
+            texts (dict[int, str]): texts to index, by id
+        """
+        # CER strips the texts before comparing them
+        entries = sorted((len(text.strip()), i, text) for i, text in texts.items())
+
+        self.lengths = [length for length, _, _ in entries]
+        self.ids = [i for _, i, _ in entries]
+        self.texts = [text for _, _, text in entries]
+        self.histograms = [Counter(text.strip()) for text in self.texts]
+
+    def closest(self, reference: str) -> int | None:
+        """
+        Find the text with the lowest CER against the reference. Ties are broken
+        by the lowest id.
+
+        Args:
+            reference (str): reference text
+
+        Returns:
+            int | None: id of the closest text, None if the index is empty
+        """
+        length = len(reference.strip())
+        histogram = Counter(reference.strip())
+
+        best_cer, best_id = np.inf, None
+
+        # visit the texts by length difference, from the closest length out
+        hi = bisect.bisect_left(self.lengths, length)
+        lo = hi - 1
+        while lo >= 0 or hi < len(self.lengths):
+            if hi >= len(self.lengths) or (
+                lo >= 0 and length - self.lengths[lo] <= self.lengths[hi] - length
+            ):
+                k, lo = lo, lo - 1
+            else:
+                k, hi = hi, hi + 1
+
+            # the remaining texts are even further in length
+            if abs(self.lengths[k] - length) / length > best_cer:
+                break
+
+            bound = max(
+                sum((histogram - self.histograms[k]).values()),
+                sum((self.histograms[k] - histogram).values()),
+            )
+            if bound / length > best_cer:
+                continue
+
+            value = cer(reference, self.texts[k])
+            if value < best_cer or (value == best_cer and self.ids[k] < best_id):
+                best_cer, best_id = value, self.ids[k]
+
+        return best_id
 
 
 class DocAnonymizer(Transform):
@@ -32,8 +138,17 @@ class DocAnonymizer(Transform):
     Anonymize document by replacing sensitive data with label tokens
     """
 
-    def __init__(self, use_cache: bool = False, **kwargs):
+    def __init__(self, use_cache: bool = False, in_memory: bool = True, **kwargs):
+        """
+        Args:
+            use_cache (bool, optional): cache the indexed paragraphs.
+                Defaults to False.
+            in_memory (bool, optional): anonymize the text parts of the document
+                in memory, copying the rest of the zip members as is, instead of
+                unzipping the whole document to disk. Defaults to True.
+        """
         self.use_cache = use_cache
+        self.in_memory = in_memory
         self.kwargs = kwargs
 
     def unzip_document(self, doc_path: str, output_dir: str) -> None:
@@ -54,47 +169,51 @@ class DocAnonymizer(Transform):
             doc_zip.extractall(output_dir)
             logger.info(f"unzipped {doc_path} to {output_dir}")
 
-    def index_paragraphs(self, file: str) -> list[dict]:
+    def index_paragraphs(self, part: XMLPart) -> list[dict]:
         """
-        Indexes the paragraphs of an XML file.
+        Indexes the paragraphs of an XML part in a single pass over its elements.
+        Each `w:t` element belongs to its closest `w:p` ancestor, so runs nested in
+        hyperlinks, fields or revisions stay in their paragraph, and paragraphs
+        nested in text boxes are indexed on their own.
 
         Args:
-            file (str): The path to the XML file to be indexed.
+            part (XMLPart): The XML part to be indexed.
 
         Returns:
             list[dict]: A list of dictionaries representing the indexed paragraphs.
         """
-        # Read the XML file
-        with open(file) as f:
-            xml = f.read()
+        # Find all paragraphs and their text fragments, in document order
+        elements = {}
+        for element in part.root.iter(W_PARAGRAPH, W_TEXT):
+            if element.tag == W_PARAGRAPH:
+                elements[element] = []
+            elif (
+                paragraph := next(element.iterancestors(W_PARAGRAPH), None)
+            ) is not None:
+                elements[paragraph].append(element)
 
+        part.fragments = []
         paragraphs = []
-        paragraph_index = 0
 
-        # Find all paragraphs in the XML file
-        for match in re.finditer(REGEX_PARAGRAPH, xml):
-            paragraph = match.group("paragraph")
-            paragraph_start = match.start("paragraph")
-            paragraph_end = match.end("paragraph")
+        for paragraph_index, paragraph in enumerate(elements.values()):
             fragments = []
-            fragment_index = 0
+            offset = 0
 
-            # Find all text fragments in the paragraph
-            for fragment in re.finditer(REGEX_FRAGMENT, paragraph):
-                text = fragment.group("text")
-                start = fragment.start("text")
-                end = fragment.end("text")
+            for fragment_index, element in enumerate(paragraph):
+                text = element.text or ""
 
                 fragment_dict = {
                     "text": text,
                     "normalized_text": FlairTextNormalize.normalize_text(text),
-                    "start": start,
-                    "end": end,
+                    "start": offset,
+                    "end": offset + len(text),
                     "fragment_index": fragment_index,
                     "paragraph_index": paragraph_index,
+                    "element_index": len(part.fragments),
                 }
                 fragments.append(fragment_dict)
-                fragment_index += 1
+                part.fragments.append(element)
+                offset += len(text)
 
             # Join all fragments as plain text
             plain_text = "".join(
@@ -105,14 +224,11 @@ class DocAnonymizer(Transform):
                 {
                     "plain_text": plain_text,
                     "metadata": {
-                        "start": paragraph_start,
-                        "end": paragraph_end,
                         "fragments": fragments,
-                        "xml_file": os.path.basename(file),
+                        "xml_file": part.name,
                     },
                 }
             )
-            paragraph_index += 1
 
         return paragraphs
 
@@ -133,62 +249,59 @@ class DocAnonymizer(Transform):
             list[dict]: A list of dictionaries representing
                 the matched paragraphs with predictions.
         """
+        # Index prediction documents by text
+        text2idx = defaultdict(list)
+        for i, prediction in enumerate(predictions):
+            text2idx[prediction["document"]].append(i)
 
-        paragraphs = deepcopy(paragraphs)
-
-        # Hash prediction documents
-        pred_hashes = [hash(prediction["document"]) for prediction in predictions]
-        idx2hash = {i: _hash for i, _hash in enumerate(pred_hashes)}
-
-        # Hash paragraphs
+        # Assign prediction indices to each paragraph by text
         paragraphs = [
             paragraph
-            | {"hash": hash(normalize("NFKC", paragraph["plain_text"].strip()))}
-            for paragraph in paragraphs
-        ]
-
-        # Assign prediction indices to each paragraph by hash
-        hash2idx = {
-            paragraph["hash"]: np.where(np.array(pred_hashes) == paragraph["hash"])[
-                0
-            ].tolist()
-            for paragraph in paragraphs
-        }
-
-        paragraphs = [
-            paragraph | {"pred_indices": hash2idx[paragraph["hash"]]}
+            | {
+                "pred_indices": text2idx.get(
+                    normalize("NFKC", paragraph["plain_text"].strip()), []
+                )
+            }
             for paragraph in paragraphs
         ]
 
         # Identify missing indices
-        missing_indices = list(
-            set(idx2hash.keys()) - set(flatten(list(hash2idx.values())))
+        matched_indices = set(
+            flatten(paragraph["pred_indices"] for paragraph in paragraphs)
         )
+        missing_indices = [
+            i for i in range(len(predictions)) if i not in matched_indices
+        ]
 
-        if missing_indices:
-            # Assign prediction indices to each paragraph by lowest CER
-            target_texts = np.array(
-                [prediction["document"] for prediction in predictions]
-            )[missing_indices]
+        missing_paragraphs = [
+            paragraph for paragraph in paragraphs if not paragraph["pred_indices"]
+        ]
 
-            missing_paragraphs = [
-                paragraph for paragraph in paragraphs if not paragraph["pred_indices"]
-            ]
+        if missing_indices and missing_paragraphs:
+            # Assign prediction indices to each paragraph by lowest CER
+            index = CERIndex({i: predictions[i]["document"] for i in missing_indices})
 
             for missing_paragraph in missing_paragraphs:
                 source_text = missing_paragraph["plain_text"]
-                min_cer_idx = np.argmin(
-                    [cer(source_text, target_text) for target_text in target_texts]
-                )
-                missing_paragraph["pred_indices"] = [missing_indices[min_cer_idx]]
+                missing_paragraph["pred_indices"] = [index.closest(source_text)]
+
+        elif missing_paragraphs:
+            logger.warning(
+                f"{len(missing_paragraphs)} paragraphs without predictions left"
+                " to match, they will not be anonymized"
+            )
 
         # Assign document text and labels
         paragraphs = [
-            paragraph
-            | {
-                "document": predictions[paragraph["pred_indices"][0]]["document"],
-                "labels": predictions[paragraph["pred_indices"][0]]["labels"],
-            }
+            (
+                paragraph
+                | {
+                    "document": predictions[paragraph["pred_indices"][0]]["document"],
+                    "labels": predictions[paragraph["pred_indices"][0]]["labels"],
+                }
+                if paragraph["pred_indices"]
+                else paragraph | {"document": paragraph["plain_text"], "labels": []}
+            )
             for paragraph in paragraphs
         ]
 
@@ -208,8 +321,6 @@ class DocAnonymizer(Transform):
         Returns:
             list[dict]: A list of dictionaries representing the unified labels.
         """
-        sample = deepcopy(sample)
-
         # Extract labels and document text
         labels = sample["labels"]
         document = sample[text_key]
@@ -264,7 +375,9 @@ class DocAnonymizer(Transform):
 
         return unified_labels
 
-    def replace_labels_in_text(self, pred: dict, text_key: str = "document") -> str:
+    def replace_labels_in_text(
+        self, pred: dict, text_key: str = "document", escape: bool = True
+    ) -> str:
         """
         Replaces labels in the text with anonymized tokens.
 
@@ -272,61 +385,41 @@ class DocAnonymizer(Transform):
             pred (dict): A dictionary representing the prediction.
             text_key (str, optional): The key for the text in the prediction dictionary.
                 Defaults to "document".
+            escape (bool, optional): Escape the anonymized tokens for XML.
+                Defaults to True.
 
         Returns:
             str: The text with replaced labels.
         """
-        pred = deepcopy(pred)
         doc = pred[text_key]
 
         # Unify consecutive labels
         unified_labels = self.unify_consecutive_labels(pred, text_key)
 
-        # Initialize the offset
-        offset = 0
+        # Walk the sorted labels once, copying the text in between
+        chunks = []
+        last_char = 0
 
-        # Replace labels in the text
         for unified_label in unified_labels:
-            # Adjust start and end character indices of the label
-            start_char = unified_label["start_char"] + offset
-            end_char = unified_label["end_char"] + offset
-            len_text_to_replace = end_char - start_char
+            # Overlapped text was already replaced by the previous label
+            start_char = max(unified_label["start_char"], last_char)
+            end_char = max(unified_label["end_char"], start_char)
 
             # Replace the text with the anonymized token
-            aymurai_label = xml.sax.saxutils.escape(
-                f" <{unified_label['aymurai_label']}>"
-            )
-            len_aymurai_label = len(aymurai_label)
+            aymurai_label = f" <{unified_label['aymurai_label']}>"
+            if escape:
+                aymurai_label = xml.sax.saxutils.escape(aymurai_label)
 
-            doc = doc[:start_char] + aymurai_label + doc[end_char:]
+            chunks.append(doc[last_char:start_char])
+            chunks.append(aymurai_label)
+            last_char = end_char
 
-            # Update the offset
-            offset += len_aymurai_label - len_text_to_replace
+        chunks.append(doc[last_char:])
+        doc = "".join(chunks)
 
         return re.sub(r" +", " ", doc).strip()
 
-    def erase_duplicates_justseen(self, series: pd.Series) -> pd.Series:
-        """
-        Erases duplicates that were just seen between two consecutive rows.
-
-        Args:
-            series (pd.Series): The pandas Series to be processed.
-
-        Returns:
-            pd.Series: The processed pandas Series.
-        """
-        return pd.Series(
-            [
-                (
-                    ""
-                    if (i > 0 and series.iloc[i] == series.iloc[i - 1])
-                    else series.iloc[i]
-                )
-                for i in range(len(series))
-            ]
-        )
-
-    def parse_token_indices(self, sample: dict) -> pd.DataFrame:
+    def parse_token_indices(self, sample: dict) -> list[dict]:
         """
         Parses the token indices from a sample.
 
@@ -334,18 +427,20 @@ class DocAnonymizer(Transform):
             sample (dict): A dictionary representing the sample.
 
         Returns:
-            pd.DataFrame: A pandas DataFrame representing the parsed token indices.
+            list[dict]: The tokens of the sample fragments, with their offsets
+                within the fragment text and their anonymized target.
         """
         original_text = " ".join(
             [fragment["text"] for fragment in sample["metadata"]["fragments"]]
         )
-        anonymized_text = self.replace_labels_in_text(sample)
+        # fragments hold the unescaped text of the elements
+        anonymized_text = self.replace_labels_in_text(sample, escape=False)
 
-        aligned = align_text(
+        aligned = align_text_columns(
             "<START> " + original_text + " <END>",
             "<START> " + anonymized_text + " <END>",
         )
-        aligned["target"] = self.erase_duplicates_justseen(aligned["target"])
+        targets = iter(erase_duplicates_justseen(aligned["target"])[1:-1])
 
         xml_file = sample["metadata"]["xml_file"]
 
@@ -362,29 +457,24 @@ class DocAnonymizer(Transform):
 
             # Loop over tokenized text and token_matches in parallel
             for j, (token, match) in enumerate(zip(tokenized_text, token_matches)):
-                start = sample["metadata"]["start"] + fragment["start"] + match.start()
+                # offsets within the fragment text
+                start = match.start()
                 end = start + len(token)
 
-                tokens.append((xml_file, paragraph_index, i, j, token, start, end))
-
-        tokens = pd.DataFrame(
-            tokens,
-            columns=[
-                "xml_file",
-                "paragraph_index",
-                "fragment_index",
-                "token_index",
-                "token",
-                "start_char",
-                "end_char",
-            ],
-        )
-
-        tokens = pd.concat(
-            [tokens, aligned["target"].iloc[1:-1].reset_index(drop=True)], axis=1
-        )
-
-        tokens["target"] = tokens["target"].fillna("")
+                tokens.append(
+                    {
+                        "xml_file": xml_file,
+                        "paragraph_index": paragraph_index,
+                        "fragment_index": i,
+                        "element_index": fragment["element_index"],
+                        "token_index": j,
+                        "token": token,
+                        "start_char": start,
+                        "end_char": end,
+                        # tokens left without alignment get an empty target
+                        "target": next(targets, ""),
+                    }
+                )
 
         return tokens
 
@@ -399,10 +489,18 @@ class DocAnonymizer(Transform):
         Returns:
             str: The normalized XML content.
         """
-        # Parse the XML content
-        parser = etree.XMLParser(ns_clean=True)
-        root = etree.fromstring(xml_content.encode("utf-8"), parser)
+        part = XMLPart("", xml_content)
+        self.normalize_xml(part.root)
+
+        return part.tostring()
+
+    def normalize_xml(self, root: etree._Element) -> None:
+        """
+        Normalizes a parsed XML document in place, see `normalize_document`.
 
+        Args:
+            root (etree._Element): The root element of the XML document.
+        """
         # Extract namespaces
         namespaces = {k: v for k, v in root.nsmap.items() if k}
 
@@ -449,53 +547,52 @@ class DocAnonymizer(Transform):
                         # Remove the w:r element from its parent
                         wr.getparent().remove(wr)
 
-        # Write back the XML content to a string
-        xml_str = etree.tostring(root, encoding="unicode", pretty_print=True)
-
-        return xml_str
-
-    def replace_text_in_xml(self, paragraphs: list[dict], base_dir: str) -> None:
+    def replace_text_in_xml(
+        self, paragraphs: list[dict], parts: dict[str, XMLPart]
+    ) -> list[str]:
         """
-        Replaces text in XML files based on the provided paragraphs
-            and saves the modified files.
+        Replaces text in the XML parts based on the provided paragraphs,
+            editing the indexed text fragments in place.
 
         Args:
             paragraphs (list[dict]): A list of dictionaries representing
                 the paragraphs to be replaced.
-            base_dir (str): The base directory where the XML files are located.
-        """
-        tokens = pd.concat(
-            [self.parse_token_indices(sample) for sample in paragraphs],
-            ignore_index=True,
-        )
+            parts (dict[str, XMLPart]): The indexed XML parts, by name.
 
-        fragments = (
-            tokens.groupby(["xml_file", "paragraph_index", "fragment_index"])
-            .agg({"target": " ".join, "start_char": "min", "end_char": "max"})
-            .reset_index()
-        )
+        Returns:
+            list[str]: The names of the modified XML parts.
+        """
+        # Collect one edit per text fragment: the span from its first to its
+        # last token is replaced by the targets of its tokens
+        edits = {}
+        for sample in paragraphs:
+            for token in self.parse_token_indices(sample):
+                key = (token["xml_file"], token["element_index"])
+                if key not in edits:
+                    edits[key] = [token["start_char"], token["end_char"], []]
 
-        for xml_file, group in fragments.groupby("xml_file"):
-            group = group.sort_values("end_char", ascending=False)
+                edit = edits[key]
+                edit[0] = min(edit[0], token["start_char"])
+                edit[1] = max(edit[1], token["end_char"])
+                edit[2].append(token["target"] or "")
 
-            with open(f"{base_dir}/word/{xml_file}", "r+") as file:
-                content = file.read()
+        # Apply the edits, each fragment text is rebuilt once
+        for (xml_file, element_index), (start_char, end_char, targets) in edits.items():
+            element = parts[xml_file].fragments[element_index]
 
-                for _, r in group.iterrows():
-                    start_char = r["start_char"]
-                    end_char = r["end_char"]
+            target = " ".join(targets)
+            target = re.sub(r"[^\S\r\n]+", " ", target)
 
-                    target = r["target"]
-                    target = re.sub(r"[^\S\r\n]+", " ", target)
+            text = element.text[:start_char] + target + element.text[end_char:]
+            element.text = text or None
 
-                    content = content[:start_char] + target + content[end_char:]
+        modified = list(dict.fromkeys(xml_file for xml_file, _ in edits))
 
-                # MUST be at the end to dont screw up the indexes
-                content = self.normalize_document(content)
+        # MUST be at the end to dont screw up the indexes
+        for xml_file in modified:
+            self.normalize_xml(parts[xml_file].root)
 
-                file.seek(0)
-                file.write(content)
-                file.truncate()
+        return modified
 
     def add_files_to_zip(self, zip_file: zipfile.ZipFile, directory: str) -> None:
         """
@@ -523,6 +620,162 @@ class DocAnonymizer(Transform):
             # Add XML components
             self.add_files_to_zip(docx, xml_directory)
 
+    def copy_zip_member(
+        self,
+        source: zipfile.ZipFile,
+        target: zipfile.ZipFile,
+        info: zipfile.ZipInfo,
+    ) -> None:
+        """
+        Copies a member between zip files byte by byte, without decompressing and
+        recompressing it.
+
+        Args:
+            source (zipfile.ZipFile): The zip file to copy the member from.
+            target (zipfile.ZipFile): The zip file to copy the member to
+                (opened for writing).
+            info (zipfile.ZipInfo): The member to be copied.
+        """
+        # Skip the local header of the member in the source file
+        source.fp.seek(info.header_offset)
+        header = struct.unpack(
+            zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader)
+        )
+        source.fp.seek(
+            header[zipfile._FH_FILENAME_LENGTH]
+            + header[zipfile._FH_EXTRA_FIELD_LENGTH],
+            os.SEEK_CUR,
+        )
+
+        # Sizes and crc are already known, so they go in the local header
+        member = copy(info)
+        member.flag_bits &= ~DATA_DESCRIPTOR_FLAG
+        member.header_offset = target.fp.tell()
+        target.fp.write(member.FileHeader())
+
+        remaining = info.compress_size
+        while remaining > 0:
+            chunk = source.fp.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                raise zipfile.BadZipFile(f"truncated zip member: {info.filename}")
+            target.fp.write(chunk)
+            remaining -= len(chunk)
+
+        # Register the member, as `ZipFile.write` does
+        target.filelist.append(member)
+        target.NameToInfo[member.filename] = member
+        target.start_dir = target.fp.tell()
+        target._didModify = True
+
+    def read_text_parts(self, document: zipfile.ZipFile) -> dict[str, XMLPart]:
+        """
+        Reads the XML parts of a DOCX document holding text (`w:t` elements),
+        whatever their name: body, headers, footers, notes and comments, but
+        also glossary parts or main parts with another name (e.g.
+        `word/document2.xml`).
+
+        Args:
+            document (zipfile.ZipFile): The DOCX document.
+
+        Returns:
+            dict[str, XMLPart]: The parsed XML parts, by zip member name.
+        """
+        parts = {}
+        for name in document.namelist():
+            if not name.endswith(".xml"):
+                continue
+
+            xml = document.read(name)
+            # only WordprocessingML parts with text elements are parsed
+            if W_NAMESPACE.encode() not in xml or not TEXT_TAG.search(xml):
+                continue
+
+            part = XMLPart(name, xml)
+            if part.root.find(f".//{W_TEXT}") is not None:
+                parts[name] = part
+        return parts
+
+    def write_docx(
+        self,
+        document: zipfile.ZipFile,
+        parts: dict[str, str],
+        output_file: str,
+    ) -> None:
+        """
+        Creates a new DOCX file from a document, replacing some of its parts.
+        The rest of the members are copied as is.
+
+        Args:
+            document (zipfile.ZipFile): The source DOCX document.
+            parts (dict[str, str]): The XML contents to replace, by zip member name.
+            output_file (str): The path to the output DOCX file.
+        """
+        # Write next to the output, it could be the source document itself
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(output_file) or ".", suffix=".docx", delete=False
+        ) as file:
+            tmp_file = file.name
+
+        try:
+            with zipfile.ZipFile(tmp_file, "w") as docx:
+                for info in document.infolist():
+                    if info.filename not in parts:
+                        self.copy_zip_member(document, docx, info)
+                        continue
+
+                    member = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                    member.external_attr = info.external_attr
+                    docx.writestr(
+                        member,
+                        parts[info.filename].encode("utf-8"),
+                        compress_type=zipfile.ZIP_DEFLATED,
+                    )
+            os.replace(tmp_file, output_file)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+    def anonymize_in_memory(
+        self, item_path: str, preds: list[dict], output_file: str
+    ) -> list[dict]:
+        """
+        Anonymizes a DOCX document reading and rewriting its text parts in memory.
+
+        Args:
+            item_path (str): The path to the DOCX document.
+            preds (list[dict]): The list of predictions for the document.
+            output_file (str): The path to the anonymized DOCX document.
+
+        Returns:
+            list[dict]: The paragraphs matched with the predictions.
+        """
+        with zipfile.ZipFile(item_path, "r") as document:
+            parts = self.read_text_parts(document)
+
+            # Index XML parts
+            paragraphs = (self.index_paragraphs(part) for part in parts.values())
+            paragraphs = list(flatten(paragraphs))
+
+            # Filter out empty paragraphs
+            paragraphs = [
+                paragraph for paragraph in paragraphs if paragraph["plain_text"].strip()
+            ]
+
+            # Matching
+            paragraphs = self.match_paragraphs_with_predictions(paragraphs, preds)
+
+            # Edit XML parts
+            modified = self.replace_text_in_xml(paragraphs, parts)
+
+            # Recreate anonymized document
+            self.write_docx(
+                document,
+                {name: parts[name].tostring() for name in modified},
+                output_file,
+            )
+
+        return paragraphs
+
     def __call__(self, item: dict, preds: list[dict], output_dir: str = ".") -> None:
         """
         Performs the anonymization process on a document.
@@ -547,14 +800,26 @@ class DocAnonymizer(Transform):
         cache_key = get_cache_key(item_path, self.__name__)
         if self.use_cache and (cache_data := cache_load(key=cache_key)):
             paragraphs = cache_data
+        elif self.in_memory:
+            os.makedirs(output_dir, exist_ok=True)
+            paragraphs = self.anonymize_in_memory(
+                item_path,
+                preds,
+                f"{output_dir}/{os.path.basename(item_path)}",
+            )
         else:
             # Unzip document into a temporary directory
             with tempfile.TemporaryDirectory() as tempdir:
                 self.unzip_document(item_path, tempdir)
 
                 # Parse XML files
-                xml_files = glob(f"{tempdir}/**/*.xml", recursive=True)
-                paragraphs = (self.index_paragraphs(file) for file in xml_files)
+                parts = {}
+                for file in glob(f"{tempdir}/**/*.xml", recursive=True):
+                    name = os.path.relpath(file, tempdir)
+                    with open(file, "rb") as f:
+                        parts[name] = XMLPart(name, f.read())
+
+                paragraphs = (self.index_paragraphs(part) for part in parts.values())
                 paragraphs = list(flatten(paragraphs))
 
                 # Filter out empty paragraphs
@@ -568,7 +833,9 @@ class DocAnonymizer(Transform):
                 paragraphs = self.match_paragraphs_with_predictions(paragraphs, preds)
 
                 # Edit XML filess
-                self.replace_text_in_xml(paragraphs, tempdir)
+                for name in self.replace_text_in_xml(paragraphs, parts):
+                    with open(f"{tempdir}/{name}", "w") as f:
+                        f.write(parts[name].tostring())
 
                 # Recreate anonymized document
                 os.makedirs(output_dir, exist_ok=True)
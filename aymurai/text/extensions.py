@@ -0,0 +1,6 @@
+MIMETYPE_EXTENSION_MAPPER = {
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/msword": "doc",
+    "application/vnd.oasis.opendocument.text": "odt",
+    "application/pdf": "pdf",
+}
@@ -1,36 +1,33 @@
 import os
+import re
 import logging
 import zipfile
-import statistics
 import unicodedata
 from pathlib import Path
-from typing import Any
+from typing import Iterator, TypedDict
 from zipfile import BadZipFile
 
 import magic
 import numpy as np
-import pymupdf
 import textract
-import xmltodict
 from lxml import etree
-from more_itertools import flatten
 from textract.exceptions import ShellError
 from textract.parsers import _get_available_extensions
 
 from aymurai.logger import get_logger
 from aymurai.meta.pipeline_interfaces import Transform
+from aymurai.text.extensions import MIMETYPE_EXTENSION_MAPPER
+from aymurai.text.pdf import (
+    get_pdf_blocks,
+    iter_paragraphs,
+    merge_paragraphs,
+    median_margin_between_blocks,
+)
 from aymurai.utils.cache import cache_load, cache_save, get_cache_key
-from aymurai.utils.misc import get_element, get_recursively
 
 logger = get_logger(__file__)
 
 TEXTRACT_EXTENSIONS = _get_available_extensions()
-MIMETYPE_EXTENSION_MAPPER = {
-    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
-    "application/msword": "doc",
-    "application/vnd.oasis.opendocument.text": "odt",
-    "application/pdf": "pdf",
-}
 
 
 ERRORS = ["ignore", "coerce", "raise"]
@@ -47,107 +44,325 @@ def get_extension(path: str) -> str:
     return MIMETYPE_EXTENSION_MAPPER.get(mimetype, mimetype)
 
 
-def _load_xml_from_odt(path: str, xmlfile: str = "styles.xml") -> str:
+W_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_PARAGRAPH = f"{{{W_NAMESPACE}}}p"
+W_RUN = f"{{{W_NAMESPACE}}}r"
+W_TEXT = f"{{{W_NAMESPACE}}}t"
+W_TAB = f"{{{W_NAMESPACE}}}tab"
+W_BREAKS = (f"{{{W_NAMESPACE}}}br", f"{{{W_NAMESPACE}}}cr")
+W_NOTES = (f"{{{W_NAMESPACE}}}footnote", f"{{{W_NAMESPACE}}}endnote")
+
+REGEX_DOCX_HEADER = re.compile(r"^word/header\d*\.xml$")
+REGEX_DOCX_FOOTER = re.compile(r"^word/footer\d*\.xml$")
+DOCX_NOTES = ["word/footnotes.xml", "word/endnotes.xml"]
+
+ODT_NAMESPACES = {
+    "office": "urn:oasis:names:tc:opendocument:xmlns:office:1.0",
+    "style": "urn:oasis:names:tc:opendocument:xmlns:style:1.0",
+    "text": "urn:oasis:names:tc:opendocument:xmlns:text:1.0",
+}
+ODT_PARAGRAPHS = (
+    f"{{{ODT_NAMESPACES['text']}}}p",
+    f"{{{ODT_NAMESPACES['text']}}}h",
+)
+ODT_TAB = f"{{{ODT_NAMESPACES['text']}}}tab"
+ODT_SPACE = f"{{{ODT_NAMESPACES['text']}}}s"
+ODT_LINE_BREAK = f"{{{ODT_NAMESPACES['text']}}}line-break"
+ODT_NOTE = f"{{{ODT_NAMESPACES['text']}}}note"
+ODT_NOTE_BODY = f"{{{ODT_NAMESPACES['text']}}}note-body"
+
+
+class DocumentSections(TypedDict):
+    """Paragraphs of a document, by section"""
+
+    header: list[str]
+    body: list[str]
+    footer: list[str]
+    footnotes: list[str]
+
+
+def sections_to_text(sections: DocumentSections) -> str:
     """
-    Load xml file inside an odt.
+    Join the sections of a document (header, body, footer and footnotes)
 
     Args:
-        path (str): path to odt file.
-        xmlfile (str, optional): xml to open. Defaults to 'styles.xml'.
+        sections (DocumentSections): document sections.
 
     Returns:
-        str: xml content.
+        str: document text.
     """
-    with zipfile.ZipFile(path, "r") as odt:
-        if xmlfile not in odt.namelist():
-            return ""
-        with odt.open(xmlfile) as file:
-            content = file.read().decode("utf-8")
+    paragraphs = [
+        *sections["header"],
+        *sections["body"],
+        *sections["footer"],
+        *sections["footnotes"],
+    ]
+    # blank lines keep the paragraphs apart through `document_normalize`
+    return "\n\n".join(paragraphs)
+
+
+def _docx_paragraphs(source) -> list[str]:
+    """
+    Stream the paragraphs of a DOCX part (document, header or footer).
+    Tabs and line breaks are kept, paragraphs nested in text boxes come apart.
+
+    Args:
+        source: part file object.
+
+    Returns:
+        list[str]: non empty paragraphs.
+    """
+    paragraphs = []
+    # chunks of the open paragraphs, the innermost last (e.g. a paragraph in a
+    # text box, inside the paragraph that anchors it)
+    stack: list[list[str]] = []
+
+    context = etree.iterparse(
+        source,
+        events=("start", "end"),
+        tag=(W_PARAGRAPH, W_TEXT, W_TAB, *W_BREAKS),
+        huge_tree=True,
+    )
+    for event, element in context:
+        if event == "start":
+            if element.tag == W_PARAGRAPH:
+                chunks: list[str] = []
+                paragraphs.append(chunks)
+                stack.append(chunks)
+            elif not stack:
+                continue
+            elif element.tag == W_TAB:
+                # tab stops of the paragraph properties are not text
+                if element.getparent().tag == W_RUN:
+                    stack[-1].append("\t")
+            elif element.tag in W_BREAKS:
+                stack[-1].append("\n")
+
+        elif element.tag == W_PARAGRAPH:
+            stack.pop()
+            element.clear(keep_tail=True)
+
+        elif element.tag == W_TEXT and stack:
+            stack[-1].append(element.text or "")
+
+    paragraphs = ["".join(chunks) for chunks in paragraphs]
+    return [paragraph for paragraph in paragraphs if paragraph.strip()]
+
+
+def _docx_notes(source) -> list[str]:
+    """
+    Stream the footnotes (or endnotes) of a DOCX part, one text per note.
+
+    Args:
+        source: part file object.
+
+    Returns:
+        list[str]: non empty notes.
+    """
+    notes = []
+    chunks: list[str] = []
+
+    for _, element in etree.iterparse(source, tag=(W_TEXT, *W_NOTES)):
+        if element.tag == W_TEXT:
+            chunks.append(element.text or "")
+            continue
 
-    return content
+        note = "".join(chunks)
+        if note.strip():
+            notes.append(note)
+        chunks = []
+        element.clear(keep_tail=True)
 
+    return notes
 
-def _load_xml_from_docx(path: str, xmlfile: str = "word/footnotes.xml") -> Any | None:
-    """Extract XML content from a specific file inside a .docx."""
+
+def iter_docx_sections(path: str) -> Iterator[tuple[str, list[str]]]:
+    """
+    Extract the paragraphs of a DOCX file part by part, in document order:
+    headers, document, footers and footnotes (and endnotes).
+    Each part is parsed once, repeated headers (and footers) are dropped.
+
+    Args:
+        path (str): path to docx file.
+
+    Yields:
+        Iterator[tuple[str, list[str]]]: section and paragraphs of each part.
+    """
     with zipfile.ZipFile(path, "r") as docx:
-        if xmlfile not in docx.namelist():
-            return
-        with docx.open(xmlfile) as f:
-            return etree.parse(f)
+        names = docx.namelist()
+        headers = [name for name in names if REGEX_DOCX_HEADER.match(name)]
+        footers = [name for name in names if REGEX_DOCX_FOOTER.match(name)]
+
+        def parts(section: str, names: list[str]):
+            # the first, even and default headers (and footers) often repeat
+            seen = set()
+            for name in names:
+                with docx.open(name) as part:
+                    paragraphs = _docx_paragraphs(part)
+                yield section, [p for p in dict.fromkeys(paragraphs) if p not in seen]
+                seen.update(paragraphs)
+
+        yield from parts("header", headers)
 
+        with docx.open("word/document.xml") as part:
+            yield "body", _docx_paragraphs(part)
 
-def get_header(path: str) -> list[str]:
+        yield from parts("footer", footers)
+
+        for name in DOCX_NOTES:
+            if name in names:
+                with docx.open(name) as part:
+                    yield "footnotes", _docx_notes(part)
+
+
+def extract_docx(path: str) -> DocumentSections:
     """
-    Extract header from styles.xml inside a ODT file.
+    Extract the paragraphs of a DOCX file, parsing each part once:
+    headers, document, footers and footnotes (and endnotes).
 
     Args:
-        path (str): path to odt file.
+        path (str): path to docx file.
 
     Returns:
-        list[str]: header lines.
+        DocumentSections: document sections.
     """
-    styles_xml_content = _load_xml_from_odt(path)
-    styles_dict = xmltodict.parse(styles_xml_content)
-
-    header_root = get_element(
-        styles_dict,
-        levels=[
-            "office:document-styles",
-            "office:master-styles",
-            "style:master-page",
-        ],
-    )
+    sections = DocumentSections(header=[], body=[], footer=[], footnotes=[])
+    for section, paragraphs in iter_docx_sections(path):
+        sections[section] += paragraphs
+    return sections
 
-    if not isinstance(header_root, list):
-        header_root = [header_root]
 
-    style_header = [
-        get_recursively(item, "style:header")
-        for item in header_root
-        if get_recursively(item, "style:header")
-    ]
-    style_header = list(flatten(style_header))
+def _odt_text(element: etree._Element) -> str:
+    """
+    Text of an ODT paragraph, without its notes and nested paragraphs.
 
-    texts = [
-        get_recursively(item, "#text")
-        for item in style_header
-        if get_recursively(item, "#text")
-    ]
-    texts = list(flatten(texts))
+    Args:
+        element (etree._Element): paragraph (or span) element.
+
+    Returns:
+        str: paragraph text.
+    """
+    chunks = [element.text or ""]
+    for child in element:
+        if child.tag == ODT_TAB:
+            chunks.append("\t")
+        elif child.tag == ODT_SPACE:
+            chunks.append(" " * int(child.get(f"{{{ODT_NAMESPACES['text']}}}c", 1)))
+        elif child.tag == ODT_LINE_BREAK:
+            chunks.append("\n")
+        elif child.tag not in (ODT_NOTE, *ODT_PARAGRAPHS) and isinstance(
+            child.tag, str
+        ):
+            chunks.append(_odt_text(child))
+        chunks.append(child.tail or "")
+
+    return "".join(chunks)
 
-    if not texts:
-        return []
 
-    return texts
+def _odt_paragraphs(root: etree._Element) -> list[str]:
+    paragraphs = (_odt_text(element) for element in root.iter(*ODT_PARAGRAPHS))
+    return [paragraph for paragraph in paragraphs if paragraph.strip()]
 
 
-def get_footnotes(path: str) -> list[str] | None:
+def iter_odt_sections(path: str) -> Iterator[tuple[str, list[str]]]:
     """
-    Extract footnotes from footnotes.xml inside a DOCX file.
+    Extract the paragraphs of an ODT file, in document order: headers and
+    footers (`styles.xml`), body and footnotes (`content.xml`).
+    Each part is parsed once, repeated headers (and footers) are dropped.
 
     Args:
-        path (str): Path to the DOCX file.
+        path (str): path to odt file.
+
+    Yields:
+        Iterator[tuple[str, list[str]]]: section and paragraphs of each part.
+    """
+    margins = {"header": [], "footer": []}
+
+    with zipfile.ZipFile(path, "r") as odt:
+        if "styles.xml" in odt.namelist():
+            with odt.open("styles.xml") as part:
+                styles = etree.parse(part, etree.XMLParser(huge_tree=True)).getroot()
+
+            for master_page in styles.iterfind(
+                "office:master-styles/style:master-page", ODT_NAMESPACES
+            ):
+                for element in master_page:
+                    _, _, name = element.tag.rpartition("}")
+                    section = name.split("-")[0]
+                    if section in margins:
+                        margins[section] += _odt_paragraphs(element)
+
+        # master pages often repeat headers and footers
+        yield "header", list(dict.fromkeys(margins["header"]))
+
+        with odt.open("content.xml") as part:
+            content = etree.parse(part, etree.XMLParser(huge_tree=True)).getroot()
+
+        # notes go apart from the paragraph that cites them
+        footnotes = []
+        for note_body in list(content.iter(ODT_NOTE_BODY)):
+            note = "\n".join(_odt_paragraphs(note_body))
+            if note.strip():
+                footnotes.append(note)
+            note_body.getparent().remove(note_body)
+
+        for body in content.iterfind("office:body", ODT_NAMESPACES):
+            yield "body", _odt_paragraphs(body)
+
+        yield "footer", list(dict.fromkeys(margins["footer"]))
+        yield "footnotes", footnotes
+
+
+def extract_odt(path: str) -> DocumentSections:
+    """
+    Extract the paragraphs of an ODT file, parsing each part once:
+    headers and footers (`styles.xml`), body and footnotes (`content.xml`).
+
+    Args:
+        path (str): path to odt file.
 
     Returns:
-        list[str]: Footnote texts.
+        DocumentSections: document sections.
     """
-    footnotes_tree = _load_xml_from_docx(path)
-    if not footnotes_tree:
-        return
+    sections = DocumentSections(header=[], body=[], footer=[], footnotes=[])
+    for section, paragraphs in iter_odt_sections(path):
+        sections[section] += paragraphs
+    return sections
+
+
+NATIVE_EXTRACTORS = {
+    "docx": extract_docx,
+    "odt": extract_odt,
+}
+
+SECTION_ITERATORS = {
+    "docx": iter_docx_sections,
+    "odt": iter_odt_sections,
+}
+
 
-    footnotes_root = footnotes_tree.getroot()
+def iter_pdf_paragraphs(
+    filename: str, y_tolerance: float | None = None
+) -> Iterator[str]:
+    """
+    Extract the paragraphs of a PDF file, in order. The blocks of every page are
+    needed first, for the margin between paragraphs.
+
+    Args:
+        filename (str): Path to the PDF file.
+        y_tolerance (float, optional):
+            Maximum vertical gap (in points) to consider blocks part of the same paragraph.
 
-    # Define the namespace map
-    ns = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
+    Yields:
+        Iterator[str]: paragraphs.
+    """
+    # the blocks are extracted once, for the margin and the paragraphs
+    pages = get_pdf_blocks(filename)
 
-    # Extract footnote texts in order
-    footnotes_texts = []
-    for footnote in footnotes_root.findall("w:footnote", namespaces=ns):
-        texts = footnote.xpath(".//w:t/text()", namespaces=ns)
-        if texts:
-            footnotes_texts.append("".join(texts))
+    if y_tolerance is None:
+        y_tolerance = median_margin_between_blocks(pages)
 
-    return footnotes_texts
+    yield from iter_paragraphs(pages, np.ceil(y_tolerance))
 
 
 def pdf_to_text(filename: str, y_tolerance: float | None = None) -> str:
@@ -162,11 +377,7 @@ def pdf_to_text(filename: str, y_tolerance: float | None = None) -> str:
     Returns:
         str: Extracted text.
     """
-    if y_tolerance is None:
-        y_tolerance = compute_median_margin_between_blocks(filename)
-
-    paragraphs = extract_and_merge_paragraphs(filename, np.ceil(y_tolerance))
-    docu = "\n\n".join(paragraphs)
+    docu = "\n\n".join(iter_pdf_paragraphs(filename, y_tolerance))
     docu = unicodedata.normalize("NFKC", docu)
     return docu
 
@@ -214,7 +425,7 @@ def extract_document(
     if (
         not isinstance(filename, str)
         or not os.path.exists(filename)
-        or ext not in TEXTRACT_EXTENSIONS
+        or (ext not in TEXTRACT_EXTENSIONS and ext not in NATIVE_EXTRACTORS)
     ):
         if errors == "raise":
             raise InvalidFile(f"Invalid path: {filename}")
@@ -225,106 +436,147 @@ def extract_document(
         if ext == "pdf":
             return pdf_to_text(filename, y_tolerance=kwargs.get("y_tolerance"))
 
-        docu = textract.process(filename, **kwargs).decode("utf-8")
-    except (BadZipFile, KeyError, ShellError):
+        if ext in NATIVE_EXTRACTORS:
+            docu = sections_to_text(NATIVE_EXTRACTORS[ext](filename))
+        else:
+            # legacy formats (e.g. doc)
+            docu = textract.process(filename, **kwargs).decode("utf-8")
+    except (BadZipFile, KeyError, ShellError, etree.XMLSyntaxError):
         if errors == "raise":
             raise
         logger.warn(f"skipping (corrupted): {filename}")
         return
 
-    # patch header loading in odt files
-    if ext == "odt":
-        header = "\n".join(get_header(filename))
-        docu = header + "\n\n" + docu
-
-    # patch footnotes loading in docx files
-    if ext == "docx":
-        footnotes = get_footnotes(filename) or []
-        footnotes = "\n".join(footnotes)
-        if footnotes.strip():
-            docu = docu + "\n\n" + footnotes
-
     docu = unicodedata.normalize("NFKC", docu)
     return docu
 
 
-def compute_median_margin_between_blocks(pdf_path: str) -> float:
+def extract_document_sections(
+    filename: str | Path,
+    errors: str = "ignore",
+    **kwargs,
+) -> DocumentSections | None:
     """
-    Computes the median vertical margin between text blocks in a PDF.
+    Extract the paragraphs of a document by path, by section.
+    Headers, footers and footnotes are only told apart in docx and odt
+    documents, the text of other formats goes in the body.
 
     Args:
-        pdf_path (str): Path to the PDF file.
+        filename (str): document path.
+        errors (str, optional): {'ignore', 'raise', 'coerce'}, default 'ignore'
+            (see `extract_document`).
+        **kwargs: keyword arguments for `extract_document`.
+
+    Raises:
+        InvalidFile: Invalid or unsupported file.
 
     Returns:
-        float: Median margin between text blocks (in points).
+        DocumentSections: document sections.
     """
-    margins = []
+    filename = str(filename)  # patch for pathlib
 
-    with pymupdf.open(pdf_path) as doc:
-        for page in doc:
-            # Extract all text blocks from the page
-            blocks = page.get_text("blocks")
+    ext = get_extension(filename) if os.path.exists(filename) else None
+    if ext not in NATIVE_EXTRACTORS:
+        docu = extract_document(filename, errors=errors, **kwargs)
+        if docu is None:
+            return
+        return DocumentSections(header=[], body=[docu], footer=[], footnotes=[])
 
-            # Sort blocks by their top y-coordinate (y0)
-            blocks_sorted = sorted(blocks, key=lambda b: b[1])
+    try:
+        sections = NATIVE_EXTRACTORS[ext](filename)
+    except (BadZipFile, KeyError, etree.XMLSyntaxError):
+        if errors == "raise":
+            raise
+        if errors == "coerce":
+            logger.warning(f"skipping (corrupted): {filename}")
+        return
 
-            # Compute vertical margins between consecutive blocks
-            for i in range(1, len(blocks_sorted)):
-                previous_block = blocks_sorted[i - 1]
-                current_block = blocks_sorted[i]
+    return DocumentSections(
+        **{
+            section: [unicodedata.normalize("NFKC", text) for text in paragraphs]
+            for section, paragraphs in sections.items()
+        }
+    )
 
-                # Calculate the vertical margin
-                previous_y1 = previous_block[3]  # Bottom of the previous block
-                current_y0 = current_block[1]  # Top of the current block
-                margin = current_y0 - previous_y1
 
-                if margin > 0:  # Ignore overlapping blocks
-                    margins.append(margin)
+def iter_document(
+    filename: str | Path,
+    errors: str = "ignore",
+    **kwargs,
+) -> Iterator[str]:
+    """
+    Extract the text of a document by path, part by part as it is read: the
+    paragraphs of pdf, docx and odt documents (in the order of
+    `extract_document`), the whole text of other formats.
+    Joined by blank lines, the parts are the text of `extract_document`.
 
-    # Compute and return the median margin
-    if margins:
-        return statistics.median(margins)
+    Args:
+        filename (str): document path.
+        errors (str, optional): {'ignore', 'raise', 'coerce'}, default 'ignore'
+            (see `extract_document`). A document found corrupted once some
+            parts were yielded ends there.
+        **kwargs: keyword arguments for `extract_document`.
+
+    Raises:
+        ValueError: Invalid argument.
+        InvalidFile: Invalid or unsupported file.
+
+    Yields:
+        Iterator[str]: document parts.
+    """
+    filename = str(filename)  # patch for pathlib
+
+    if errors not in ERRORS:
+        raise ValueError(f"errors argument must be in {ERRORS}")
+
+    ext = get_extension(filename) if os.path.exists(filename) else None
+    if ext != "pdf" and ext not in SECTION_ITERATORS:
+        docu = extract_document(filename, errors=errors, **kwargs)
+        if docu is not None:
+            yield docu
+        return
+
+    if ext == "pdf":
+        paragraphs = iter_pdf_paragraphs(filename, kwargs.get("y_tolerance"))
     else:
-        return 0.0  # Return 0 if no margins were found
+        paragraphs = (
+            paragraph
+            for _, section in SECTION_ITERATORS[ext](filename)
+            for paragraph in section
+        )
 
+    try:
+        for paragraph in paragraphs:
+            yield unicodedata.normalize("NFKC", paragraph)
+    except (BadZipFile, KeyError, etree.XMLSyntaxError):
+        if errors == "raise":
+            raise
+        if errors == "coerce":
+            logger.warning(f"skipping (corrupted): {filename}")
 
-def extract_and_merge_paragraphs(pdf_path: str, y_tolerance=5) -> list[str]:
+
+def compute_median_margin_between_blocks(pdf_path: str) -> float:
     """
-    Extracts and merges paragraphs from a PDF by grouping close text blocks.
+    Computes the median vertical margin between text blocks in a PDF.
 
     Args:
         pdf_path (str): Path to the PDF file.
-        y_tolerance (float): Maximum vertical gap (in points) to consider blocks part of the same paragraph.
 
     Returns:
-        list[str]: A list of merged paragraphs as strings.
+        float: Median margin between text blocks (in points).
     """
-    paragraphs = []
-    current_paragraph = []
-    last_y1 = None
-
-    with pymupdf.open(pdf_path) as doc:
-        for page in doc:
-            # Extract all text blocks from the page
-            blocks = page.get_text("blocks")
-
-            # Sort blocks by their top y-coordinate (y0)
-            blocks_sorted = sorted(blocks, key=lambda b: b[1])
-
-            for block in blocks_sorted:
-                x0, y0, x1, y1, text, *_ = block
+    return median_margin_between_blocks(get_pdf_blocks(pdf_path))
 
-                if last_y1 is not None and (y0 - last_y1) > y_tolerance:
-                    # If the gap between blocks is too large, start a new paragraph
-                    if current_paragraph:
-                        paragraphs.append(" ".join(current_paragraph))
-                    current_paragraph = []
 
-                current_paragraph.append(text)
-                last_y1 = y1
+def extract_and_merge_paragraphs(pdf_path: str, y_tolerance=5) -> list[str]:
+    """
+    Extracts and merges paragraphs from a PDF by grouping close text blocks.
 
-            if current_paragraph:
-                paragraphs.append(" ".join(current_paragraph))
-                current_paragraph = []
+    Args:
+        pdf_path (str): Path to the PDF file.
+        y_tolerance (float): Maximum vertical gap (in points) to consider blocks part of the same paragraph.
 
-    return paragraphs
+    Returns:
+        list[str]: A list of merged paragraphs as strings.
+    """
+    return merge_paragraphs(get_pdf_blocks(pdf_path), y_tolerance)
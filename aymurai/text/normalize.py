@@ -1,5 +1,13 @@
 import re
 import unicodedata
+from typing import Iterable, Iterator
+
+from more_itertools import unique_justseen
+
+# characters joined to the next line by `document_normalize` (at the end of a
+# line) or to the previous one (at the start of a line)
+JOINS_NEXT = re.compile(r"[\w,\"-]")
+JOINS_PREVIOUS = re.compile(r"[a-z0-9;:,\.]")
 
 
 def document_normalize(text: str) -> str:
@@ -44,3 +52,69 @@ def document_normalize(text: str) -> str:
     text = text.replace("\/", "/")
 
     return text
+
+
+def split_paragraphs(document: str) -> list[str]:
+    """
+    Split an extracted document into normalized, non empty paragraphs.
+    Consecutive duplicated paragraphs are dropped.
+
+    Args:
+        document (str): extracted text
+
+    Returns:
+        list[str]: paragraphs
+    """
+    paragraphs = [line.strip() for line in document.split("\n") if line.strip()]
+    paragraphs = [re.sub(r"\s{2,}", " ", line) for line in paragraphs]
+    return list(unique_justseen(paragraphs))
+
+
+def _is_boundary(previous: str, part: str) -> bool:
+    """
+    Whether `document_normalize` keeps two consecutive parts (joined by a blank
+    line) apart, so they can be normalized on their own
+    """
+    return bool(
+        previous
+        and part
+        and not JOINS_NEXT.fullmatch(previous[-1])
+        and not JOINS_PREVIOUS.fullmatch(part[0])
+    )
+
+
+def iter_normalized_paragraphs(parts: Iterable[str]) -> Iterator[str]:
+    """
+    Normalize a document on the fly, from its parts (e.g. the paragraphs of an
+    extractor), as they come.
+    Parts are buffered until `document_normalize` can not join them with the
+    next one, so the paragraphs are the same as
+    `split_paragraphs(document_normalize("\\n\\n".join(parts)))`.
+
+    Args:
+        parts (Iterable[str]): document parts, in order
+
+    Yields:
+        Iterator[str]: normalized paragraphs
+    """
+    buffer: list[str] = []
+    last = None
+
+    def flush() -> Iterator[str]:
+        nonlocal last
+        text = document_normalize("\n\n".join(buffer))
+        for paragraph in split_paragraphs(text):
+            if paragraph != last:
+                yield paragraph
+            last = paragraph
+        buffer.clear()
+
+    for part in parts:
+        # same characters `document_normalize` sees
+        part = unicodedata.normalize("NFKC", part)
+        if buffer and _is_boundary(buffer[-1], part):
+            yield from flush()
+        buffer.append(part)
+
+    if buffer:
+        yield from flush()
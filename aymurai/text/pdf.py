@@ -0,0 +1,181 @@
+"""
+PDF text blocks extraction.
+
+The blocks of every page are extracted once, and both the margin between blocks
+and the paragraphs are computed from them. The pages of long documents are
+processed in parallel, by a pool of processes that only load this module.
+"""
+
+import os
+import statistics
+import multiprocessing
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pymupdf
+
+from aymurai.logger import get_logger
+from aymurai.settings import settings
+
+logger = get_logger(__name__)
+
+# PDF pages are extracted in parallel for documents with many pages. Each
+# extraction worker has its own pool: by default the CPUs are split between them
+PDF_WORKERS = int(
+    os.getenv(
+        "AYMURAI_PDF_WORKERS",
+        max(1, (os.cpu_count() or 1) // max(settings.EXTRACTION_WORKERS, 1)),
+    )
+)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("AYMURAI_PDF_PARALLEL_MIN_PAGES", 32))
+_PDF_EXECUTOR: ProcessPoolExecutor | None = None
+
+# text block of a PDF page: x0, y0, x1, y1, text
+Block = tuple[float, float, float, float, str]
+
+
+def _sorted_blocks(page: pymupdf.Page) -> list[Block]:
+    # text blocks sorted by their top y-coordinate (y0)
+    blocks = [tuple(block[:5]) for block in page.get_text("blocks")]
+    return sorted(blocks, key=lambda b: b[1])
+
+
+def _get_pdf_pages_blocks(pdf_path: str, start: int, stop: int) -> list[list[Block]]:
+    with pymupdf.open(pdf_path) as doc:
+        return [_sorted_blocks(doc[i]) for i in range(start, stop)]
+
+
+def _pdf_executor() -> ProcessPoolExecutor:
+    global _PDF_EXECUTOR
+
+    # spawned once and reused: its workers keep pymupdf loaded
+    if _PDF_EXECUTOR is None:
+        _PDF_EXECUTOR = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _PDF_EXECUTOR
+
+
+def get_pdf_blocks(pdf_path: str, n_workers: int | None = None) -> list[list[Block]]:
+    """
+    Extract the text blocks of every page of a PDF, sorted by their top
+    y-coordinate. Long documents are split in ranges of pages, processed in
+    parallel.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        n_workers (int, optional): number of processes for long documents.
+            Defaults to `AYMURAI_PDF_WORKERS` (number of CPUs per extraction
+            worker).
+
+    Returns:
+        list[list[Block]]: blocks (x0, y0, x1, y1, text) of each page.
+    """
+    global _PDF_EXECUTOR
+
+    n_workers = PDF_WORKERS if n_workers is None else min(n_workers, PDF_WORKERS)
+
+    with pymupdf.open(pdf_path) as doc:
+        n_pages = doc.page_count
+        if n_workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+            return [_sorted_blocks(page) for page in doc]
+
+    chunksize = int(np.ceil(n_pages / n_workers))
+    ranges = [
+        (start, min(start + chunksize, n_pages))
+        for start in range(0, n_pages, chunksize)
+    ]
+
+    try:
+        executor = _pdf_executor()
+        futures = [
+            executor.submit(_get_pdf_pages_blocks, pdf_path, start, stop)
+            for start, stop in ranges
+        ]
+        return [page for future in futures for page in future.result()]
+    except BrokenProcessPool:
+        logger.warning("pdf process pool broken, extracting sequentially")
+        if _PDF_EXECUTOR is not None:
+            _PDF_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _PDF_EXECUTOR = None
+        return _get_pdf_pages_blocks(pdf_path, 0, n_pages)
+
+
+def median_margin_between_blocks(pages: list[list[Block]]) -> float:
+    """
+    Computes the median vertical margin between the (sorted) text blocks of
+    each page.
+
+    Args:
+        pages (list[list[Block]]): blocks of each page (see `get_pdf_blocks`).
+
+    Returns:
+        float: Median margin between text blocks (in points).
+    """
+    margins = []
+
+    for blocks in pages:
+        # Compute vertical margins between consecutive blocks
+        for previous_block, current_block in zip(blocks, blocks[1:]):
+            # Bottom of the previous block to the top of the current block
+            margin = current_block[1] - previous_block[3]
+
+            if margin > 0:  # Ignore overlapping blocks
+                margins.append(margin)
+
+    # Compute and return the median margin
+    if margins:
+        return statistics.median(margins)
+    else:
+        return 0.0  # Return 0 if no margins were found
+
+
+def iter_paragraphs(pages: list[list[Block]], y_tolerance=5) -> Iterator[str]:
+    """
+    Merges the (sorted) text blocks of each page into paragraphs, grouping close
+    blocks, yielding each paragraph once it is complete.
+
+    Args:
+        pages (list[list[Block]]): blocks of each page (see `get_pdf_blocks`).
+        y_tolerance (float): Maximum vertical gap (in points) to consider blocks part of the same paragraph.
+
+    Yields:
+        Iterator[str]: merged paragraphs.
+    """
+    current_paragraph = []
+    last_y1 = None
+
+    for blocks in pages:
+        for block in blocks:
+            x0, y0, x1, y1, text = block
+
+            if last_y1 is not None and (y0 - last_y1) > y_tolerance:
+                # If the gap between blocks is too large, start a new paragraph
+                if current_paragraph:
+                    yield " ".join(current_paragraph)
+                current_paragraph = []
+
+            current_paragraph.append(text)
+            last_y1 = y1
+
+        if current_paragraph:
+            yield " ".join(current_paragraph)
+            current_paragraph = []
+
+
+def merge_paragraphs(pages: list[list[Block]], y_tolerance=5) -> list[str]:
+    """
+    Merges the (sorted) text blocks of each page into paragraphs, grouping close
+    blocks (see `iter_paragraphs`).
+
+    Args:
+        pages (list[list[Block]]): blocks of each page (see `get_pdf_blocks`).
+        y_tolerance (float): Maximum vertical gap (in points) to consider blocks part of the same paragraph.
+
+    Returns:
+        list[str]: A list of merged paragraphs as strings.
+    """
+    return list(iter_paragraphs(pages, y_tolerance))
@@ -1,4 +1,5 @@
 import os
+import threading
 from hashlib import md5
 from copy import deepcopy
 
@@ -22,7 +23,8 @@ class USEMSubcategorizer(Transform):
     Use USEM to retrieve subcategories
     """
 
-    usem = USEMQA()
+    _usem: USEMQA | None = None
+    _usem_lock = threading.Lock()
 
     def __init__(
         self,
@@ -70,6 +72,23 @@ class USEMSubcategorizer(Transform):
         self.usem_vectors = self.load_usem_vectors(response_embeddings_path)
         self.device = device
 
+    @property
+    def usem(self) -> USEMQA:
+        # loaded on first use: the TensorFlow runtime is not fork-safe, so it must
+        # not be initialized before the pre-fork server starts its workers
+        return self.load_usem()
+
+    @classmethod
+    def load_usem(cls) -> USEMQA:
+        """
+        Load the USEM model. It is shared by all the instances.
+        """
+        if cls._usem is None:
+            with cls._usem_lock:
+                if cls._usem is None:
+                    cls._usem = USEMQA()
+        return cls._usem
+
     def load_usem_vectors(self, file_path):
         """
         Load USEM vectors
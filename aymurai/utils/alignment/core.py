@@ -7,8 +7,6 @@ import numpy as np
 import pandas as pd
 from more_itertools import flatten
 
-from aymurai.text.extraction import extract_document
-
 
 def tokenize(text: str) -> list[str]:
     tokens = map(str.split, text.splitlines())
@@ -16,60 +14,112 @@ def tokenize(text: str) -> list[str]:
     return list(tokens)
 
 
-def align_text(
+def align_tokens(
+    source_tokens: list[str],
+    target_tokens: list[str],
+) -> tuple[list[str], list[str]]:
+    """align source and target tokens in a single pass over the matching blocks
+
+    Each source token is mapped to its matching target token. The source tokens
+    in between two matching blocks are all mapped to the target tokens in
+    between, joined by a space.
+
+    Args:
+        source_tokens (list[str]): reference tokens
+        target_tokens (list[str]): tokens to align with
+
+    Returns:
+        tuple[list[str], list[str]]: source and target columns
+    """
+    source, target = [], []
+
+    seqmatcher = SequenceMatcher(None, source_tokens, target_tokens)
+    matches = seqmatcher.get_matching_blocks()
+
+    for match, next_match in zip(matches, matches[1:]):
+        source.extend(source_tokens[match.a : match.a + match.size])
+        target.extend(target_tokens[match.b : match.b + match.size])
+
+        left = source_tokens[match.a + match.size : next_match.a]
+        right = target_tokens[match.b + match.size : next_match.b]
+
+        # the junk heuristic of `SequenceMatcher` can leave equal tokens between
+        # two blocks. `Differ` keeps them out of the target, so it is only run
+        # on those (rare) gaps
+        if not set(left).isdisjoint(right):
+            diff = list(Differ().compare(left, right))
+            left = [t[2:].strip() for t in diff if t.startswith(("-", " "))]
+            right = [t[2:].strip() for t in diff if t.startswith("+")]
+
+        source.extend(left)
+        target.extend([" ".join(right)] * len(left))
+
+    return source, target
+
+
+def align_text_columns(
     source_text: str,
     target_text: str,
     columns: tuple[str, str] = ("source", "target"),
-) -> pd.DataFrame:
-    """align source and target text into a table
+) -> dict[str, np.ndarray]:
+    """align source and target text into columns
 
     Args:
         source_text (str): reference text
         target_text (str): second text to align with
-        columns (tuple[str, str]): names of columns on output
+        columns (tuple[str, str]): names of the columns on output
 
     Returns:
-        pd.DataFrame: alignment table
+        dict[str, np.ndarray]: alignment columns (object arrays)
     """
     source_tokens = [t.strip() for t in tokenize(source_text)]
     target_tokens = [t.strip() for t in tokenize(target_text)]
 
-    mapping = pd.DataFrame(columns=("source", "target"))
-
-    seqmatcher = SequenceMatcher(None, source_tokens, target_tokens)
-    matches = seqmatcher.get_matching_blocks()
-
     # FIXME: patch to misaligned headers
     if not target_text:
-        mapping["source"] = source_tokens
-        mapping.fillna("", inplace=True)
+        source, target = source_tokens, [""] * len(source_tokens)
     else:
-        for match, next_match in zip(matches, matches[1:]):
-            _aux = {
-                "source": source_tokens[match.a : match.a + match.size],
-                "target": target_tokens[match.b : match.b + match.size],
-            }
-            mapping = pd.concat([mapping, pd.DataFrame(_aux)], ignore_index=True)
-
-            # get how differ the tokens at the end of the current match to the next
-            diff = Differ().compare(
-                source_tokens[match.a + match.size : next_match.a],
-                target_tokens[match.b + match.size : next_match.b],
-            )
-            diff = list(diff)
-            left = [t[2:].strip() for t in diff if t.startswith(("-", " "))]
-            right = [t[2:].strip() for t in diff if t.startswith("+")]
-            right_agg = " ".join(right)
+        source, target = align_tokens(source_tokens, target_tokens)
+
+    source_column, target_column = columns
+    return {
+        source_column: np.array(source, dtype=object),
+        target_column: np.array(target, dtype=object),
+    }
+
+
+def align_text(
+    source_text: str,
+    target_text: str,
+    columns: tuple[str, str] = ("source", "target"),
+) -> pd.DataFrame:
+    """align source and target text into a table
 
-            _aux = pd.DataFrame({"source": left})
-            _aux["target"] = right_agg
+    Args:
+        source_text (str): reference text
+        target_text (str): second text to align with
+        columns (tuple[str, str]): names of columns on output
 
-            mapping = pd.concat([mapping, pd.DataFrame(_aux)], ignore_index=True)
+    Returns:
+        pd.DataFrame: alignment table
+    """
+    mapping = align_text_columns(source_text, target_text, columns=columns)
+    return pd.DataFrame(mapping, columns=list(columns), dtype=object)
 
-    # rename columns
-    mapping.columns = columns
 
-    return mapping.reset_index(drop=True)
+def erase_duplicates_justseen(column: np.ndarray) -> np.ndarray:
+    """erase the values equal to the previous one (keeping the first)
+
+    Args:
+        column (np.ndarray): values
+
+    Returns:
+        np.ndarray: values with the repetitions replaced by an empty string
+    """
+    column = np.asarray(column, dtype=object)
+    erased = column.copy()
+    erased[1:][column[1:] == column[:-1]] = ""
+    return erased
 
 
 def align_docs(
@@ -88,6 +138,8 @@ def align_docs(
     Returns:
         pd.DataFrame: alignment table
     """
+    from aymurai.text.extraction import extract_document
+
     source: str = extract_document(source_path, errors="raise")  # type: ignore
     target: str = extract_document(target_path, errors="raise")  # type: ignore
 
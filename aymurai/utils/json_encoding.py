@@ -4,8 +4,6 @@ import json
 import decimal
 import datetime
 
-import pandas as pd
-
 from aymurai.logger import get_logger
 
 logger = get_logger(__name__)
@@ -44,7 +42,8 @@ class EnhancedJSONEncoder(json.JSONEncoder):
                     str(obj),
                 ],
             }
-        elif pd.isna(obj):
+        # pandas missing values can only show up if pandas is already loaded
+        elif (pd := sys.modules.get("pandas")) and pd.isna(obj):
             return "null"
         else:
             try:
@@ -0,0 +1,27 @@
+import psutil
+
+MB = 1024 * 1024
+
+
+def memory_info(pid: int) -> dict:
+    """
+    Unique and shared memory of a process (in MB).
+    `uss` is the memory that would be freed if the process was terminated, `pss`
+    splits the shared pages between the processes that map them.
+
+    Args:
+        pid (int): process id
+
+    Returns:
+        dict: rss, uss, pss and shared memory
+    """
+    info = psutil.Process(pid).memory_full_info()
+    uss = info.uss
+    pss = getattr(info, "pss", uss)
+
+    return {
+        "rss_mb": info.rss / MB,
+        "uss_mb": uss / MB,
+        "pss_mb": pss / MB,
+        "shared_mb": (info.rss - uss) / MB,
+    }
@@ -0,0 +1,154 @@
+"""
+Token alignment benchmark.
+
+Aligns the sample rulings in `resources/data/sample` with their anonymized
+version (labels replaced by tokens, as `DocAnonymizer` does) using the previous
+pandas based implementation of `align_text` and the current one. Checks both
+produce the same alignment and reports their timings, paragraph by paragraph
+and for whole documents.
+
+Usage:
+    python benchmarks/alignment.py --repeat 3
+"""
+
+import sys
+import json
+import time
+import argparse
+from difflib import Differ, SequenceMatcher
+
+import pandas as pd
+
+from aymurai.utils.alignment.core import tokenize, align_text
+
+ANNOTATIONS = "resources/data/sample/annotations.json"
+
+
+def legacy_align_text(
+    source_text: str,
+    target_text: str,
+    columns: tuple[str, str] = ("source", "target"),
+) -> pd.DataFrame:
+    """previous implementation of `align_text`, kept as reference"""
+    source_tokens = [t.strip() for t in tokenize(source_text)]
+    target_tokens = [t.strip() for t in tokenize(target_text)]
+
+    mapping = pd.DataFrame(columns=("source", "target"))
+
+    seqmatcher = SequenceMatcher(None, source_tokens, target_tokens)
+    matches = seqmatcher.get_matching_blocks()
+
+    if not target_text:
+        mapping["source"] = source_tokens
+        mapping.fillna("", inplace=True)
+    else:
+        for match, next_match in zip(matches, matches[1:]):
+            _aux = {
+                "source": source_tokens[match.a : match.a + match.size],
+                "target": target_tokens[match.b : match.b + match.size],
+            }
+            mapping = pd.concat([mapping, pd.DataFrame(_aux)], ignore_index=True)
+
+            diff = Differ().compare(
+                source_tokens[match.a + match.size : next_match.a],
+                target_tokens[match.b + match.size : next_match.b],
+            )
+            diff = list(diff)
+            left = [t[2:].strip() for t in diff if t.startswith(("-", " "))]
+            right = [t[2:].strip() for t in diff if t.startswith("+")]
+            right_agg = " ".join(right)
+
+            _aux = pd.DataFrame({"source": left})
+            _aux["target"] = right_agg
+
+            mapping = pd.concat([mapping, pd.DataFrame(_aux)], ignore_index=True)
+
+    mapping.columns = columns
+
+    return mapping.reset_index(drop=True)
+
+
+def load_samples(path: str) -> list[tuple[str, str]]:
+    """
+    Load the sample documents and anonymize them with their annotations
+
+    Args:
+        path (str): label studio export of the sample documents
+
+    Returns:
+        list[tuple[str, str]]: original and anonymized text of each document
+    """
+    with open(path) as file:
+        tasks = json.load(file)
+
+    samples = []
+    for task in tasks:
+        text = task["data"]["text"]
+        spans = {
+            (result["value"]["start"], result["value"]["end"]): result["value"][
+                "labels"
+            ][0]
+            for annotation in task["annotations"]
+            for result in annotation["result"]
+            if result["type"] == "labels"
+        }
+
+        anonymized, last = [], 0
+        for (start, end), label in sorted(spans.items()):
+            if start < last:
+                continue
+            anonymized += [text[last:start], f" <{label}> "]
+            last = end
+        anonymized.append(text[last:])
+
+        samples.append((text, "".join(anonymized)))
+
+    return samples
+
+
+def timeit(function, pairs: list[tuple[str, str]], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for source, target in pairs:
+            function(f"<START> {source} <END>", f"<START> {target} <END>")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--annotations", default=ANNOTATIONS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = load_samples(args.annotations)
+    paragraphs = [
+        (source, target)
+        for text, anonymized in documents
+        for source, target in zip(text.splitlines(), anonymized.splitlines())
+        if source.strip()
+    ]
+
+    failed = False
+    for name, pairs in [("paragraphs", paragraphs), ("documents", documents)]:
+        mismatches = sum(
+            not legacy_align_text(source, target).equals(align_text(source, target))
+            for source, target in pairs
+        )
+        legacy = timeit(legacy_align_text, pairs, args.repeat)
+        current = timeit(align_text, pairs, args.repeat)
+
+        print(
+            f"{name:>10}: {len(pairs):4d} alignments | legacy {legacy:7.3f}s"
+            f" | current {current:7.3f}s | speedup {legacy / current:5.1f}x"
+            f" | mismatches {mismatches}"
+        )
+        failed |= bool(mismatches)
+
+    print("FAIL: alignments differ" if failed else "OK")
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Flair ONNX backend parity check and benchmark.
+
+Predicts the paragraphs of the sample documents (`resources/data/sample`) with
+the PyTorch and the ONNX Runtime backends of `FlairModel`. Checks both find the
+same entity spans (start, end and label) and reports their timings. The ONNX
+export is created on the first run (see `aymurai.models.flair.onnx`).
+
+Usage:
+    python benchmarks/flair_onnx.py --model aymurai/anonymizer-beto-cased-flair
+    python benchmarks/flair_onnx.py --threads 1 2 4 --limit 200
+"""
+
+import sys
+import glob
+import time
+import argparse
+
+from aymurai.text.extraction import extract_document
+from aymurai.models.flair.core import FlairModel
+from aymurai.models.flair.utils import FlairTextNormalize
+from aymurai.text.normalize import document_normalize, split_paragraphs
+
+SAMPLE_PATH = "resources/data/sample"
+
+
+def load_paragraphs(path: str, limit: int | None = None) -> list[dict]:
+    """
+    Paragraphs of the sample documents, as the production pipelines get them
+
+    Args:
+        path (str): documents directory
+        limit (int | None, optional): max number of paragraphs. Defaults to None.
+
+    Returns:
+        list[dict]: data items
+    """
+    items = []
+    for filename in sorted(glob.glob(f"{path}/*.docx")):
+        document = document_normalize(extract_document(filename) or "")
+        for paragraph in split_paragraphs(document):
+            text = FlairTextNormalize.normalize_text(paragraph)
+            items.append({"path": filename, "data": {"doc.text": text}})
+    return items[:limit]
+
+
+def spans(item: dict) -> set[tuple]:
+    entities = item["predictions"]["entities"]
+    return {(e["start_char"], e["end_char"], e["label"]) for e in entities}
+
+
+def predict(model: FlairModel, items: list[dict], repeat: int) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predictions = model.predict(items)
+        best = min(best, time.perf_counter() - start)
+    return predictions, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="aymurai/anonymizer-beto-cased-flair")
+    parser.add_argument("--onnx-path", default=None)
+    parser.add_argument("--threads", type=int, nargs="+", default=[None])
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    items = load_paragraphs(SAMPLE_PATH, args.limit)
+    print(f"{len(items)} paragraphs")
+
+    reference = FlairModel(basepath=args.model, split_doc=True)
+    expected, torch_time = predict(reference, items, args.repeat)
+    n_entities = sum(len(spans(item)) for item in expected)
+    print(
+        f"torch: {torch_time:7.3f}s"
+        f" ({1000 * torch_time / len(items):.1f} ms/paragraph, {n_entities} entities)"
+    )
+    del reference
+
+    failed = False
+    for threads in args.threads:
+        model = FlairModel(
+            basepath=args.model,
+            split_doc=True,
+            backend="onnx",
+            onnx_path=args.onnx_path,
+            onnx_threads=threads,
+        )
+        model.predict(items[:8])  # warm up the sessions
+        predictions, onnx_time = predict(model, items, args.repeat)
+
+        mismatches = [
+            (item["data"]["doc.text"], spans(a) ^ spans(b))
+            for item, a, b in zip(items, expected, predictions)
+            if spans(a) != spans(b)
+        ]
+        failed |= bool(mismatches)
+
+        print(
+            f"onnx ({threads or 'default'} threads): {onnx_time:7.3f}s"
+            f" ({1000 * onnx_time / len(items):.1f} ms/paragraph)"
+            f" | speedup {torch_time / onnx_time:5.1f}x"
+            f" | {len(mismatches)} paragraphs with different spans"
+        )
+        for text, diff in mismatches[:5]:
+            print(f"    {sorted(diff)}: {text[:80]!r}")
+
+    print("FAIL: spans differ" if failed else "OK")
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Cold import benchmark of the API.
+
+Imports `aymurai.api.main` in a fresh interpreter with `-X importtime` and fails
+if the import exceeds the time budget or if any of the heavy ML/conversion
+libraries is loaded eagerly.
+
+Usage:
+    python benchmarks/importtime.py --budget-s 3 --top 15
+"""
+
+import re
+import sys
+import argparse
+import subprocess
+
+# libraries that must only load when the stage/router using them first runs
+HEAVY_MODULES = [
+    "torch",
+    "flair",
+    "tensorflow",
+    "tensorflow_hub",
+    "tensorflow_text",
+    "textract",
+    "pymupdf",
+    "fitz",
+    "pypandoc",
+    "pymupdf4llm",
+    "pandas",
+    "jiwer",
+]
+
+LINE_REGEX = re.compile(
+    r"import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|(?P<indent>\s+)(?P<module>\S+)"
+)
+
+
+def importtime(module: str) -> list[dict]:
+    """
+    Import a module in a fresh interpreter and parse the `-X importtime` report
+
+    Args:
+        module (str): module to import
+
+    Returns:
+        list[dict]: imported modules with their self and cumulative time (in us)
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        sys.stderr.write(process.stderr)
+        raise RuntimeError(f"could not import {module}")
+
+    records = []
+    for line in process.stderr.splitlines():
+        if match := LINE_REGEX.match(line):
+            records.append(
+                {
+                    "module": match["module"],
+                    "self_us": int(match["self"]),
+                    "cumulative_us": int(match["cumulative"]),
+                    "depth": (len(match["indent"]) - 1) // 2,
+                }
+            )
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="aymurai.api.main")
+    parser.add_argument("--budget-s", type=float, default=3.0)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # best of N, the first run also warms up the filesystem and bytecode caches
+    runs = [importtime(args.module) for _ in range(args.repeat)]
+    totals = [
+        next(r["cumulative_us"] for r in records if r["module"] == args.module)
+        for records in runs
+    ]
+    best = min(range(len(runs)), key=lambda i: totals[i])
+    records, total_s = runs[best], totals[best] / 1e6
+
+    print(f"cold import of {args.module}: {total_s:.3f}s (budget: {args.budget_s}s)")
+    print(f"top {args.top} modules by self time:")
+    for record in sorted(records, key=lambda r: -r["self_us"])[: args.top]:
+        print(
+            f"  {record['self_us'] / 1e3:9.1f} ms"
+            f" {record['cumulative_us'] / 1e3:9.1f} ms  {record['module']}"
+        )
+
+    imported = {record["module"] for record in records}
+    heavy = [module for module in HEAVY_MODULES if module in imported]
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if total_s > args.budget_s:
+        print(f"FAIL: import time over budget ({total_s:.3f}s > {args.budget_s}s)")
+        failed = True
+
+    if not failed:
+        print("OK")
+
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
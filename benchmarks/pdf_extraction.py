@@ -0,0 +1,152 @@
+"""
+PDF extraction benchmark.
+
+Extracts the text of a PDF with the previous implementation of `pdf_to_text`
+(two passes over the blocks of every page: one for the margin between blocks and
+one to merge them in paragraphs) and the current one (a single pass, with the
+pages of long documents processed in parallel). Checks both produce the same text
+and reports their timings.
+
+Without a PDF, a synthetic ruling with `--pages` pages is generated.
+
+Usage:
+    python benchmarks/pdf_extraction.py --pages 200 --workers 1 4
+    python benchmarks/pdf_extraction.py --pdf ruling.pdf
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import unicodedata
+
+import numpy as np
+import pymupdf
+
+from aymurai.text import pdf
+from aymurai.text.extraction import pdf_to_text
+
+WORDS = [
+    "sentencia",
+    "juzgado",
+    "causa",
+    "imputado",
+    "penal",
+    "art.",
+    "Buenos",
+    "Aires",
+    "resuelvo",
+    "2021",
+]
+
+
+def legacy_pdf_to_text(filename: str) -> str:
+    """previous implementation of `pdf_to_text`, kept as reference"""
+    margins = []
+    with pymupdf.open(filename) as doc:
+        for page in doc:
+            blocks_sorted = sorted(page.get_text("blocks"), key=lambda b: b[1])
+            for i in range(1, len(blocks_sorted)):
+                margin = blocks_sorted[i][1] - blocks_sorted[i - 1][3]
+                if margin > 0:
+                    margins.append(margin)
+    y_tolerance = np.ceil(statistics.median(margins) if margins else 0.0)
+
+    paragraphs = []
+    current_paragraph = []
+    last_y1 = None
+    with pymupdf.open(filename) as doc:
+        for page in doc:
+            blocks_sorted = sorted(page.get_text("blocks"), key=lambda b: b[1])
+            for block in blocks_sorted:
+                x0, y0, x1, y1, text, *_ = block
+                if last_y1 is not None and (y0 - last_y1) > y_tolerance:
+                    if current_paragraph:
+                        paragraphs.append(" ".join(current_paragraph))
+                    current_paragraph = []
+                current_paragraph.append(text)
+                last_y1 = y1
+            if current_paragraph:
+                paragraphs.append(" ".join(current_paragraph))
+                current_paragraph = []
+
+    return unicodedata.normalize("NFKC", "\n\n".join(paragraphs))
+
+
+def make_pdf(path: str, n_pages: int, seed: int = 0):
+    """
+    Synthetic ruling: pages of paragraphs of a few lines, apart by small and
+    large gaps
+
+    Args:
+        path (str): output path
+        n_pages (int): number of pages
+        seed (int, optional): random seed. Defaults to 0.
+    """
+    rng = random.Random(seed)
+
+    with pymupdf.open() as doc:
+        for _ in range(n_pages):
+            page = doc.new_page()
+            y = 60
+            while y < 740:
+                lines = rng.randint(1, 4)
+                for _ in range(lines):
+                    page.insert_text(
+                        (60, y), " ".join(rng.choices(WORDS, k=10)), fontsize=11
+                    )
+                    y += 14
+                y += rng.choice([4, 20])
+        doc.save(path)
+
+
+def timeit(function, path: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", default=None)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        path = args.pdf
+        if path is None:
+            make_pdf(tmp.name, args.pages)
+            path = tmp.name
+
+        legacy_text = legacy_pdf_to_text(path)
+        legacy = timeit(legacy_pdf_to_text, path, args.repeat)
+        print(f"legacy: {legacy:7.3f}s")
+
+        failed = False
+        for n_workers in args.workers:
+            pdf.PDF_WORKERS = n_workers
+            pdf._PDF_EXECUTOR = None
+
+            current_text = pdf_to_text(path)  # warm up the pool
+            current = timeit(pdf_to_text, path, args.repeat)
+            failed |= current_text != legacy_text
+
+            print(
+                f"current ({n_workers} workers): {current:7.3f}s"
+                f" | speedup {legacy / current:5.1f}x"
+                f" | {'same' if current_text == legacy_text else 'DIFFERENT'} text"
+            )
+
+    print("FAIL: texts differ" if failed else "OK")
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
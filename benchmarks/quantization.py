@@ -0,0 +1,244 @@
+"""
+Dynamic int8 quantization benchmark: accuracy vs latency.
+
+Loads each model of a pipeline that supports quantization (`quantize` option,
+e.g. `FlairModel` and `DecisionConv1dBinRegex`) in fp32 and in int8, each in a
+fresh process, and predicts the paragraphs of the sample documents
+(`resources/data/sample`). Reports, for each model:
+
+- load time, size of the weights and resident memory of the loaded model
+- prediction latency per paragraph (best of `--repeat` runs)
+- agreement of the int8 predictions with the fp32 ones: precision, recall and
+  F1 of the predicted spans (start, end and label), paragraphs with different
+  spans and, for the decision model, the largest change of its probability
+
+The models run with the options of the pipeline config, so a deployment can be
+benchmarked with its own config (`--pipeline`).
+
+Usage:
+    python benchmarks/quantization.py
+    python benchmarks/quantization.py --pipeline resources/pipelines/production/full-paragraph --threads 1 --limit 200
+    python benchmarks/quantization.py --output quantization.md
+"""  # noqa
+
+import json
+import time
+import inspect
+import argparse
+import multiprocessing
+import concurrent.futures
+
+import psutil
+from more_itertools import chunked
+
+from aymurai.pipeline.config import resolve_obj
+from flair_onnx import SAMPLE_PATH, spans, load_paragraphs
+
+MB = 1024 * 1024
+
+
+def run_variant(
+    class_path: str,
+    kwargs: dict,
+    items: list[dict],
+    batch_size: int,
+    repeat: int,
+    threads: int | None,
+) -> dict:
+    """
+    Load a model and predict the paragraphs (in a fresh process)
+
+    Args:
+        class_path (str): model class
+        kwargs (dict): model options
+        items (list[dict]): data items
+        batch_size (int): paragraphs per prediction
+        repeat (int): prediction runs
+        threads (int | None): torch intra-op threads
+
+    Returns:
+        dict: timings, memory and predictions
+    """
+    import torch
+
+    from aymurai.models.quantization import model_size_mb
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    cls = resolve_obj(class_path)
+    process = psutil.Process()
+    rss = process.memory_info().rss
+
+    start = time.perf_counter()
+    model = cls(**kwargs)
+    load_time = time.perf_counter() - start
+    model_rss = process.memory_info().rss - rss
+
+    model.predict(items[:batch_size])  # warm up
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predictions = []
+        for batch in chunked(items, batch_size):
+            predictions += model.predict(batch)
+        best = min(best, time.perf_counter() - start)
+
+    probs = None
+    if hasattr(model, "predict_proba"):
+        texts = [item["data"]["doc.text"] for item in items]
+        probs = model.predict_proba(texts).tolist()
+
+    weights = getattr(model, "model", None)
+    return {
+        "load_s": load_time,
+        "weights_mb": (
+            model_size_mb(weights) if isinstance(weights, torch.nn.Module) else None
+        ),
+        "rss_mb": model_rss / MB,
+        "peak_rss_mb": (process.memory_info().rss - rss) / MB,
+        "ms_per_paragraph": 1000 * best / len(items),
+        "spans": [sorted(spans(item)) for item in predictions],
+        "probs": probs,
+    }
+
+
+def agreement(reference: dict, result: dict) -> dict:
+    """
+    Agreement of the predictions of a model with the reference (fp32) ones
+
+    Args:
+        reference (dict): reference run
+        result (dict): quantized run
+
+    Returns:
+        dict: span precision, recall and F1, and paragraphs with different spans
+    """
+    tp = n_pred = n_ref = changed = 0
+    for expected, predicted in zip(reference["spans"], result["spans"]):
+        expected, predicted = set(map(tuple, expected)), set(map(tuple, predicted))
+        tp += len(expected & predicted)
+        n_pred += len(predicted)
+        n_ref += len(expected)
+        changed += expected != predicted
+
+    precision = tp / n_pred if n_pred else 1.0
+    recall = tp / n_ref if n_ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if tp else float(n_ref == 0)
+
+    max_prob_diff = None
+    if reference["probs"] is not None:
+        max_prob_diff = max(
+            (abs(a - b) for a, b in zip(reference["probs"], result["probs"])),
+            default=0.0,
+        )
+
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "changed": changed,
+        "max_prob_diff": max_prob_diff,
+    }
+
+
+def format_report(rows: list[dict], n_paragraphs: int) -> str:
+    def fmt(value, spec: str) -> str:
+        return "-" if value is None else format(value, spec)
+
+    lines = [
+        f"# Dynamic int8 quantization ({n_paragraphs} paragraphs)",
+        "",
+        "| model | quantize | load (s) | weights (MB) | RSS (MB) | peak RSS (MB)"
+        " | ms/paragraph | speedup | span P | span R | span F1"
+        " | changed paragraphs | max prob diff |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        lines.append(
+            f"| {row['model']} | {row['quantize']}"
+            f" | {row['load_s']:.1f}"
+            f" | {fmt(row['weights_mb'], '.1f')}"
+            f" | {row['rss_mb']:.0f}"
+            f" | {row['peak_rss_mb']:.0f}"
+            f" | {row['ms_per_paragraph']:.2f}"
+            f" | {row['speedup']:.2f}x"
+            f" | {row['precision']:.4f}"
+            f" | {row['recall']:.4f}"
+            f" | {row['f1']:.4f}"
+            f" | {row['changed']}"
+            f" | {fmt(row['max_prob_diff'], '.4f')} |"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--pipeline", default="resources/pipelines/production/full-paragraph"
+    )
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None, help="markdown report path")
+    args = parser.parse_args()
+
+    items = load_paragraphs(SAMPLE_PATH, args.limit)
+    print(f"{len(items)} paragraphs")
+
+    with open(f"{args.pipeline}/pipeline.json") as file:
+        config = json.load(file)
+
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for class_path, kwargs in config["models"]:
+        cls = resolve_obj(class_path)
+        if "quantize" not in inspect.signature(cls).parameters:
+            continue
+
+        kwargs = dict(kwargs)
+        if "return_only_with_detalle" in kwargs:
+            # every paragraph is a candidate decision, not only the ones with a
+            # DETALLE entity (predicted by a previous model of the pipeline)
+            kwargs["return_only_with_detalle"] = False
+
+        results = {}
+        for quantize in [False, True]:
+            print(f"{cls.__name__} (quantize={quantize})...")
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=context
+            ) as executor:
+                results[quantize] = executor.submit(
+                    run_variant,
+                    class_path,
+                    {**kwargs, "quantize": quantize},
+                    items,
+                    args.batch_size,
+                    args.repeat,
+                    args.threads,
+                ).result()
+
+        reference = results[False]
+        for quantize, result in results.items():
+            rows.append(
+                {
+                    "model": cls.__name__,
+                    "quantize": quantize,
+                    **result,
+                    "speedup": reference["ms_per_paragraph"]
+                    / result["ms_per_paragraph"],
+                    **agreement(reference, result),
+                }
+            )
+
+    report = format_report(rows, len(items))
+    print(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Label substitution micro-benchmark.
+
+Replaces the labels of synthetic paragraphs with hundreds of entities using the
+previous implementation of `DocAnonymizer.replace_labels_in_text` (deep copies
+and one text splice per label) and the current one. Checks both produce the
+same text and reports their timings.
+
+Usage:
+    python benchmarks/replace_labels.py --entities 100 300 1000
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+import xml.sax.saxutils
+from copy import deepcopy
+
+from aymurai.text.anonymization import DocAnonymizer
+
+LABELS = ["PER", "NOMBRE", "DNI", "DIRECCION", "FECHA"]
+
+
+def legacy_replace_labels_in_text(
+    anonymizer: DocAnonymizer, pred: dict, text_key: str = "document"
+) -> str:
+    """previous implementation of `replace_labels_in_text`, kept as reference"""
+    pred = deepcopy(pred)
+    doc = pred[text_key]
+
+    unified_labels = anonymizer.unify_consecutive_labels(deepcopy(pred), text_key)
+
+    offset = 0
+    for unified_label in unified_labels:
+        start_char = unified_label["start_char"] + offset
+        end_char = unified_label["end_char"] + offset
+        len_text_to_replace = end_char - start_char
+
+        aymurai_label = xml.sax.saxutils.escape(f" <{unified_label['aymurai_label']}>")
+        doc = doc[:start_char] + aymurai_label + doc[end_char:]
+
+        offset += len(aymurai_label) - len_text_to_replace
+
+    return re.sub(r" +", " ", doc).strip()
+
+
+def make_paragraph(n_entities: int, seed: int = 0) -> dict:
+    """
+    Synthetic paragraph with `n_entities` labels, one every few words
+
+    Args:
+        n_entities (int): number of labels
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        dict: paragraph, with the `document` and `labels` keys
+    """
+    rng = random.Random(seed)
+
+    words, labels = [], []
+    position = 0
+    for _ in range(n_entities):
+        for _ in range(rng.randint(2, 8)):
+            word = "".join(
+                rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 9))
+            )
+            words.append(word)
+            position += len(word) + 1
+
+        entity = " ".join(
+            "".join(rng.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZ", k=rng.randint(3, 8)))
+            for _ in range(rng.randint(1, 3))
+        )
+        labels.append(
+            {
+                "text": entity,
+                "start_char": position,
+                "end_char": position + len(entity),
+                "attrs": {
+                    "aymurai_label": rng.choice(LABELS),
+                    "aymurai_alt_text": None,
+                    "aymurai_alt_start_char": None,
+                    "aymurai_alt_end_char": None,
+                },
+            }
+        )
+        words.append(entity)
+        position += len(entity) + 1
+
+    return {"document": " ".join(words), "labels": labels}
+
+
+def timeit(function, paragraph: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(paragraph)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    anonymizer = DocAnonymizer()
+
+    failed = False
+    for n_entities in args.entities:
+        paragraph = make_paragraph(n_entities)
+
+        legacy_text = legacy_replace_labels_in_text(anonymizer, paragraph)
+        current_text = anonymizer.replace_labels_in_text(paragraph)
+        failed |= legacy_text != current_text
+
+        legacy = timeit(
+            lambda p: legacy_replace_labels_in_text(anonymizer, p),
+            paragraph,
+            args.repeat,
+        )
+        current = timeit(anonymizer.replace_labels_in_text, paragraph, args.repeat)
+
+        print(
+            f"{n_entities:5d} entities ({len(paragraph['document']):6d} chars):"
+            f" legacy {legacy * 1e3:8.2f} ms | current {current * 1e3:8.2f} ms"
+            f" | speedup {legacy / current:5.1f}x"
+            f" | {'same' if legacy_text == current_text else 'DIFFERENT'} output"
+        )
+
+    print("FAIL: outputs differ" if failed else "OK")
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())